@@ -1,13 +1,15 @@
 #!/usr/bin/env python3
 import tkinter as tk
-from tkinter import ttk, scrolledtext, filedialog, messagebox
-import subprocess
-import threading
+from tkinter import ttk, filedialog, messagebox
 import queue
 import json
 import os
 import logging
 from datetime import datetime
+from gui.command_engine import get_engine
+from gui.output_console import OutputConsole
+from gui.run_log import run_log_path
+from gui.run_log_viewer import RunLogViewer
 
 class ClineGUI:
     def __init__(self, root):
@@ -16,15 +18,13 @@ class ClineGUI:
         
         # State
         self.current_project = None
-        self.command_queue = queue.Queue()
-        self.output_queue = queue.Queue()
+        self.engine = None
+        self.history = None
+        self.events = queue.Queue()
         
         # Create main layout
         self.create_layout()
         
-        # Start command processing thread
-        threading.Thread(target=self.process_commands, daemon=True).start()
-        
         # Start output processing
         self.process_output()
     
@@ -72,21 +72,26 @@ class ClineGUI:
         
         self.cmd_tree = ttk.Treeview(
             history_frame,
-            columns=('Time', 'Status', 'Duration'),
+            columns=('Time', 'Command', 'Status', 'Duration', 'Cache'),
             show='headings',
             height=5
         )
         self.cmd_tree.heading('Time', text='Time')
+        self.cmd_tree.heading('Command', text='Command')
         self.cmd_tree.heading('Status', text='Status')
         self.cmd_tree.heading('Duration', text='Duration')
+        self.cmd_tree.heading('Cache', text='Cache')
+        self.cmd_tree.column('Cache', width=60)
         self.cmd_tree.pack(fill='x')
+        self.cmd_tree.bind('<Double-1>', lambda e: self.view_output())
+        self.cmd_tree.bind('<Delete>', lambda e: self.cancel_command())
         
         # Command output
         output_frame = ttk.LabelFrame(right_frame, text="Output")
         output_frame.pack(fill='both', expand=True, padx=5, pady=5)
         
-        self.output_text = scrolledtext.ScrolledText(output_frame)
-        self.output_text.pack(fill='both', expand=True)
+        self.console = OutputConsole(output_frame)
+        self.console.pack(fill='both', expand=True)
     
     def select_project(self):
         """Select project directory"""
@@ -101,6 +106,8 @@ class ClineGUI:
             
             # Create .cline directory if it doesn't exist
             os.makedirs(os.path.join(self.current_project['config_dir'], 'tasks'), exist_ok=True)
+            self.engine = get_engine(dir_path)
+            self.history = self.engine.history
             
             # Refresh UI
             self.refresh_tasks()
@@ -133,117 +140,78 @@ class ClineGUI:
         for item in self.cmd_tree.get_children():
             self.cmd_tree.delete(item)
         
-        # Load history from file
-        history_file = os.path.join(self.current_project['config_dir'], 'command_history.json')
-        if os.path.exists(history_file):
-            try:
-                with open(history_file) as f:
-                    history = json.load(f)
-                
-                for cmd in history:
-                    timestamp = datetime.fromisoformat(cmd['timestamp'])
-                    self.cmd_tree.insert(
-                        '',
-                        'end',
-                        values=(
-                            timestamp.strftime('%H:%M:%S'),
-                            cmd['status'],
-                            cmd['duration']
-                        )
-                    )
-            except Exception as e:
-                print(f"Error loading command history: {e}")
-    
-    def process_commands(self):
-        """Process commands in queue"""
-        while True:
-            try:
-                cmd = self.command_queue.get()
-                if not cmd:
+        # Newest entries only; the log is read from the end
+        try:
+            for cmd in self.history.page(0, 500):
+                timestamp = datetime.fromisoformat(cmd['timestamp'])
+                iid = cmd.get('id')
+                if iid and self.cmd_tree.exists(iid):
                     continue
-                
-                start_time = datetime.now()
-                
-                # Execute command
-                process = subprocess.Popen(
-                    cmd,
-                    shell=True,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True
+                self.cmd_tree.insert(
+                    '',
+                    'end',
+                    iid=iid,
+                    values=(
+                        timestamp.strftime('%H:%M:%S'),
+                        cmd.get('command', ''),
+                        cmd['status'],
+                        cmd['duration'],
+                        cmd.get('cache', '')
+                    )
                 )
-                
-                # Stream output
-                while True:
-                    output = process.stdout.readline()
-                    if output == '' and process.poll() is not None:
-                        break
-                    if output:
-                        self.output_queue.put(output)
-                
-                # Get any remaining output
-                stdout, stderr = process.communicate()
-                if stdout:
-                    self.output_queue.put(stdout)
-                if stderr:
-                    self.output_queue.put(f"Error: {stderr}")
-                
-                # Calculate duration
-                duration = datetime.now() - start_time
-                status = 'Success' if process.returncode == 0 else 'Failed'
-                
-                # Add to history
-                self.root.after(0, self.add_to_history, cmd, start_time, status, duration)
-                
-            except Exception as e:
-                self.output_queue.put(f"Error executing command: {str(e)}")
+        except Exception as e:
+            print(f"Error loading command history: {e}")
+    
+    def view_output(self):
+        """Open the saved output of the selected command"""
+        selected = self.cmd_tree.selection()
+        if not selected or not self.engine or not self.engine.runs_dir:
+            return
+        path = run_log_path(self.engine.runs_dir, selected[0])
+        if os.path.exists(path):
+            RunLogViewer(self.root, path)
+    
+    def cancel_command(self):
+        """Stop the selected command and its child processes"""
+        selected = self.cmd_tree.selection()
+        if selected and self.engine:
+            self.engine.cancel(selected[0])
+    
+    def execute_command(self, cmd, timeout=None):
+        """Run a command on the project's shared command engine"""
+        if not self.engine:
+            messagebox.showwarning("Warning", "Please select a project first")
+            return None
+        run = self.engine.submit(cmd, self.events, timeout=timeout)
+        self.cmd_tree.insert('', 0, iid=run.id, values=self.row_values(run))
+        return run
+    
+    def row_values(self, run):
+        """History row for a command run"""
+        started = run.started or run.submitted
+        return (
+            started.strftime('%H:%M:%S'),
+            run.label,
+            run.status,
+            str(run.duration).split('.')[0],
+            run.cache or ''
+        )
     
     def process_output(self):
-        """Process output in queue"""
+        """Apply output and status events from running commands"""
         try:
-            while True:
-                output = self.output_queue.get_nowait()
-                self.output_text.insert(tk.END, output)
-                self.output_text.see(tk.END)
+            for _ in range(1000):
+                event = self.events.get_nowait()
+                if event.kind == 'output':
+                    self.console.write(event.text, 'stderr' if event.stream == 'stderr' else None)
+                elif self.cmd_tree.exists(event.run.id):
+                    # Finished or started: update the history row in place
+                    self.cmd_tree.item(event.run.id, values=self.row_values(event.run))
         except queue.Empty:
             pass
         finally:
             self.root.after(100, self.process_output)
     
-    def add_to_history(self, cmd, start_time, status, duration):
-        """Add command to history"""
-        self.cmd_tree.insert(
-            '',
-            0,
-            values=(
-                start_time.strftime('%H:%M:%S'),
-                status,
-                str(duration).split('.')[0]
-            )
-        )
-        
-        # Save to history file
-        if self.current_project:
-            history_file = os.path.join(self.current_project['config_dir'], 'command_history.json')
-            try:
-                if os.path.exists(history_file):
-                    with open(history_file) as f:
-                        history = json.load(f)
-                else:
-                    history = []
-                
-                history.insert(0, {
-                    'command': cmd,
-                    'timestamp': start_time.isoformat(),
-                    'status': status,
-                    'duration': str(duration)
-                })
-                
-                with open(history_file, 'w') as f:
-                    json.dump(history, f, indent=2)
-            except Exception as e:
-                print(f"Error saving command history: {e}")
-
 if __name__ == '__main__':
     root = tk.Tk()
     app = ClineGUI(root)
@@ -1,60 +1,76 @@
-from .main import ClineApp
-from .security_checks import SecurityChecks
-from .vscode_automation import VSCodeAutomation
-from .task_management import TaskManagement
-from .credential_management import CredentialManagement
-from .command_history import CommandHistory
-from .project_management import ProjectManagement
-from .computer_use import ComputerUse, ComputerTask, ResourceType, PermissionLevel
-from .computer_use_manager import ComputerUseManager
-from .ai_models import (
-    AIModelManager,
-    ModelCapability,
-    TaskRequirement,
-    BudgetError,
-    ModelNotFoundError,
-    OpenRouterClient,
-    CostTracker,
-    ModelSelector
-)
-from .ai_model_manager import AIModelManagerGUI
-from .search_engine import (
-    SearchEngine,
-    SearchModel,
-    SearchResult,
-    SearchManager
-)
-from .search_manager import SearchManagerGUI
-from .utils import setup_logging, make_window_front, bind_window_events
+import importlib
 
-__all__ = [
-    'ClineApp',
-    'SecurityChecks',
-    'VSCodeAutomation',
-    'TaskManagement',
-    'CredentialManagement',
-    'CommandHistory',
-    'ProjectManagement',
-    'ComputerUse',
-    'ComputerTask',
-    'ResourceType',
-    'PermissionLevel',
-    'ComputerUseManager',
-    'AIModelManager',
-    'ModelCapability',
-    'TaskRequirement',
-    'BudgetError',
-    'ModelNotFoundError',
-    'OpenRouterClient',
-    'CostTracker',
-    'ModelSelector',
-    'AIModelManagerGUI',
-    'SearchEngine',
-    'SearchModel',
-    'SearchResult',
-    'SearchManager',
-    'SearchManagerGUI',
-    'setup_logging',
-    'make_window_front',
-    'bind_window_events'
-]
+# Exports are imported on first access, so headless tools (e.g. the
+# cline-tasks CLI) can use the task store modules without loading tkinter,
+# pyautogui or the AI clients.
+_EXPORTS = {
+    'ClineApp': '.main',
+    'SecurityChecks': '.security_checks',
+    'VSCodeAutomation': '.vscode_automation',
+    'TaskManagement': '.task_management',
+    'TaskIndex': '.task_index',
+    'TaskArchive': '.task_archive',
+    'TaskStore': '.task_store',
+    'VirtualTaskList': '.virtual_task_list',
+    'TaskWatcher': '.task_watcher',
+    'TaskSearchIndex': '.task_search',
+    'PreviewLoader': '.preview_loader',
+    'PreviewCache': '.preview_loader',
+    'FileWriter': '.file_writer',
+    'FlushError': '.file_writer',
+    'atomic_write': '.file_writer',
+    'get_writer': '.file_writer',
+    'CredentialManagement': '.credential_management',
+    'KeysFile': '.keys_file',
+    'SecretRedactor': '.redaction',
+    'CommandHistory': '.command_history',
+    'HistoryStore': '.history_store',
+    'HistorySearchIndex': '.history_search',
+    'LatencyStats': '.command_stats',
+    'CommandStatsView': '.command_stats_view',
+    'CommandEngine': '.command_engine',
+    'CommandRun': '.command_engine',
+    'get_engine': '.command_engine',
+    'OutputChunk': '.output_capture',
+    'ShellPool': '.shell_session',
+    'ShellSession': '.shell_session',
+    'OutputConsole': '.output_console',
+    'RunLog': '.run_log',
+    'RunLogWriter': '.run_log',
+    'RunLogViewer': '.run_log_viewer',
+    'ResultCache': '.result_cache',
+    'CacheRule': '.result_cache',
+    'ProjectManagement': '.project_management',
+    'ComputerUse': '.computer_use',
+    'ComputerTask': '.computer_use',
+    'ResourceType': '.computer_use',
+    'PermissionLevel': '.computer_use',
+    'ComputerUseManager': '.computer_use_manager',
+    'AIModelManager': '.ai_models',
+    'ModelCapability': '.ai_models',
+    'TaskRequirement': '.ai_models',
+    'BudgetError': '.ai_models',
+    'ModelNotFoundError': '.ai_models',
+    'OpenRouterClient': '.ai_models',
+    'CostTracker': '.ai_models',
+    'ModelSelector': '.ai_models',
+    'AIModelManagerGUI': '.ai_model_manager',
+    'SearchEngine': '.search_engine',
+    'SearchModel': '.search_engine',
+    'SearchResult': '.search_engine',
+    'SearchManager': '.search_engine',
+    'SearchManagerGUI': '.search_manager',
+    'setup_logging': '.utils',
+    'make_window_front': '.utils',
+    'bind_window_events': '.utils'
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
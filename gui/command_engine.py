@@ -0,0 +1,611 @@
+import os
+import time
+import signal
+import logging
+import threading
+import subprocess
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Deque, Dict, List, NamedTuple, Optional
+from .history_store import HistoryStore
+from .output_capture import OutputChunk, capture
+from .result_cache import CachedResult, ResultCache
+from .command_stats import DEFAULT_REGRESSION_FACTOR, LatencyStats
+from .redaction import SecretRedactor
+from .run_log import RunLogWriter, run_log_path
+from .shell_session import ShellPool
+
+DEFAULT_MAX_WORKERS = 4
+
+# Room left after a "Running" history record for its final fields
+HISTORY_RESERVE = 192
+
+# Seconds between SIGTERM and SIGKILL when stopping a command
+KILL_GRACE = 3.0
+
+# Seconds between peak RSS samples of a running command
+RSS_POLL = 0.1
+
+@dataclass
+class CommandRun:
+    command: str
+    cwd: Optional[str] = None
+    env: Optional[Dict[str, str]] = None
+    # Shown and recorded instead of command, e.g. without injected secrets
+    display: Optional[str] = None
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = 'Queued'
+    returncode: Optional[int] = None
+    submitted: datetime = field(default_factory=datetime.now)
+    started: Optional[datetime] = None
+    finished: Optional[datetime] = None
+    timeout: Optional[float] = None
+    # 'Cancelled' or 'Timeout' once a stop was requested
+    stop_reason: Optional[str] = None
+    killed: bool = False
+    use_cache: bool = True
+    # 'hit' or 'miss' when a cache rule matched
+    cache: Optional[str] = None
+    output_bytes: int = 0
+    # Peak resident set size of the command's largest process (Linux only)
+    max_rss_kb: Optional[int] = None
+    # Elapsed time over the signature's p95 when flagged as slow
+    regression: Optional[float] = None
+    process: Optional[subprocess.Popen] = field(default=None, repr=False, compare=False)
+
+    @property
+    def duration(self) -> timedelta:
+        if not self.started:
+            return timedelta(0)
+        return (self.finished or datetime.now()) - self.started
+
+    @property
+    def label(self) -> str:
+        return self.display if self.display is not None else self.command
+
+    @property
+    def elapsed(self) -> float:
+        return self.duration.total_seconds()
+
+    @property
+    def done(self) -> bool:
+        return self.finished is not None
+
+class CommandEvent(NamedTuple):
+    """Engine notification: kind is 'status' or 'output'
+
+    Output events carry a batch of text from one stream and the time its
+    first byte was read; status events carry the run's status when sent.
+    """
+    kind: str
+    run: CommandRun
+    stream: Optional[str] = None
+    text: str = ''
+    timestamp: float = 0.0
+    status: Optional[str] = None
+
+class CommandEngine:
+    """Runs shell commands for one project on a bounded pool of workers
+
+    Commands beyond max_workers wait in FIFO order. Progress is reported as
+    CommandEvents on the queue passed to submit(), so a Tk widget can poll
+    it with after() and never block on a process. Each command gets a
+    history record when it starts, which is updated in place when it ends.
+    With runs_dir set, the combined output of each run is also kept as a
+    compressed run log (see run_log), linked from the history record.
+
+    Every command runs in its own process group, so cancel() and timeouts
+    stop the whole tree the shell started: SIGTERM first, then SIGKILL
+    after kill_grace seconds. The final status is then 'Cancelled' or
+    'Timeout', or 'Killed' if SIGKILL was needed.
+
+    With a ShellPool as sessions, commands run on warm shells instead of
+    a new /bin/sh each (see shell_session). Stopping such a command ends
+    its session, which the pool then replaces.
+
+    With a ResultCache, commands matching one of its rules replay a stored
+    result when the command, cwd, selected env vars and input files are
+    unchanged; the history record notes the hit or miss.
+
+    Finished runs are recorded with their elapsed seconds, output bytes
+    and peak RSS. A run taking longer than regression_factor times the
+    p95 of earlier successful runs with the same signature (see
+    command_stats) is flagged as a regression.
+
+    With a SecretRedactor as redactor, secret values are masked in the
+    output of every run before it reaches the events, run log, cache or
+    history, and in the command text that is shown and recorded.
+    """
+
+    def __init__(self, cwd: str, history: Optional[HistoryStore] = None,
+                 max_workers: int = DEFAULT_MAX_WORKERS, runs_dir: Optional[str] = None,
+                 kill_grace: float = KILL_GRACE, sessions: Optional[ShellPool] = None):
+        self.cwd = cwd
+        self.history = history
+        self.runs_dir = runs_dir
+        self.max_workers = max_workers
+        self.kill_grace = kill_grace
+        self.sessions = sessions
+        self.cache: Optional[ResultCache] = None
+        self.regression_factor = DEFAULT_REGRESSION_FACTOR
+        self.redactor: Optional[SecretRedactor] = None
+        self._stats: Optional[LatencyStats] = None
+        self.runs: Dict[str, CommandRun] = {}
+        self._pending: Deque = deque()
+        self._active = 0
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+
+    def set_max_workers(self, max_workers: int):
+        with self._lock:
+            self.max_workers = max(1, max_workers)
+        if self.sessions is not None:
+            self.sessions.resize(self.max_workers)
+        self._dispatch()
+
+    def use_sessions(self, enabled: bool):
+        """Switch between warm shell sessions and a new shell per command"""
+        if enabled and os.name == 'nt':
+            logging.warning("Shell sessions need a POSIX shell; running commands directly")
+        elif enabled and self.sessions is None:
+            self.sessions = ShellPool(self.cwd, self.max_workers)
+            self.sessions.warm()
+        elif not enabled and self.sessions is not None:
+            # Runs still holding a session release it to the closed pool
+            sessions, self.sessions = self.sessions, None
+            sessions.close()
+
+    def configure_cache(self, settings: Optional[Dict[str, Any]]):
+        """Apply a project's command_cache setting; no rules turns it off"""
+        if not settings or not settings.get('rules'):
+            self.cache = None
+            return
+        cache = ResultCache.from_settings(settings)
+        if self.cache is not None and self.cache.rules == cache.rules:
+            # Same rules: keep the stored results
+            self.cache.max_entries, self.cache.max_bytes = cache.max_entries, cache.max_bytes
+        else:
+            self.cache = cache
+
+    def submit(self, command: str, events, env: Optional[Dict[str, str]] = None,
+               timeout: Optional[float] = None, use_cache: bool = True,
+               display: Optional[str] = None) -> CommandRun:
+        """Queue a shell command; returns immediately
+
+        With timeout set, the command is stopped after running that many
+        seconds. use_cache=False always runs it, even if a cache rule
+        matches. display is the command as shown and recorded (e.g. with
+        placeholders instead of credentials); by default it is the command.
+        Any secrets in it are masked either way.
+        """
+        if self.redactor is not None:
+            shown = command if display is None else display
+            redacted = self.redactor.redact(shown)
+            if redacted != shown:
+                display = redacted
+        run = CommandRun(command, self.cwd, env, display, timeout=timeout or None, use_cache=use_cache)
+        with self._lock:
+            self.runs[run.id] = run
+            self._pending.append((run, events))
+        events.put(CommandEvent('status', run, status=run.status))
+        self._dispatch()
+        return run
+
+    def cancel(self, run_id: str) -> bool:
+        """Stop a queued or running command; False if it already finished"""
+        with self._lock:
+            run = self.runs.get(run_id)
+            if run is None or run.done or run.stop_reason:
+                return False
+            for i, (queued, events) in enumerate(self._pending):
+                if queued is run:
+                    del self._pending[i]
+                    self.runs.pop(run_id)
+                    break
+            else:
+                events = None
+            run.stop_reason = 'Cancelled'
+        if events is not None:
+            # Never started, so there is no process or history record
+            run.status = 'Cancelled'
+            run.finished = datetime.now()
+            events.put(CommandEvent('status', run, status=run.status))
+        else:
+            self._stop(run)
+        return True
+
+    def running(self) -> List[CommandRun]:
+        with self._lock:
+            return [r for r in self.runs.values() if not r.done]
+
+    def _dispatch(self):
+        """Start queued commands while workers are free"""
+        with self._lock:
+            while self._pending and self._active < self.max_workers:
+                run, events = self._pending.popleft()
+                self._active += 1
+                threading.Thread(
+                    target=self._worker, args=(run, events),
+                    name=f"command-{run.id[:8]}", daemon=True
+                ).start()
+
+    def _worker(self, run: CommandRun, events):
+        try:
+            self._run(run, events)
+        except Exception as e:
+            logging.error(f"Error running command: {e}")
+            events.put(CommandEvent('output', run, 'stderr', f"Error executing command: {e}\n"))
+            run.status = 'Failed'
+            run.finished = run.finished or datetime.now()
+            self._record_finish(run)
+            events.put(CommandEvent('status', run, status=run.status))
+        finally:
+            with self._lock:
+                self._active -= 1
+                self.runs.pop(run.id, None)
+            self._dispatch()
+
+    def _run(self, run: CommandRun, events):
+        run.started = datetime.now()
+        run.status = 'Running'
+        cache, key = self.cache, None
+        if cache is not None and run.use_cache:
+            key = self._cache_key(cache, run)
+        cached = cache.get(key) if key else None
+        if key:
+            run.cache = 'hit' if cached else 'miss'
+        log = RunLogWriter(run_log_path(self.runs_dir, run.id)) if self.runs_dir else None
+        if self.history is not None:
+            try:
+                self.history.append(self._history_record(run), reserve=HISTORY_RESERVE)
+            except Exception as e:
+                logging.error(f"Error saving command history: {e}")
+        events.put(CommandEvent('status', run, status=run.status))
+
+        recorded: Optional[List] = [] if key and not cached else None
+        recorded_size = 0
+
+        def record(chunk):
+            nonlocal recorded, recorded_size
+            run.output_bytes += len(chunk.text.encode('utf-8'))
+            if log:
+                log.write(chunk.text)
+            if recorded is not None:
+                recorded_size += len(chunk.text)
+                if recorded_size > cache.max_entry_bytes:
+                    recorded = None
+                else:
+                    recorded.append((chunk.stream, chunk.text))
+            events.put(CommandEvent('output', run, chunk.stream, chunk.text, chunk.timestamp))
+
+        redactor = self.redactor
+        streams: Dict[str, Any] = {}
+        if redactor is None:
+            emit = record
+        else:
+            def emit(chunk):
+                stream = streams.get(chunk.stream)
+                if stream is None:
+                    stream = streams[chunk.stream] = redactor.stream()
+                text = stream.feed(chunk.text)
+                if text:
+                    record(chunk._replace(text=text))
+
+        try:
+            sessions = self.sessions
+            if cached:
+                for stream, text in cached.chunks:
+                    emit(OutputChunk(stream, time.time(), text))
+                run.returncode = cached.returncode
+            elif sessions is not None:
+                run.returncode = self._run_in_session(run, emit, sessions)
+            else:
+                run.returncode = self._run_process(run, emit)
+        finally:
+            # Text held back in case it began a secret
+            for name, stream in streams.items():
+                text = stream.flush()
+                if text:
+                    record(OutputChunk(name, time.time(), text))
+            if log:
+                log.close()
+
+        run.finished = datetime.now()
+        run.status = self._final_status(run)
+        if recorded is not None and run.status in ('Success', 'Failed'):
+            cache.put(key, CachedResult(run.returncode, tuple(recorded), recorded_size))
+        self._check_regression(run)
+        self._record_finish(run)
+        events.put(CommandEvent('status', run, status=run.status))
+
+    def _cache_key(self, cache: ResultCache, run: CommandRun) -> Optional[str]:
+        rule = cache.rule_for(run.command)
+        if rule is None:
+            return None
+        try:
+            return cache.key(rule, run.command, run.cwd, dict(os.environ, **(run.env or {})))
+        except OSError as e:
+            logging.error(f"Error fingerprinting command inputs: {e}")
+            return None
+
+    def _run_process(self, run: CommandRun, emit) -> int:
+        env = dict(os.environ, **run.env) if run.env else None
+        process = subprocess.Popen(
+            run.command,
+            shell=True,
+            cwd=run.cwd,
+            env=env,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            **_new_group_options()
+        )
+        timer = self._watch(run, process)
+        rss = PeakRss.start(process.pid)
+        try:
+            capture(process, emit, exited=lambda: _exited(process))
+        finally:
+            if timer:
+                timer.cancel()
+            if rss:
+                run.max_rss_kb = rss.stop()
+        returncode = process.wait()
+        # Background children the shell left behind
+        _signal_group(process, signal.SIGTERM)
+        return returncode
+
+    def _run_in_session(self, run: CommandRun, emit, sessions: ShellPool) -> int:
+        session = sessions.acquire()
+        timer = self._watch(run, session.process)
+        try:
+            returncode = session.run(run.command, emit, run.env)
+        finally:
+            if timer:
+                timer.cancel()
+            if run.stop_reason:
+                # Stopping signals the session's whole group
+                session.close()
+            else:
+                sessions.release(session)
+        if returncode is None:
+            if not run.stop_reason:
+                emit(OutputChunk('stderr', time.time(), "Shell session ended unexpectedly\n"))
+            session.close()
+            returncode = session.process.returncode
+        return returncode
+
+    def _watch(self, run: CommandRun, process: subprocess.Popen) -> Optional[threading.Timer]:
+        """Make the run stoppable; returns its timeout timer if it has one"""
+        with self._lock:
+            run.process = process
+            stop = run.stop_reason
+        if stop:
+            # Cancelled while starting
+            self._stop(run)
+        elif run.timeout:
+            timer = threading.Timer(run.timeout, self._stop, (run, 'Timeout'))
+            timer.daemon = True
+            timer.start()
+            return timer
+        return None
+
+    def _stop(self, run: CommandRun, reason: Optional[str] = None):
+        """Terminate a run's process group, escalating to SIGKILL"""
+        with self._lock:
+            if reason and not run.stop_reason:
+                run.stop_reason = reason
+            process = run.process
+        if process is None or _exited(process):
+            return
+        _signal_group(process, signal.SIGTERM)
+
+        def escalate():
+            if not _exited(process):
+                run.killed = True
+                _signal_group(process, getattr(signal, 'SIGKILL', signal.SIGTERM))
+
+        timer = threading.Timer(self.kill_grace, escalate)
+        timer.daemon = True
+        timer.start()
+
+    def latency_stats(self) -> LatencyStats:
+        """Per-signature run times, loaded from the history on first use
+
+        The history is read under a lock of its own, so submit() and
+        cancel() are not held up while it loads.
+        """
+        stats = self._stats
+        if stats is not None:
+            return stats
+        with self._stats_lock:
+            if self._stats is None:
+                stats = LatencyStats()
+                if self.history is not None:
+                    try:
+                        stats = LatencyStats.from_history(self.history)
+                    except Exception as e:
+                        logging.error(f"Error loading command statistics: {e}")
+                with self._lock:
+                    self._stats = stats
+            return self._stats
+
+    def _check_regression(self, run: CommandRun):
+        if run.cache == 'hit' or run.status == 'Cancelled':
+            return
+        stats = self.latency_stats()
+        baseline = stats.baseline(run.label)
+        if baseline and run.elapsed > baseline * self.regression_factor:
+            run.regression = round(run.elapsed / baseline, 2)
+        stats.add(run.label, run.status, run.started.timestamp(), run.elapsed, bool(run.regression))
+
+    @staticmethod
+    def _final_status(run: CommandRun) -> str:
+        if run.killed:
+            return 'Killed'
+        if run.stop_reason:
+            return run.stop_reason
+        if run.returncode == 0:
+            return 'Success'
+        # Negative: ended by a signal nobody here sent
+        return 'Killed' if run.returncode < 0 else 'Failed'
+
+    def _history_record(self, run: CommandRun) -> Dict[str, Any]:
+        record = {
+            'id': run.id,
+            'command': run.label,
+            'timestamp': run.started.isoformat(),
+            'status': run.status,
+            'duration': str(run.duration)
+        }
+        if run.timeout:
+            record['timeout'] = run.timeout
+        if run.cache:
+            record['cache'] = run.cache
+        if self.runs_dir:
+            # Relative to .cline, so the project can move
+            record['log'] = os.path.relpath(run_log_path(self.runs_dir, run.id), os.path.dirname(self.runs_dir))
+        return record
+
+    def _record_finish(self, run: CommandRun):
+        if self.history is None:
+            return
+        try:
+            fields = {
+                'status': run.status,
+                'duration': str(run.duration),
+                'returncode': run.returncode,
+                'elapsed': round(run.elapsed, 3),
+                'output_bytes': run.output_bytes
+            }
+            if run.max_rss_kb is not None:
+                fields['max_rss_kb'] = run.max_rss_kb
+            if run.regression:
+                fields['regression'] = run.regression
+            self.history.update(run.id, fields)
+        except Exception as e:
+            logging.error(f"Error saving command history: {e}")
+
+class PeakRss:
+    """Largest VmHWM among a command's processes, sampled from /proc
+
+    wait4()'s ru_maxrss is no use here: on Linux a child keeps the
+    high-water RSS of the process it was forked from, so every command
+    would report at least the GUI's own size. Instead the process tree is
+    read every RSS_POLL seconds while the command runs; VmHWM is itself a
+    high-water mark, so only processes that exit between two samples are
+    missed. Commands that finish before the first sample report None.
+    """
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.peak: Optional[int] = None
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._poll, daemon=True)
+
+    @classmethod
+    def start(cls, pid: int) -> Optional['PeakRss']:
+        """Sampler for pid's tree, None where /proc is unavailable"""
+        if not os.path.exists(f'/proc/{pid}/task/{pid}/children'):
+            return None
+        sampler = cls(pid)
+        sampler._thread.start()
+        return sampler
+
+    def _poll(self):
+        while True:
+            self.sample()
+            if self._done.wait(RSS_POLL):
+                return
+
+    def sample(self):
+        stack = [self.pid]
+        while stack:
+            pid = stack.pop()
+            try:
+                with open(f'/proc/{pid}/status') as f:
+                    for line in f:
+                        if line.startswith('VmHWM:'):
+                            self.peak = max(self.peak or 0, int(line.split()[1]))
+                            break
+                with open(f'/proc/{pid}/task/{pid}/children') as f:
+                    stack.extend(int(child) for child in f.read().split())
+            except (OSError, ValueError):
+                # Exited meanwhile
+                continue
+
+    def stop(self) -> Optional[int]:
+        """Stop sampling and return the peak in KiB"""
+        self._done.set()
+        self._thread.join()
+        return self.peak
+
+def _new_group_options() -> Dict[str, Any]:
+    """Popen options that start the command in a new process group"""
+    if os.name == 'nt':
+        return {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {'start_new_session': True}
+
+def _exited(process: subprocess.Popen) -> bool:
+    """Whether process has exited, without reaping it where possible
+
+    Leaving the zombie keeps its pid, and so its process group id, from
+    being reused before the group is signalled.
+    """
+    if process.returncode is not None:
+        return True
+    if hasattr(os, 'waitid'):
+        try:
+            return os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOHANG | os.WNOWAIT) is not None
+        except ChildProcessError:
+            return True
+    return process.poll() is not None
+
+def _signal_group(process: subprocess.Popen, sig: int):
+    """Send sig to the process group led by process, if any is left"""
+    try:
+        if os.name == 'nt':
+            # No process groups to signal; taskkill /T would be needed for the tree
+            if process.poll() is None:
+                process.kill()
+        else:
+            os.killpg(process.pid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass
+    except OSError as e:
+        logging.error(f"Error stopping command: {e}")
+
+_engines: Dict[str, CommandEngine] = {}
+_engines_lock = threading.Lock()
+
+def get_engine(project_path: str, max_workers: Optional[int] = None,
+               shell_sessions: Optional[bool] = None,
+               command_cache: Optional[Dict[str, Any]] = None,
+               regression_factor: Optional[float] = None) -> CommandEngine:
+    """Shared engine for a project, so every view uses the same pool
+
+    shell_sessions turns warm shell sessions on or off, and command_cache
+    is passed to configure_cache(); None leaves the engine as it is.
+    regression_factor sets how much slower than p95 a run is flagged.
+    """
+    project_path = os.path.abspath(project_path)
+    with _engines_lock:
+        engine = _engines.get(project_path)
+        if engine is None:
+            cline_dir = os.path.join(project_path, '.cline')
+            engine = _engines[project_path] = CommandEngine(
+                project_path,
+                HistoryStore(cline_dir),
+                max_workers or DEFAULT_MAX_WORKERS,
+                os.path.join(cline_dir, 'runs')
+            )
+        elif max_workers:
+            engine.set_max_workers(max_workers)
+        if shell_sessions is not None:
+            engine.use_sessions(shell_sessions)
+        if command_cache is not None:
+            engine.configure_cache(command_cache)
+        if regression_factor:
+            engine.regression_factor = regression_factor
+        return engine
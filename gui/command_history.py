@@ -1,31 +1,88 @@
 import tkinter as tk
-from tkinter import ttk, scrolledtext
-import json
+from tkinter import ttk, messagebox
 import os
-from datetime import datetime
+import queue
+import logging
+from datetime import datetime, timedelta
+from .command_engine import get_engine
+from .output_console import OutputConsole
+from .run_log import run_log_path
+from .run_log_viewer import RunLogViewer
+from .command_stats_view import CommandStatsView
 
 class CommandHistory(ttk.LabelFrame):
+    HISTORY_ROWS = 200
+    STATUSES = ('All', 'Success', 'Failed', 'Running', 'Cancelled', 'Timeout', 'Killed')
+    
     def __init__(self, parent, credential_manager):
         super().__init__(parent, text="Command History")
         self.credential_manager = credential_manager
         
         # State
         self.current_project = None
+        self.engine = None
+        self.history = None
+        self.results = None
+        self.events = queue.Queue()
+        self._search_job = None
+        self._more_job = None
         
         # Command history
         history_frame = ttk.Frame(self)
         history_frame.pack(fill='x', pady=5)
         
+        # Search and filters
+        search_frame = ttk.Frame(history_frame)
+        search_frame.pack(fill='x')
+        ttk.Label(search_frame, text="Search:").pack(side='left')
+        self.search_var = tk.StringVar()
+        self.search_var.trace_add('write', lambda *args: self.schedule_search())
+        ttk.Entry(search_frame, textvariable=self.search_var).pack(side='left', fill='x', expand=True, padx=5)
+        self.status_filter = ttk.Combobox(search_frame, values=self.STATUSES, state='readonly', width=10)
+        self.status_filter.set('All')
+        self.status_filter.bind('<<ComboboxSelected>>', lambda e: self.load_history())
+        self.status_filter.pack(side='left', padx=5)
+        # Dates as YYYY-MM-DD, both inclusive
+        ttk.Label(search_frame, text="From:").pack(side='left')
+        self.since_var = tk.StringVar()
+        since_entry = ttk.Entry(search_frame, textvariable=self.since_var, width=11)
+        since_entry.pack(side='left', padx=(2, 5))
+        ttk.Label(search_frame, text="To:").pack(side='left')
+        self.until_var = tk.StringVar()
+        until_entry = ttk.Entry(search_frame, textvariable=self.until_var, width=11)
+        until_entry.pack(side='left', padx=(2, 5))
+        for entry in (since_entry, until_entry):
+            entry.bind('<Return>', lambda e: self.load_history())
+            entry.bind('<FocusOut>', lambda e: self.load_history())
+        self.matches_label = ttk.Label(search_frame, text="")
+        self.matches_label.pack(side='left', padx=5)
+        ttk.Button(search_frame, text="Stats", command=self.show_stats).pack(side='right')
+        
+        tree_frame = ttk.Frame(history_frame)
+        tree_frame.pack(fill='x', pady=5)
         self.cmd_tree = ttk.Treeview(
-            history_frame,
-            columns=('Time', 'Status', 'Duration'),
+            tree_frame,
+            columns=('Time', 'Command', 'Status', 'Duration', 'Cache'),
             show='headings',
             height=6
         )
         self.cmd_tree.heading('Time', text='Time')
+        self.cmd_tree.heading('Command', text='Command')
         self.cmd_tree.heading('Status', text='Status')
         self.cmd_tree.heading('Duration', text='Duration')
-        self.cmd_tree.pack(fill='x', pady=5)
+        self.cmd_tree.heading('Cache', text='Cache')
+        self.cmd_tree.column('Time', width=140)
+        self.cmd_tree.column('Command', width=320)
+        self.cmd_tree.column('Cache', width=60)
+        # More results load as the list is scrolled to the end
+        tree_scroll = ttk.Scrollbar(tree_frame, orient='vertical', command=self.cmd_tree.yview)
+        self.cmd_tree.configure(yscrollcommand=lambda first, last: self.on_tree_scroll(tree_scroll, first, last))
+        tree_scroll.pack(side='right', fill='y')
+        self.cmd_tree.pack(side='left', fill='x', expand=True)
+        self.cache_label = ttk.Label(history_frame, text="")
+        self.cache_label.pack(anchor='w')
+        self.cmd_tree.bind('<Double-1>', lambda e: self.view_output())
+        self.cmd_tree.bind('<Delete>', lambda e: self.cancel_command())
         
         # Command input
         input_frame = ttk.LabelFrame(self, text="Command")
@@ -33,19 +90,41 @@ class CommandHistory(ttk.LabelFrame):
         
         self.cmd_entry = ttk.Entry(input_frame)
         self.cmd_entry.pack(side='left', fill='x', expand=True, padx=5, pady=5)
+        ttk.Button(input_frame, text="Cancel", command=self.cancel_command).pack(side='right', padx=5, pady=5)
         ttk.Button(input_frame, text="Execute", command=self.execute_command).pack(side='right', padx=5, pady=5)
+        # Seconds; empty or 0 for no timeout
+        self.timeout_var = tk.StringVar()
+        ttk.Entry(input_frame, textvariable=self.timeout_var, width=6).pack(side='right', pady=5)
+        ttk.Label(input_frame, text="Timeout (s):").pack(side='right', padx=(5, 2))
         
         # Command output
         output_frame = ttk.LabelFrame(self, text="Output")
         output_frame.pack(fill='both', expand=True, padx=5, pady=5)
         
-        self.output_text = scrolledtext.ScrolledText(output_frame, wrap=tk.WORD)
-        self.output_text.pack(fill='both', expand=True, padx=5, pady=5)
+        self.console = OutputConsole(output_frame, wrap=tk.WORD)
+        self.console.pack(fill='both', expand=True, padx=5, pady=5)
+        
+        # Apply events from running commands
+        self.process_events()
     
     def set_project(self, project):
         """Set current project"""
         self.current_project = project
+        if project:
+            settings = project.get('config', {}).get('settings', {})
+            self.engine = get_engine(
+                project['path'],
+                settings.get('max_concurrent_commands'),
+                bool(settings.get('shell_sessions')),
+                settings.get('command_cache') or {},
+                settings.get('regression_factor')
+            )
+            self.timeout_var.set(str(settings.get('command_timeout') or ''))
+            self.history = self.engine.history
+        else:
+            self.engine = self.history = None
         self.load_history()
+        self.update_cache_label()
     
     def execute_command(self):
         if not self.current_project:
@@ -55,9 +134,13 @@ class CommandHistory(ttk.LabelFrame):
         cmd = self.cmd_entry.get().strip()
         if not cmd:
             return
+        # Shown and recorded with placeholders, not credentials
+        display = cmd
         
         # Inject credentials if needed
         if self.credential_manager:
+            # Mask credential values in the output
+            self.engine.redactor = self.credential_manager.redactor()
             task_path = os.path.join(
                 self.current_project['path'],
                 '.cline',
@@ -66,87 +149,177 @@ class CommandHistory(ttk.LabelFrame):
             if os.path.exists(task_path):
                 cmd = self.credential_manager.inject_credentials(cmd, task_path)
         
+        try:
+            timeout = float(self.timeout_var.get() or 0)
+        except ValueError:
+            messagebox.showerror("Error", "Timeout must be a number of seconds")
+            return
+        
         self.cmd_entry.delete(0, tk.END)
-        self.add_to_history(cmd, datetime.now(), 'Running', '0:00')
-        
-        # Add command to output
-        self.output_text.insert(tk.END, f"\n$ {cmd}\n")
-        self.output_text.see(tk.END)
-    
-    def add_to_history(self, cmd, start_time, status, duration):
-        self.cmd_tree.insert(
-            '',
-            0,
-            values=(
-                start_time.strftime('%H:%M:%S'),
-                status,
-                str(duration)
-            )
+        run = self.engine.submit(cmd, self.events, timeout=timeout, display=display)
+        self.cmd_tree.insert('', 0, iid=run.id, values=self.row_values(run))
+    
+    def cancel_command(self):
+        """Stop the selected command if it is queued or running"""
+        selected = self.cmd_tree.selection()
+        if not selected or not self.engine:
+            return
+        if not self.engine.cancel(selected[0]):
+            messagebox.showinfo("Cancel", "The selected command is not running")
+    
+    def row_values(self, run):
+        """Tree row for a command run"""
+        started = run.started or run.submitted
+        return (
+            started.strftime('%Y-%m-%d %H:%M:%S'),
+            run.label,
+            self.status_text(run.status, run.regression),
+            str(run.duration).split('.')[0],
+            run.cache or ''
         )
-        
-        if not self.current_project:
+    
+    def status_text(self, status, regression=None):
+        """Status, marked when the run was much slower than usual"""
+        if regression:
+            return f"{status} (slow x{regression:.1f})"
+        return status
+    
+    def show_stats(self):
+        """Open latency statistics for the project's commands"""
+        if self.history is None:
+            messagebox.showwarning("Warning", "Please select a project first")
             return
-        
-        # Save to history file
-        history_file = os.path.join(
-            self.current_project['path'],
-            '.cline',
-            'command_history.json'
+        CommandStatsView(self, self.history)
+    
+    def update_cache_label(self):
+        """Show result cache hits and misses for this session"""
+        cache = self.engine.cache if self.engine else None
+        if cache is None:
+            self.cache_label.config(text="")
+            return
+        self.cache_label.config(
+            text=f"Cache: {cache.hits} hit(s), {cache.misses} miss(es), "
+                 f"{len(cache)} result(s) stored"
         )
+    
+    def view_output(self):
+        """Open the saved output of the selected command"""
+        selected = self.cmd_tree.selection()
+        if not selected or not self.engine or not self.engine.runs_dir:
+            return
+        path = run_log_path(self.engine.runs_dir, selected[0])
+        if not os.path.exists(path):
+            messagebox.showinfo("Output", "No saved output for this command")
+            return
+        RunLogViewer(self, path)
+    
+    def process_events(self):
+        """Stream output and status changes from the engine into the view"""
         try:
-            if os.path.exists(history_file):
-                with open(history_file) as f:
-                    history = json.load(f)
-            else:
-                history = []
-            
-            history.insert(0, {
-                'command': cmd,
-                'timestamp': start_time.isoformat(),
-                'status': status,
-                'duration': str(duration)
-            })
-            
-            with open(history_file, 'w') as f:
-                json.dump(history, f, indent=2)
-        except Exception as e:
-            print(f"Error saving command history: {e}")
+            for _ in range(1000):
+                event = self.events.get_nowait()
+                run = event.run
+                if event.kind == 'output':
+                    self.console.write(event.text, 'stderr' if event.stream == 'stderr' else None)
+                    continue
+                
+                if event.status == 'Running':
+                    self.console.write(f"\n$ {run.label}\n", 'command')
+                elif event.status in ('Cancelled', 'Timeout', 'Killed'):
+                    self.console.write(f"[{event.status.lower()}] {run.label}\n", 'stderr')
+                elif run.regression and event.status in ('Success', 'Failed'):
+                    self.console.write(
+                        f"[slow] {run.label} took {run.elapsed:.1f}s, "
+                        f"{run.regression:.1f}x its usual p95\n", 'stderr'
+                    )
+                # Update the history row in place
+                if self.cmd_tree.exists(run.id):
+                    self.cmd_tree.item(run.id, values=self.row_values(run))
+                if run.cache and event.status == 'Running':
+                    self.update_cache_label()
+        except queue.Empty:
+            pass
+        finally:
+            self.after(100, self.process_events)
+    
+    def schedule_search(self):
+        """Search once typing pauses"""
+        if self._search_job:
+            self.after_cancel(self._search_job)
+        self._search_job = self.after(250, self.load_history)
+    
+    def parse_date(self, text):
+        text = text.strip()
+        return datetime.strptime(text, '%Y-%m-%d') if text else None
     
     def load_history(self):
-        """Load command history for current project"""
+        """Search command history with the current query and filters"""
+        self._search_job = None
         # Clear current history
         for item in self.cmd_tree.get_children():
             self.cmd_tree.delete(item)
+        self.results = None
         
-        if not self.current_project:
+        if self.history is None:
+            self.matches_label.config(text="")
             return
         
-        # Load history from file
-        history_file = os.path.join(
-            self.current_project['path'],
-            '.cline',
-            'command_history.json'
-        )
-        if os.path.exists(history_file):
-            try:
-                with open(history_file) as f:
-                    history = json.load(f)
-                
-                for cmd in history:
-                    timestamp = datetime.fromisoformat(cmd['timestamp'])
-                    self.cmd_tree.insert(
-                        '',
-                        'end',
-                        values=(
-                            timestamp.strftime('%H:%M:%S'),
-                            cmd['status'],
-                            cmd['duration']
-                        )
+        try:
+            since = self.parse_date(self.since_var.get())
+            until = self.parse_date(self.until_var.get())
+        except ValueError:
+            self.matches_label.config(text="Dates are YYYY-MM-DD")
+            return
+        status = self.status_filter.get()
+        
+        try:
+            self.results = self.history.search_index().search(
+                self.search_var.get(),
+                status=None if status == 'All' else {status},
+                since=since,
+                until=until + timedelta(days=1) if until else None
+            )
+            self.matches_label.config(text=f"{len(self.results)} command(s)")
+            self.load_more()
+        except Exception as e:
+            logging.error(f"Error loading command history: {e}")
+    
+    def load_more(self):
+        """Append the next page of search results"""
+        self._more_job = None
+        if self.results is None or self.results.exhausted:
+            return
+        try:
+            for cmd in self.results.fetch(self.HISTORY_ROWS):
+                iid = cmd.get('id')
+                if iid and self.cmd_tree.exists(iid):
+                    continue
+                try:
+                    timestamp = datetime.fromisoformat(cmd['timestamp']).strftime('%Y-%m-%d %H:%M:%S')
+                except (KeyError, ValueError):
+                    timestamp = ''
+                self.cmd_tree.insert(
+                    '',
+                    'end',
+                    iid=iid,
+                    values=(
+                        timestamp,
+                        cmd.get('command', ''),
+                        self.status_text(cmd.get('status', ''), cmd.get('regression')),
+                        cmd.get('duration', ''),
+                        cmd.get('cache', '')
                     )
-            except Exception as e:
-                print(f"Error loading command history: {e}")
+                )
+        except Exception as e:
+            logging.error(f"Error loading command history: {e}")
+    
+    def on_tree_scroll(self, scrollbar, first, last):
+        scrollbar.set(first, last)
+        if (float(last) >= 1.0 and not self._more_job
+                and self.results is not None and not self.results.exhausted):
+            # Outside the scroll callback, which may run mid-redraw
+            self._more_job = self.after_idle(self.load_more)
     
     def add_output(self, output):
         """Add output to the output text area"""
-        self.output_text.insert(tk.END, output)
-        self.output_text.see(tk.END)
+        self.console.write(output)
@@ -0,0 +1,129 @@
+import re
+import threading
+from collections import defaultdict, deque
+from datetime import datetime
+from typing import Deque, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+# Successful runs of a signature needed before its runs can be flagged
+MIN_SAMPLES = 5
+
+# Recent runs per signature that make up the baseline
+BASELINE_WINDOW = 200
+
+DEFAULT_REGRESSION_FACTOR = 1.5
+
+NUMBER_RE = re.compile(r'\b\d+(\.\d+)*\b')
+HEX_RE = re.compile(r'\b[0-9a-f]{7,}\b')
+QUOTED_RE = re.compile(r'''("[^"]*"|'[^']*')''')
+
+def command_signature(command: str) -> str:
+    """Command with literal values masked, so reruns share a signature
+
+    pytest -k 'test_a' --count 3 and pytest -k 'test_b' --count 5 both
+    become pytest -k ? --count #.
+    """
+    signature = QUOTED_RE.sub('?', command.strip())
+    signature = HEX_RE.sub('#', signature)
+    signature = NUMBER_RE.sub('#', signature)
+    return ' '.join(signature.split())
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """q-th percentile (0-100) of sorted values, interpolating linearly"""
+    if not values:
+        return 0.0
+    k = (len(values) - 1) * q / 100
+    lower = int(k)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (k - lower)
+
+class SignatureStats(NamedTuple):
+    signature: str
+    runs: int
+    failures: int
+    p50: float
+    p95: float
+    p99: float
+    last: float
+    regressions: int
+    # (YYYY-MM-DD, p50 of that day's successful runs), oldest first
+    trend: List[Tuple[str, float]]
+
+class LatencyStats:
+    """Durations of successful runs per command signature
+
+    Built from history records that carry numeric elapsed times. The
+    engine keeps one instance and adds each run as it finishes, so the
+    p95 baseline is available without rereading the history.
+    """
+
+    def __init__(self):
+        self._samples: Dict[str, List[Tuple[float, float]]] = defaultdict(list)
+        self._recent: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=BASELINE_WINDOW))
+        self._failures: Dict[str, int] = defaultdict(int)
+        self._regressions: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_history(cls, history) -> 'LatencyStats':
+        stats = cls()
+        for _, record in history.iter_from(0):
+            if record:
+                stats.add_record(record)
+        return stats
+
+    def add_record(self, record: Dict):
+        elapsed = record.get('elapsed')
+        if elapsed is None or 'command' not in record or record.get('cache') == 'hit':
+            return
+        try:
+            timestamp = datetime.fromisoformat(record['timestamp']).timestamp()
+        except (KeyError, TypeError, ValueError):
+            timestamp = 0.0
+        self.add(record['command'], record.get('status'), timestamp, elapsed,
+                 bool(record.get('regression')))
+
+    def add(self, command: str, status: Optional[str], timestamp: float, elapsed: float,
+            regression: bool = False):
+        signature = command_signature(command)
+        with self._lock:
+            if regression:
+                self._regressions[signature] += 1
+            if status != 'Success':
+                self._failures[signature] += 1
+                return
+            self._samples[signature].append((timestamp, elapsed))
+            self._recent[signature].append(elapsed)
+
+    def baseline(self, command: str) -> Optional[float]:
+        """p95 of recent successful runs, None with too few of them"""
+        with self._lock:
+            recent = self._recent.get(command_signature(command))
+            if not recent or len(recent) < MIN_SAMPLES:
+                return None
+            return percentile(sorted(recent), 95)
+
+    def summary(self, trend_days: int = 14) -> List[SignatureStats]:
+        """Stats per signature, most frequently run first"""
+        result = []
+        with self._lock:
+            signatures = set(self._samples) | set(self._failures)
+            for signature in signatures:
+                samples = self._samples.get(signature, [])
+                values = sorted(elapsed for _, elapsed in samples)
+                days: Dict[str, List[float]] = defaultdict(list)
+                for timestamp, elapsed in samples:
+                    days[datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d')].append(elapsed)
+                trend = [(day, percentile(sorted(days[day]), 50)) for day in sorted(days)[-trend_days:]]
+                result.append(SignatureStats(
+                    signature,
+                    len(samples) + self._failures.get(signature, 0),
+                    self._failures.get(signature, 0),
+                    percentile(values, 50),
+                    percentile(values, 95),
+                    percentile(values, 99),
+                    samples[-1][1] if samples else 0.0,
+                    self._regressions.get(signature, 0),
+                    trend
+                ))
+        result.sort(key=lambda s: s.runs, reverse=True)
+        return result
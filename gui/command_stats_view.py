@@ -0,0 +1,97 @@
+import threading
+import tkinter as tk
+from tkinter import ttk, messagebox
+from .command_stats import LatencyStats
+
+SPARK = '▁▂▃▄▅▆▇█'
+
+def sparkline(values) -> str:
+    if not values:
+        return ''
+    low, high = min(values), max(values)
+    span = (high - low) or 1
+    return ''.join(SPARK[int((v - low) / span * (len(SPARK) - 1))] for v in values)
+
+def format_seconds(seconds: float) -> str:
+    if seconds < 1:
+        return f"{seconds * 1000:.0f} ms"
+    if seconds < 120:
+        return f"{seconds:.1f} s"
+    return f"{seconds / 60:.1f} min"
+
+class CommandStatsView(tk.Toplevel):
+    """Latency percentiles and daily trend per command signature"""
+
+    def __init__(self, parent, history):
+        super().__init__(parent)
+        self.title("Command Statistics")
+        self.geometry("900x400")
+        self.history = history
+
+        columns = ('Runs', 'Failures', 'p50', 'p95', 'p99', 'Last', 'Slow', 'Trend')
+        self.tree = ttk.Treeview(self, columns=columns, show='tree headings')
+        self.tree.heading('#0', text='Command')
+        self.tree.column('#0', width=300)
+        for column in columns:
+            self.tree.heading(column, text=column)
+            self.tree.column(column, width=70, anchor='e')
+        self.tree.column('Trend', width=140, anchor='w')
+        scrollbar = ttk.Scrollbar(self, orient='vertical', command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+
+        toolbar = ttk.Frame(self)
+        toolbar.pack(fill='x', padx=5, pady=5)
+        self.status_label = ttk.Label(toolbar, text="")
+        self.status_label.pack(side='left')
+        ttk.Button(toolbar, text="Refresh", command=self.refresh).pack(side='right')
+
+        scrollbar.pack(side='right', fill='y')
+        self.tree.pack(fill='both', expand=True, padx=5, pady=5)
+        self.tree.tag_configure('slow', foreground='red')
+
+        self.refresh()
+
+    def refresh(self):
+        """Rebuild the statistics from the history in the background"""
+        self.status_label.config(text="Loading...")
+        result = {}
+
+        def load():
+            try:
+                result['summary'] = LatencyStats.from_history(self.history).summary()
+            except Exception as e:
+                result['error'] = str(e)
+
+        thread = threading.Thread(target=load, daemon=True)
+        thread.start()
+        self.after(50, self.check_loaded, thread, result)
+
+    def check_loaded(self, thread, result):
+        if not self.winfo_exists():
+            return
+        if thread.is_alive():
+            self.after(50, self.check_loaded, thread, result)
+            return
+        if 'error' in result:
+            self.status_label.config(text="")
+            messagebox.showerror("Error", f"Failed to load statistics: {result['error']}")
+            return
+
+        for item in self.tree.get_children():
+            self.tree.delete(item)
+        summary = result['summary']
+        for stats in summary:
+            self.tree.insert('', 'end', text=stats.signature, tags=('slow',) if stats.regressions else (), values=(
+                stats.runs,
+                stats.failures,
+                format_seconds(stats.p50),
+                format_seconds(stats.p95),
+                format_seconds(stats.p99),
+                format_seconds(stats.last),
+                stats.regressions,
+                sparkline([p50 for _, p50 in stats.trend])
+            ))
+        self.status_label.config(
+            text=f"{len(summary)} command signature(s); times are for successful runs, "
+                 f"trend is the daily median"
+        )
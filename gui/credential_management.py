@@ -1,8 +1,14 @@
 import tkinter as tk
-from tkinter import ttk, filedialog, messagebox
+from tkinter import ttk, filedialog, messagebox, simpledialog
 import os
 import re
 import logging
+from .file_writer import atomic_write
+from .keys_file import (
+    KeysFile, check_entry, compile_placeholders, credential_format, file_stamp,
+    format_credentials, load_credentials, substitute
+)
+from .redaction import SecretRedactor
 
 class CredentialManagement(ttk.LabelFrame):
     def __init__(self, parent):
@@ -10,6 +16,10 @@ class CredentialManagement(ttk.LabelFrame):
         
         # State
         self.keys_file = None
+        self.keys = None
+        self._redactor = None
+        # task.md path -> (stamp, (service, keys, placeholder regex))
+        self._task_credentials = {}
         
         # Add credential frame
         cred_frame = ttk.LabelFrame(self, text="Add Credential")
@@ -37,6 +47,14 @@ class CredentialManagement(ttk.LabelFrame):
         self.value_entry.pack(side='left', fill='x', expand=True)
         
         ttk.Button(cred_frame, text="Add", command=self.add_credential).pack(pady=5)
+        self.status_label = ttk.Label(cred_frame, text="")
+        self.status_label.pack(pady=(0, 5))
+        
+        # Bulk import/export
+        bulk_frame = ttk.Frame(self)
+        bulk_frame.pack(fill='x', padx=5)
+        ttk.Button(bulk_frame, text="Import...", command=self.import_credentials).pack(side='left')
+        ttk.Button(bulk_frame, text="Export...", command=self.export_credentials).pack(side='left', padx=5)
         
         # Credentials list
         self.creds_tree = ttk.Treeview(self, columns=('Value',), show='tree headings')
@@ -46,10 +64,16 @@ class CredentialManagement(ttk.LabelFrame):
     def set_keys_file(self, file_path):
         """Set the keys file and update UI"""
         self.keys_file = file_path
+        self.keys = KeysFile(file_path) if file_path else None
+        self._redactor = SecretRedactor(self.keys) if self.keys else None
         self.refresh_credentials()
     
+    def redactor(self):
+        """Masks the keys file's values in text; None without a keys file"""
+        return self._redactor
+    
     def add_credential(self):
-        """Add a new credential"""
+        """Add a credential, or update the key if it already exists"""
         if not self.keys_file:
             messagebox.showwarning("Warning", "No keys file configured in project settings")
             return
@@ -62,49 +86,145 @@ class CredentialManagement(ttk.LabelFrame):
             messagebox.showwarning("Warning", "Please fill in all fields")
             return
         
-        # Read current content
         try:
-            with open(self.keys_file) as f:
-                content = f.read()
-        except:
-            content = ""
-        
-        # Find or create service section
-        if f"[{service}]" not in content:
-            if content and not content.endswith('\n\n'):
-                content += '\n\n'
-            content += f"[{service}]\n"
-        
-        # Add key-value pair
-        lines = content.split('\n')
-        service_section = False
-        key_added = False
-        
-        new_lines = []
-        for line in lines:
-            if line.strip() == f"[{service}]":
-                service_section = True
-                new_lines.append(line)
-                new_lines.append(f"{key}={value}")
-                key_added = True
-            elif line.strip().startswith('['):
-                service_section = False
-                if not key_added and service_section:
-                    new_lines.append(f"{key}={value}")
-                new_lines.append(line)
-            else:
-                new_lines.append(line)
-        
-        # Write back to file
-        with open(self.keys_file, 'w') as f:
-            f.write('\n'.join(new_lines))
+            change, = self.keys.upsert([(service, key, value)])
+        except ValueError as e:
+            messagebox.showwarning("Warning", str(e))
+            return
+        except OSError as e:
+            logging.error(f"Error saving credential: {e}")
+            messagebox.showerror("Error", f"Failed to save credential: {e}")
+            return
+        self.status_label.config(text=f"{change.key} {change.action} in [{change.service}]")
         
         # Clear entries
         self.service_entry.delete(0, 'end')
         self.key_entry.delete(0, 'end')
         self.value_entry.delete(0, 'end')
         
-        self.refresh_credentials()
+        if change.action != 'unchanged':
+            self.refresh_credentials()
+    
+    def import_credentials(self):
+        """Merge credentials from a .env, INI or JSON file in one write"""
+        if not self.keys_file:
+            messagebox.showwarning("Warning", "No keys file configured in project settings")
+            return
+        
+        path = filedialog.askopenfilename(
+            title="Import Credentials",
+            filetypes=[("Credential files", "*.env .env* *.ini *.cfg *.keys *.json"), ("All files", "*.*")]
+        )
+        if not path:
+            return
+        
+        try:
+            sections = load_credentials(path)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Error", f"Failed to read {os.path.basename(path)}: {e}")
+            return
+        
+        # .env files and flat JSON name no service
+        if '' in sections:
+            default = os.path.splitext(os.path.basename(path))[0].lstrip('.') or 'env'
+            service = simpledialog.askstring(
+                "Import Credentials", "Service for the imported keys:", initialvalue=default, parent=self
+            )
+            if not service:
+                return
+            keys = sections.pop('')
+            sections.setdefault(service.strip(), {}).update(keys)
+        
+        entries, invalid = [], []
+        for service, keys in sections.items():
+            for key, value in keys.items():
+                try:
+                    check_entry(service, key, value)
+                    entries.append((service, key, value))
+                except ValueError as e:
+                    invalid.append(str(e))
+        if not entries:
+            messagebox.showwarning("Import", "No credentials to import" + "".join(f"\n{e}" for e in invalid[:10]))
+            return
+        
+        existing = self.keys.sections
+        conflicts = [
+            f"{service}.{key}" for service, key, value in entries
+            if existing.get(service, {}).get(key, value) != value
+        ]
+        overwrite = True
+        if conflicts:
+            overwrite = messagebox.askyesnocancel(
+                "Conflicts",
+                f"{len(conflicts)} key(s) already have a different value:\n"
+                + "\n".join(conflicts[:10])
+                + ("\n..." if len(conflicts) > 10 else "")
+                + "\n\nYes: use the imported values\nNo: keep the existing values"
+            )
+            if overwrite is None:
+                return
+        
+        try:
+            changes = self.keys.upsert(entries, overwrite=overwrite)
+        except OSError as e:
+            logging.error(f"Error importing credentials: {e}")
+            messagebox.showerror("Error", f"Failed to save credentials: {e}")
+            return
+        
+        counts = {}
+        for change in changes:
+            counts[change.action] = counts.get(change.action, 0) + 1
+        message = ", ".join(
+            f"{counts[action]} {label}" for action, label in
+            (('added', 'added'), ('updated', 'updated'), ('unchanged', 'unchanged'), ('conflict', 'kept'))
+            if action in counts
+        )
+        self.status_label.config(text=f"Import: {message}")
+        if counts.get('added') or counts.get('updated'):
+            self.refresh_credentials()
+        if invalid:
+            details = "\n".join(invalid[:10])
+            messagebox.showwarning("Import", f"{message}; {len(invalid)} skipped:\n{details}")
+        else:
+            messagebox.showinfo("Import", message)
+    
+    def export_credentials(self):
+        """Write the keys file's credentials to a .env, INI or JSON file
+        
+        A .env file holds one service: the one selected in the list.
+        """
+        if not self.keys_file:
+            messagebox.showwarning("Warning", "No keys file configured in project settings")
+            return
+        
+        path = filedialog.asksaveasfilename(
+            title="Export Credentials",
+            defaultextension='.json',
+            filetypes=[("JSON", "*.json"), ("INI", "*.ini"), (".env", "*.env"), ("All files", "*.*")]
+        )
+        if not path:
+            return
+        
+        sections = self.keys.sections
+        kind = credential_format(path)
+        if kind == 'env':
+            selected = self.creds_tree.selection()
+            if not selected:
+                messagebox.showwarning("Warning", "Please select the service to export as .env")
+                return
+            item = self.creds_tree.parent(selected[0]) or selected[0]
+            service = self.creds_tree.item(item, 'text')
+            sections = {service: sections.get(service, {})}
+        
+        try:
+            # The export holds the values in plain text
+            atomic_write(path, format_credentials(sections, kind), mode=0o600)
+        except OSError as e:
+            logging.error(f"Error exporting credentials: {e}")
+            messagebox.showerror("Error", f"Failed to export credentials: {e}")
+            return
+        count = sum(len(keys) for keys in sections.values())
+        self.status_label.config(text=f"Exported {count} key(s) to {os.path.basename(path)}")
     
     def refresh_credentials(self):
         """Refresh the credentials list"""
@@ -115,22 +235,27 @@ class CredentialManagement(ttk.LabelFrame):
         for item in self.creds_tree.get_children():
             self.creds_tree.delete(item)
         
-        # Read and parse keys file
-        current_section = None
-        section_id = None
-        
-        with open(self.keys_file) as f:
-            for line in f:
-                line = line.strip()
-                if not line or line.startswith('#'):
-                    continue
-                
-                if line.startswith('[') and line.endswith(']'):
-                    current_section = line[1:-1]
-                    section_id = self.creds_tree.insert('', 'end', text=current_section)
-                elif '=' in line and current_section:
-                    key, value = line.split('=', 1)
-                    self.creds_tree.insert(section_id, 'end', text=key.strip(), values=('••••••',))
+        for service, keys in self.keys.sections.items():
+            section_id = self.creds_tree.insert('', 'end', text=service)
+            for key in keys:
+                self.creds_tree.insert(section_id, 'end', text=key, values=('••••••',))
+    
+    def task_credentials(self, task_path):
+        """(service, keys, placeholder regex) of a task.md
+
+        Parsed and compiled again only when the task.md changes. Cached by
+        the file task_path resolves to: current_task.md is a symlink that
+        is repointed when another task becomes current.
+        """
+        task_path = os.path.realpath(task_path)
+        stamp = file_stamp(task_path)
+        cached = self._task_credentials.get(task_path)
+        if cached and cached[0] == stamp:
+            return cached[1]
+        service, keys = self.parse_task_credentials(task_path)
+        result = (service, keys, compile_placeholders(keys))
+        self._task_credentials[task_path] = (stamp, result)
+        return result
     
     def parse_task_credentials(self, task_path):
         """Parse credentials from task.md"""
@@ -169,36 +294,17 @@ class CredentialManagement(ttk.LabelFrame):
         
         try:
             # Get credentials from task
-            service, keys = self.parse_task_credentials(task_path)
+            service, keys, placeholders = self.task_credentials(task_path)
             
-            if not service or not keys:
+            if not service or placeholders is None:
                 return command
             
-            # Read keys file
-            with open(self.keys_file) as f:
-                content = f.read()
-            
-            # Find service section
-            section_match = re.search(
-                rf'\[{service}\](.*?)(?=\[|$)',
-                content,
-                re.DOTALL
-            )
-            if not section_match:
+            section = self.keys.get(service)
+            if not section:
                 return command
             
-            section = section_match.group(1)
-            
-            # Replace keys in command
-            modified_cmd = command
-            for key in keys:
-                key = key.strip()
-                key_match = re.search(rf'{key}=(.*)', section)
-                if key_match:
-                    value = key_match.group(1).strip()
-                    modified_cmd = modified_cmd.replace(f'${key}', value)
-            
-            return modified_cmd
+            # Replace all $KEY placeholders in one pass
+            return substitute(placeholders, command, section)
             
         except Exception as e:
             logging.error(f"Error injecting credentials: {e}")
@@ -0,0 +1,200 @@
+import os
+import json
+import atexit
+import logging
+import tempfile
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+# Mode for newly created files, matching what open(path, 'w') would give
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+DEFAULT_MODE = 0o666 & ~_UMASK
+
+def _fsync_dir(path: str):
+    """Persist a rename by syncing its directory (no-op where unsupported)"""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def _write_temp(path: str, data: bytes, fsync: bool, mode: Optional[int] = None) -> str:
+    """Write data to a temp file next to path and return the temp path
+
+    The temp file gets path's current mode (DEFAULT_MODE for a new file),
+    or mode if given; mode is set before any data is written, so a
+    restrictive mode also covers the temp file's whole life.
+    """
+    directory = os.path.dirname(path) or '.'
+    # mkstemp creates the file readable by its owner only
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            if mode is not None:
+                os.fchmod(f.fileno(), mode)
+            f.write(data)
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+        if mode is None:
+            try:
+                mode = os.stat(path).st_mode & 0o777
+            except OSError:
+                mode = DEFAULT_MODE
+            os.chmod(tmp_path, mode)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return tmp_path
+
+def atomic_write(path: str, data, fsync: bool = True, mode: Optional[int] = None):
+    """Replace path with data (str or bytes) via temp file and rename
+
+    mode, if given, replaces the file's permissions (e.g. 0o600 for
+    secrets); otherwise an existing file keeps its own.
+    """
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    tmp_path = _write_temp(path, data, fsync, mode)
+    os.replace(tmp_path, path)
+    if fsync:
+        _fsync_dir(os.path.dirname(path) or '.')
+
+class FlushError(OSError):
+    """One or more queued files could not be written
+
+    failures maps each such path to its error; the other files of the
+    batch were written.
+    """
+
+    def __init__(self, failures: Dict[str, OSError]):
+        self.failures = failures
+        details = '; '.join(f"{path}: {error}" for path, error in failures.items())
+        super().__init__(f"Could not write {len(failures)} file(s): {details}")
+
+class FileWriter:
+    """Crash-safe writer that coalesces and batches file writes
+
+    write_* calls queue the latest content per path. After a short delay,
+    or on flush(), every pending file is written to a temp file, the temp
+    files are fsynced together, renamed over their targets, and each
+    affected directory is fsynced once. A crash therefore leaves either
+    the old or the new content, never a truncated file, and repeated
+    writes to the same path within the delay cost a single write.
+
+    flush() raises FlushError for files it could not write, so callers
+    that need their data on disk find out; the delayed and at-exit
+    flushes have no caller to tell and log the failures instead.
+    """
+
+    def __init__(self, delay: float = 0.1):
+        self.delay = delay
+        self._pending: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+
+    def write_bytes(self, path: str, data: bytes):
+        """Queue data to be written to path"""
+        path = os.path.abspath(path)
+        with self._lock:
+            self._pending[path] = data
+            if self._timer is None:
+                self._timer = threading.Timer(self.delay, self.flush_logged)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def write_text(self, path: str, text: str):
+        self.write_bytes(path, text.encode('utf-8'))
+
+    def write_json(self, path: str, obj: Any, **kwargs):
+        self.write_text(path, json.dumps(obj, **kwargs))
+
+    def pending(self, path: str) -> Optional[bytes]:
+        """Content queued for path but not yet on disk"""
+        with self._lock:
+            return self._pending.get(os.path.abspath(path))
+
+    def flush_logged(self):
+        """flush(), logging failures instead of raising them"""
+        try:
+            self.flush()
+        except FlushError as e:
+            for path, error in e.failures.items():
+                logging.error(f"Error writing {path}: {error}")
+
+    def flush(self):
+        """Write all pending files now
+
+        Every file that can be written is; FlushError then reports the
+        ones that could not.
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            if not pending:
+                return
+
+            failures: Dict[str, OSError] = {}
+            temps: List[Tuple[str, str]] = []
+            try:
+                for path, data in pending.items():
+                    try:
+                        temps.append((_write_temp(path, data, fsync=False), path))
+                    except OSError as e:
+                        failures[path] = e
+
+                # One sync pass over the batch instead of one per write call
+                synced = []
+                for tmp_path, path in temps:
+                    try:
+                        fd = os.open(tmp_path, os.O_RDONLY)
+                        try:
+                            os.fsync(fd)
+                        finally:
+                            os.close(fd)
+                    except OSError as e:
+                        failures[path] = e
+                        continue
+                    synced.append((tmp_path, path))
+
+                directories = set()
+                for tmp_path, path in synced:
+                    try:
+                        os.replace(tmp_path, path)
+                    except OSError as e:
+                        failures[path] = e
+                        continue
+                    directories.add(os.path.dirname(path))
+                temps = [(tmp_path, path) for tmp_path, path in temps if path in failures]
+                for directory in directories:
+                    _fsync_dir(directory)
+            finally:
+                for tmp_path, _ in temps:
+                    try:
+                        os.unlink(tmp_path)
+                    except OSError:
+                        pass
+            if failures:
+                raise FlushError(failures)
+
+_writer: Optional[FileWriter] = None
+_writer_lock = threading.Lock()
+
+def get_writer() -> FileWriter:
+    """Shared writer used by every task-file writer; flushed at exit"""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = FileWriter()
+            atexit.register(_writer.flush_logged)
+        return _writer
@@ -0,0 +1,255 @@
+import re
+import threading
+from array import array
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+TOKEN_RE = re.compile(r'\w+')
+
+# Tokens are stored in the trie up to this length; longer query terms are
+# checked against the command text itself
+TRIE_DEPTH = 24
+
+# Typos allowed in a fuzzy term match: 1 up to this length, else 2
+FUZZY_SHORT = 5
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(text.lower())
+
+def trigrams(token: str) -> List[str]:
+    """Trigrams of token with a space marking each end"""
+    token = f' {token} '
+    return [token[i:i + 3] for i in range(len(token) - 2)]
+
+def parse_time(timestamp: Optional[str]) -> float:
+    try:
+        return datetime.fromisoformat(timestamp).timestamp()
+    except (TypeError, ValueError):
+        return 0.0
+
+class HistorySearchIndex:
+    """Prefix and fuzzy search over the command text of a HistoryStore
+
+    Documents are history positions (0 is the oldest record). Every token
+    of a command goes into a character trie, so each query term matches
+    commands with a word starting with it; a trigram index over the
+    distinct words adds words containing the term. Terms with typos
+    (gti stauts) are matched by walking the trie with a bounded edit
+    distance. Postings are uint32 arrays appended in position order.
+
+    The index catches up with records appended since the last search, and
+    is rebuilt when compaction renumbers the log. Records whose update
+    moved them to the end are indexed again under the new position; the
+    old one is skipped through latest.
+    """
+
+    def __init__(self, history):
+        self.history = history
+        self._trie: Dict[str, Any] = {}
+        self._trigrams: Dict[str, Set[str]] = {}
+        self._commands: List[Optional[str]] = []
+        self._times = array('d')
+        self._ids: List[Optional[str]] = []
+        self._latest: Dict[str, int] = {}
+        self._log_id = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._latest)
+
+    def refresh(self):
+        """Index records appended since the last call"""
+        with self._lock:
+            log_id = self.history.log_id
+            if log_id != self._log_id or len(self.history.offsets) < len(self._commands):
+                self._reset()
+                self._log_id = log_id
+            for position, record in self.history.iter_from(len(self._commands)):
+                self._add(position, record)
+
+    def _reset(self):
+        self._trie = {}
+        self._trigrams = {}
+        self._commands = []
+        self._times = array('d')
+        self._ids = []
+        self._latest = {}
+
+    def _add(self, position: int, record: Optional[Dict[str, Any]]):
+        if record is None or 'command' not in record:
+            self._commands.append(None)
+            self._times.append(0.0)
+            self._ids.append(None)
+            return
+        command = record['command']
+        self._commands.append(command)
+        self._times.append(parse_time(record.get('timestamp')))
+        record_id = record.get('id')
+        self._ids.append(record_id)
+        if record_id:
+            self._latest[record_id] = position
+
+        for token in set(TOKEN_RE.findall(command.lower())):
+            node = self._trie
+            for char in token[:TRIE_DEPTH]:
+                child = node.get(char)
+                if child is None:
+                    child = node[char] = {}
+                node = child
+            postings = node.get('')
+            if postings is None:
+                postings = node[''] = array('I')
+                # First time this word is seen
+                for gram in trigrams(token):
+                    self._trigrams.setdefault(gram, set()).add(token)
+            postings.append(position)
+
+    def _live(self, position: int) -> bool:
+        record_id = self._ids[position]
+        if record_id is None:
+            return self._commands[position] is not None
+        return self._latest.get(record_id) == position
+
+    def _prefix_docs(self, prefix: str) -> Set[int]:
+        node = self._trie
+        for char in prefix[:TRIE_DEPTH]:
+            node = node.get(char)
+            if node is None:
+                return set()
+        docs = self._subtree_docs(node)
+        if len(prefix) > TRIE_DEPTH:
+            docs = {d for d in docs if any(t.startswith(prefix) for t in tokenize(self._commands[d]))}
+        return docs
+
+    @staticmethod
+    def _subtree_docs(node: Dict[str, Any]) -> Set[int]:
+        docs: Set[int] = set()
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            for key, child in node.items():
+                if key:
+                    stack.append(child)
+                else:
+                    docs.update(child)
+        return docs
+
+    def _infix_docs(self, term: str) -> Set[int]:
+        """Commands with a word containing term (at least 3 characters)"""
+        grams = [self._trigrams.get(g, set()) for g in trigrams(term)[1:-1]]
+        if not grams:
+            return set()
+        docs: Set[int] = set()
+        for token in set.intersection(*grams):
+            if term in token:
+                docs.update(self._token_docs(token))
+        return docs
+
+    def _fuzzy_docs(self, term: str) -> Set[int]:
+        """Commands with a word starting within one or two typos of term
+
+        Walks the trie computing one row of the optimal string alignment
+        distance per character, pruning branches that exceed the limit.
+        """
+        limit = 1 if len(term) <= FUZZY_SHORT else 2
+        docs: Set[int] = set()
+        stack = [(self._trie, list(range(len(term) + 1)), None, '')]
+        while stack:
+            node, row, prev, last = stack.pop()
+            if row[-1] <= limit:
+                docs |= self._subtree_docs(node)
+                continue
+            for char, child in node.items():
+                if not char:
+                    continue
+                new = [row[0] + 1]
+                for j in range(1, len(term) + 1):
+                    cost = 0 if term[j - 1] == char else 1
+                    value = min(row[j] + 1, new[j - 1] + 1, row[j - 1] + cost)
+                    if prev is not None and j > 1 and term[j - 1] == last and term[j - 2] == char:
+                        value = min(value, prev[j - 2] + 1)
+                    new.append(value)
+                if min(new) <= limit:
+                    stack.append((child, new, row, char))
+        return docs
+
+    def _token_docs(self, token: str) -> array:
+        node = self._trie
+        for char in token[:TRIE_DEPTH]:
+            node = node[char]
+        return node['']
+
+    def search(self, query: str = '', status: Optional[Iterable[str]] = None,
+               since: Optional[datetime] = None, until: Optional[datetime] = None) -> 'HistoryResults':
+        """Commands matching query, newest first, then fuzzy matches
+
+        Every word in query must start, or be part of, a word of the
+        command. Commands that only match with typos in some words (one,
+        or two for words longer than FUZZY_SHORT) come after the exact
+        matches. status (a set
+        of statuses) and the since/until datetimes filter the results; an
+        empty query lists everything.
+        """
+        self.refresh()
+        with self._lock:
+            terms = tokenize(query)
+            if terms:
+                exact: Optional[Set[int]] = None
+                close: Optional[Set[int]] = None
+                for term in terms:
+                    docs = self._prefix_docs(term)
+                    fuzzy = set()
+                    if len(term) > 2:
+                        docs |= self._infix_docs(term)
+                        fuzzy = self._fuzzy_docs(term)
+                    exact = docs if exact is None else exact & docs
+                    close = (docs | fuzzy) if close is None else close & (docs | fuzzy)
+                ranked = sorted(exact, reverse=True) + sorted(close - exact, reverse=True)
+            else:
+                ranked = range(len(self._commands) - 1, -1, -1)
+
+            start = since.timestamp() if since else None
+            end = until.timestamp() if until else None
+            times = self._times
+            positions = [
+                d for d in ranked
+                if self._live(d)
+                and (start is None or times[d] >= start)
+                and (end is None or times[d] < end)
+            ]
+        return HistoryResults(self.history, positions, self._ids, status)
+
+class HistoryResults:
+    """Matches from HistorySearchIndex, read from the log a page at a time"""
+
+    PAGE = 100
+
+    def __init__(self, history, positions: List[int], ids: List[Optional[str]],
+                 status: Optional[Iterable[str]] = None):
+        self.history = history
+        self.positions = positions
+        self.ids = ids
+        self.status = set(status) if status else None
+        self.cursor = 0
+
+    def __len__(self) -> int:
+        """Matches before the status filter"""
+        return len(self.positions)
+
+    @property
+    def exhausted(self) -> bool:
+        return self.cursor >= len(self.positions)
+
+    def fetch(self, count: int = PAGE) -> List[Dict[str, Any]]:
+        """The next count matching records"""
+        records = []
+        while len(records) < count and self.cursor < len(self.positions):
+            position = self.positions[self.cursor]
+            self.cursor += 1
+            record = self.history.record_at(position)
+            # Skip records moved or dropped since the search
+            if record is None or record.get('id') != self.ids[position]:
+                continue
+            if self.status is None or record.get('status') in self.status:
+                records.append(record)
+        return records
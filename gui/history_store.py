@@ -0,0 +1,417 @@
+import os
+import json
+import uuid
+import logging
+from array import array
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+from .run_log import LOG_SUFFIX, remove_run_log
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-writer only
+    fcntl = None
+
+LOG_NAME = 'command_history.jsonl'
+INDEX_NAME = 'command_history.idx'
+LOCK_NAME = 'command_history.lock'
+LEGACY_NAME = 'command_history.json'
+
+# Records read per block when iterating newest first
+READ_BLOCK = 256
+
+# Bytes read per block when counting blanked lines
+SCAN_BLOCK = 1 << 20
+
+class HistoryStore:
+    """Append-only command history log for a project
+
+    Each command is one JSON line in .cline/command_history.jsonl. A
+    sidecar (.cline/command_history.idx) holds the byte offset of every
+    record as native uint64s, so "newest first" pages are read from the
+    end of the log without parsing the rest of it. Appends from several
+    processes are serialized with an flock, and the sidecar is caught up
+    from the log whenever it lags behind (e.g. after a crash).
+
+    Records can be updated in place (e.g. a "Running" command finishing):
+    append() can reserve padding after a record, and update() rewrites the
+    line within its original length. An update that does not fit blanks
+    the old line and appends the merged record instead.
+
+    Once the log holds half again as many records as max_records, it is
+    compacted down to the newest max_records.
+
+    The legacy command_history.json (a newest-first JSON array) is
+    migrated into the log on first use.
+    """
+
+    def __init__(self, cline_dir: str, max_records: Optional[int] = 10000):
+        self.cline_dir = cline_dir
+        self.max_records = max_records
+        self.log_path = os.path.join(cline_dir, LOG_NAME)
+        self.index_path = os.path.join(cline_dir, INDEX_NAME)
+        self.lock_path = os.path.join(cline_dir, LOCK_NAME)
+        self.legacy_path = os.path.join(cline_dir, LEGACY_NAME)
+
+        self.offsets = array('Q')
+        self._log_size = 0
+        self._log_ino = None
+        self._live: Tuple[Optional[Tuple[int, int]], int] = (None, 0)
+        self._search_index = None
+        os.makedirs(cline_dir, exist_ok=True)
+        with self._locked():
+            self.migrate()
+            self._sync_index()
+
+    @contextmanager
+    def _locked(self):
+        """Exclusive lock shared with other processes writing this history"""
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _refresh(self):
+        """Pick up records appended or compacted by another writer"""
+        try:
+            st = os.stat(self.log_path)
+        except OSError:
+            st = None
+        if st is None or st.st_ino != self._log_ino or st.st_size != self._log_size:
+            with self._locked():
+                self._sync_index()
+
+    def _sync_index(self):
+        """Load the sidecar and index any log records it is missing
+
+        Must be called with the lock held.
+        """
+        try:
+            st = os.stat(self.log_path)
+        except OSError:
+            self.offsets = array('Q')
+            self._log_size, self._log_ino = 0, None
+            return
+
+        if st.st_ino != self._log_ino:
+            self.offsets = array('Q')
+        self._log_ino = st.st_ino
+        rebuilt = False
+
+        # Offsets this process has not seen yet
+        try:
+            with open(self.index_path, 'rb') as f:
+                f.seek(len(self.offsets) * self.offsets.itemsize)
+                data = f.read()
+            data = data[:len(data) - len(data) % self.offsets.itemsize]
+            self.offsets.frombytes(data)
+        except OSError:
+            pass
+
+        if self.offsets and self.offsets[-1] >= st.st_size:
+            logging.warning("Command history index is stale, rebuilding")
+            self.offsets = array('Q')
+            rebuilt = True
+
+        with open(self.log_path, 'rb+') as f:
+            start = 0
+            if self.offsets:
+                # Resume after the last indexed record
+                f.seek(self.offsets[-1])
+                f.readline()
+                start = f.tell()
+            f.seek(start)
+            missing = array('Q')
+            pos = start
+            for line in f:
+                if not line.endswith(b'\n'):
+                    # Torn write from a crash; drop it
+                    f.truncate(pos)
+                    break
+                missing.append(pos)
+                pos += len(line)
+
+        if missing or rebuilt:
+            self.offsets.extend(missing)
+            self._write_index()
+        self._log_size = os.path.getsize(self.log_path)
+
+    def _write_index(self):
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            self.offsets.tofile(f)
+        os.replace(tmp_path, self.index_path)
+
+    def migrate(self):
+        """Convert the legacy command_history.json into the log
+
+        Must be called with the lock held. The old file is kept as
+        command_history.json.migrated.
+        """
+        if not os.path.exists(self.legacy_path) or os.path.exists(self.log_path):
+            return
+        try:
+            with open(self.legacy_path) as f:
+                history = json.load(f)
+        except Exception as e:
+            logging.error(f"Error migrating command history: {e}")
+            return
+
+        tmp_path = self.log_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            # Legacy file is newest first, the log is oldest first
+            for record in reversed(history):
+                record.setdefault('id', uuid.uuid4().hex)
+                f.write(json.dumps(record) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.log_path)
+        os.replace(self.legacy_path, self.legacy_path + '.migrated')
+        if os.path.exists(self.index_path):
+            os.unlink(self.index_path)
+
+    def append(self, record: Dict[str, Any], reserve: int = 0) -> str:
+        """Append a command record and return its id
+
+        reserve bytes of padding are left for later update() calls.
+        """
+        record = dict(record)
+        record.setdefault('id', uuid.uuid4().hex)
+        line = json.dumps(record).encode('utf-8') + b' ' * reserve + b'\n'
+
+        with self._locked():
+            self._sync_index()
+            self._append_line(line)
+
+        if self.max_records and len(self.offsets) > self.max_records * 1.5:
+            self.compact(self.max_records)
+        return record['id']
+
+    def _append_line(self, line: bytes):
+        """Append one encoded line; must be called with the lock held"""
+        fd = os.open(self.log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            offset = os.fstat(fd).st_size
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+        with open(self.index_path, 'ab') as f:
+            f.write(array('Q', [offset]).tobytes())
+        self.offsets.append(offset)
+        st = os.stat(self.log_path)
+        self._log_size, self._log_ino = st.st_size, st.st_ino
+
+    def update(self, record_id: str, fields: Dict[str, Any]) -> bool:
+        """Merge fields into a record, in place when it fits
+
+        Returns False if the record is no longer in the log.
+        """
+        with self._locked():
+            self._sync_index()
+            found = self._find(record_id)
+            if found is None:
+                return False
+            offset, line, record = found
+            record.update(fields)
+            data = json.dumps(record).encode('utf-8')
+            width = len(line.rstrip(b'\n'))
+
+            fd = os.open(self.log_path, os.O_WRONLY)
+            try:
+                if len(data) <= width:
+                    os.pwrite(fd, data.ljust(width), offset)
+                    return True
+                # Does not fit: blank the old line, re-append the record
+                os.pwrite(fd, b'{}'.ljust(width), offset)
+            finally:
+                os.close(fd)
+            self._append_line(data + b'\n')
+            return True
+
+    def _find(self, record_id: str):
+        """(offset, line, record) of the newest record with record_id"""
+        needle = json.dumps(record_id).encode('utf-8')
+        for offset, line in self._iter_lines():
+            if needle not in line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get('id') == record_id:
+                return offset, line, record
+        return None
+
+    def _iter_lines(self, start: int = 0):
+        """Yield (offset, line) newest first, skipping the first start lines"""
+        offsets = self.offsets
+        end = len(offsets) - start
+        if end <= 0:
+            return
+        with open(self.log_path, 'rb') as f:
+            while end > 0:
+                begin = max(0, end - READ_BLOCK)
+                f.seek(offsets[begin])
+                block = f.read(
+                    (offsets[end] if end < len(offsets) else self._log_size) - offsets[begin]
+                )
+                lines = block.splitlines(keepends=True)
+                for i in range(len(lines) - 1, -1, -1):
+                    yield offsets[begin + i], lines[i]
+                end = begin
+
+    def __len__(self) -> int:
+        """Number of records, not counting lines blanked by update()
+
+        Makes an empty store falsy: callers holding an optional store
+        must test it with "is None", not truthiness.
+        """
+        self._refresh()
+        if not self.offsets:
+            return 0
+        # Blanking a line always appends its record, so the count only
+        # changes when the log is appended to or compacted
+        key = (self._log_ino, self._log_size)
+        if self._live[0] != key:
+            self._live = (key, len(self.offsets) - self._count_blank())
+        return self._live[1]
+
+    def _count_blank(self) -> int:
+        """Lines in the log that were blanked to '{}'"""
+        count, carry = 0, b'\n'
+        remaining = self._log_size
+        with open(self.log_path, 'rb') as f:
+            while remaining > 0:
+                block = f.read(min(remaining, SCAN_BLOCK))
+                if not block:
+                    break
+                remaining -= len(block)
+                # carry: the end of the previous block, for lines starting
+                # right at a block boundary
+                count += (carry + block).count(b'\n{}')
+                carry = (carry + block)[-2:]
+        return count
+
+    @property
+    def log_id(self) -> Optional[int]:
+        """Changes whenever compaction renumbers the records"""
+        self._refresh()
+        return self._log_ino
+
+    def iter_from(self, position: int = 0) -> Iterator[Tuple[int, Optional[Dict[str, Any]]]]:
+        """Yield (position, record) oldest first from position on
+
+        record is None for blanked or unreadable lines, so positions stay
+        aligned with the sidecar.
+        """
+        self._refresh()
+        offsets, size = self.offsets, self._log_size
+        if position >= len(offsets):
+            return
+        with open(self.log_path, 'rb') as f:
+            f.seek(offsets[position])
+            for n in range(position, len(offsets)):
+                line = f.readline()
+                if not line or f.tell() > size:
+                    break
+                try:
+                    record = json.loads(line) or None
+                except ValueError:
+                    record = None
+                yield n, record
+
+    def record_at(self, position: int) -> Optional[Dict[str, Any]]:
+        """The record at position (oldest is 0), None if blanked"""
+        if position >= len(self.offsets):
+            return None
+        with open(self.log_path, 'rb') as f:
+            f.seek(self.offsets[position])
+            try:
+                return json.loads(f.readline()) or None
+            except ValueError:
+                return None
+
+    def search_index(self):
+        """Search index over command text, caught up on every search"""
+        if self._search_index is None:
+            from .history_search import HistorySearchIndex
+            self._search_index = HistorySearchIndex(self)
+        return self._search_index
+
+    def iter_newest(self, start: int = 0) -> Iterator[Dict[str, Any]]:
+        """Yield records newest first, skipping the first start records"""
+        self._refresh()
+        for _, line in self._iter_lines(start):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record:
+                yield record
+
+    def page(self, start: int = 0, count: int = 100) -> List[Dict[str, Any]]:
+        """Up to count records, newest first, starting at position start"""
+        records = []
+        for record in self.iter_newest(start):
+            records.append(record)
+            if len(records) >= count:
+                break
+        return records
+
+    def _remove_run_logs(self, logs: Set[str]):
+        """Delete run logs named by records, relative to .cline"""
+        root = os.path.realpath(self.cline_dir)
+        for log in logs:
+            path = os.path.realpath(os.path.join(root, log))
+            # Records are data: never follow one outside .cline
+            if path.startswith(root + os.sep) and path.endswith(LOG_SUFFIX):
+                remove_run_log(path)
+
+    def compact(self, max_records: Optional[int] = None):
+        """Rewrite the log, dropping unreadable and blanked lines and, if
+        max_records is set, all but the newest max_records records
+
+        Run logs (under .cline/runs) of the dropped records are deleted.
+        """
+        with self._locked():
+            self._sync_index()
+            if not self.offsets:
+                return
+            keep = self.offsets
+            if max_records is not None and len(keep) > max_records:
+                keep = keep[len(keep) - max_records:]
+
+            tmp_path = self.log_path + '.tmp'
+            offsets = array('Q')
+            dropped_logs: Set[str] = set()
+            kept_logs: Set[str] = set()
+            with open(self.log_path, 'rb') as src, open(tmp_path, 'wb') as dst:
+                for line in src:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if not record:
+                        continue
+                    if src.tell() <= keep[0]:
+                        if record.get('log'):
+                            dropped_logs.add(record['log'])
+                        continue
+                    if record.get('log'):
+                        kept_logs.add(record['log'])
+                    offsets.append(dst.tell())
+                    dst.write(line)
+                dst.flush()
+                os.fsync(dst.fileno())
+            os.replace(tmp_path, self.log_path)
+            self._remove_run_logs(dropped_logs - kept_logs)
+
+            self.offsets = offsets
+            self._write_index()
+            st = os.stat(self.log_path)
+            self._log_size, self._log_ino = st.st_size, st.st_ino
@@ -0,0 +1,338 @@
+import os
+import re
+import json
+import configparser
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, NamedTuple, Optional, Pattern, Tuple
+from .file_writer import atomic_write
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-writer only
+    fcntl = None
+
+def file_stamp(path: str) -> Optional[Tuple[int, int]]:
+    """(mtime in ns, size) of path, None if it does not exist"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+def parse_keys(text: str) -> Dict[str, Dict[str, str]]:
+    """Sections of a keys file as service -> key -> value
+
+    Blank lines and # comments are skipped, as are key=value lines before
+    the first [service] header. If a key repeats within a section, the
+    first value wins.
+    """
+    sections: Dict[str, Dict[str, str]] = {}
+    current = None
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        if line.startswith('[') and line.endswith(']'):
+            current = sections.setdefault(line[1:-1], {})
+        elif '=' in line and current is not None:
+            key, value = line.split('=', 1)
+            current.setdefault(key.strip(), value.strip())
+    return sections
+
+class SectionSpan(NamedTuple):
+    """Where a service's entries sit in the lines of a keys file"""
+    # Line after the last entry of the service's first [service] block
+    end: int
+    # key -> line of its first (effective) value
+    keys: Dict[str, int]
+
+def index_sections(lines: List[str]) -> Dict[str, SectionSpan]:
+    """Line positions of every service and key, following parse_keys"""
+    ends: Dict[str, int] = {}
+    keys: Dict[str, Dict[str, int]] = {}
+    current = None
+    first_block = False
+    for number, line in enumerate(lines):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        if line.startswith('[') and line.endswith(']'):
+            current = line[1:-1]
+            # Keys of a repeated header count, but new keys go to the first block
+            first_block = current not in keys
+            if first_block:
+                keys[current] = {}
+                ends[current] = number + 1
+        elif '=' in line and current is not None:
+            keys[current].setdefault(line.split('=', 1)[0].strip(), number)
+            if first_block:
+                ends[current] = number + 1
+    return {service: SectionSpan(ends[service], keys[service]) for service in keys}
+
+class CredentialChange(NamedTuple):
+    service: str
+    key: str
+    # 'added', 'updated', 'unchanged', or 'conflict' (not overwritten)
+    action: str
+
+def check_entry(service: str, key: str, value: str):
+    """Raise ValueError for an entry that would not parse back as written"""
+    if not service or '\n' in service or service != service.strip() or ']' in service:
+        raise ValueError(f"Invalid service name: {service!r}")
+    if not key or '=' in key or '\n' in key or key != key.strip() or key.startswith(('#', '[')):
+        raise ValueError(f"Invalid key name: {key!r}")
+    if '\n' in value or value != value.strip():
+        raise ValueError(f"Invalid value for {service}.{key}: no newlines or surrounding spaces")
+
+# Formats for bulk import and export, by file extension
+CREDENTIAL_FORMATS = {'.env': 'env', '.ini': 'ini', '.cfg': 'ini', '.keys': 'ini', '.json': 'json'}
+
+ENV_LINE_RE = re.compile(r'^\s*(?:export\s+)?([A-Za-z_][A-Za-z0-9_.]*)\s*=\s*(.*?)\s*$')
+
+def credential_format(path: str) -> str:
+    """env, ini or json for a file path; .env.local and the like are env"""
+    name = os.path.basename(path).lower()
+    if name.startswith('.env'):
+        return 'env'
+    return CREDENTIAL_FORMATS.get(os.path.splitext(name)[1], 'ini')
+
+def parse_env(text: str) -> Dict[str, str]:
+    """KEY=value pairs of a .env file
+
+    Accepts export prefixes, single or double quotes, and # comments after
+    unquoted values. Raises ValueError on a line that is not an assignment.
+    """
+    values: Dict[str, str] = {}
+    for number, line in enumerate(text.splitlines(), 1):
+        if not line.strip() or line.lstrip().startswith('#'):
+            continue
+        match = ENV_LINE_RE.match(line)
+        if not match:
+            raise ValueError(f"Line {number} is not KEY=value")
+        key, value = match.groups()
+        if len(value) >= 2 and value[0] == value[-1] and value[0] in '"\'':
+            value = value[1:-1]
+            if match.group(2)[0] == '"':
+                value = re.sub(r'\\(.)', lambda m: '\n' if m.group(1) == 'n' else m.group(1), value)
+        else:
+            value = re.split(r'\s+#', value, 1)[0]
+        values[key] = value
+    return values
+
+def load_credentials(path: str) -> Dict[str, Dict[str, str]]:
+    """service -> key -> value from a .env, INI or JSON file
+
+    .env files and flat JSON objects carry no service; their keys come
+    back under the service ''. A service or key given twice in an INI or
+    JSON file is an error rather than a silent overwrite, and [DEFAULT]
+    is an ordinary service, as in keys files. Raises OSError or ValueError.
+    """
+    with open(path) as f:
+        text = f.read()
+    kind = credential_format(path)
+    if kind == 'env':
+        return {'': parse_env(text)}
+    if kind == 'json':
+        data = json.loads(text, object_pairs_hook=_unique_pairs)
+        if not isinstance(data, dict):
+            raise ValueError("Expected a JSON object")
+        if all(isinstance(v, dict) for v in data.values()):
+            sections = data
+        else:
+            sections = {'': data}
+        result = {}
+        for service, keys in sections.items():
+            for key, value in keys.items():
+                if isinstance(value, (dict, list)) or value is None:
+                    raise ValueError(f"{service}.{key}: expected a string or number" if service
+                                     else f"{key}: expected a string or number")
+            result[service] = {key: str(value) for key, value in keys.items()}
+        return result
+    parser = configparser.ConfigParser(interpolation=None, strict=True)
+    parser.optionxform = str
+    try:
+        parser.read_string(text, path)
+    except configparser.Error as e:
+        raise ValueError(str(e).splitlines()[0])
+    result = {'DEFAULT': dict(parser.defaults())} if parser.defaults() else {}
+    # _sections holds each section's own keys, without [DEFAULT] merged in
+    for service, keys in parser._sections.items():
+        result[service] = dict(keys)
+    return result
+
+def _unique_pairs(pairs: List[Tuple[str, object]]) -> Dict[str, object]:
+    """json object_pairs_hook rejecting repeated keys"""
+    result: Dict[str, object] = {}
+    for key, value in pairs:
+        if key in result:
+            raise ValueError(f"{key!r} given twice")
+        result[key] = value
+    return result
+
+def env_value(value: str) -> str:
+    """value as written in a .env file, double-quoted when it needs to be"""
+    if not re.search(r'[\s#\'"\\]', value):
+        return value
+    return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+def format_credentials(sections: Dict[str, Dict[str, str]], kind: str) -> str:
+    """Text of an env, ini or json file holding sections
+
+    env has no services: sections must hold a single one.
+    """
+    if kind == 'json':
+        return json.dumps(sections, indent=2) + '\n'
+    if kind == 'env':
+        (keys,) = sections.values()
+        return ''.join(f"{key}={env_value(value)}\n" for key, value in keys.items())
+    blocks = ['\n'.join([f"[{service}]"] + [f"{key}={value}" for key, value in keys.items()])
+              for service, keys in sections.items()]
+    return '\n\n'.join(blocks) + '\n'
+
+def compile_placeholders(keys: Iterable[str]) -> Optional[Pattern]:
+    """One regex matching $KEY for any of keys as a whole name
+
+    $API_KEY does not match inside $API_KEY_2: a placeholder must not be
+    followed by another name character. Longer keys are tried first.
+    """
+    keys = sorted({k for k in keys if k}, key=len, reverse=True)
+    if not keys:
+        return None
+    alternatives = '|'.join(re.escape(k) for k in keys)
+    return re.compile(rf'\$({alternatives})(?![A-Za-z0-9_])')
+
+def substitute(pattern: Optional[Pattern], command: str, values: Dict[str, str]) -> str:
+    """Replace every placeholder pattern matches in one pass
+
+    Placeholders without a value are left as they are.
+    """
+    if pattern is None or '$' not in command:
+        return command
+    return pattern.sub(lambda m: values.get(m.group(1), m.group(0)), command)
+
+class KeysFile:
+    """In-memory model of a keys file, reparsed only when it changes
+
+    Every access compares the file's mtime and size with those seen at
+    the last parse, so callers can use the model freely (e.g. once per
+    command) and pay for a stat() rather than a read and parse.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._sections: Dict[str, Dict[str, str]] = {}
+        self._stamp: Optional[Tuple[int, int]] = None
+        self._lock = threading.Lock()
+
+    @property
+    def sections(self) -> Dict[str, Dict[str, str]]:
+        """service -> key -> value; treat as read-only"""
+        stamp = file_stamp(self.path)
+        with self._lock:
+            if stamp != self._stamp:
+                self._sections = self._load() if stamp else {}
+                self._stamp = stamp
+            return self._sections
+
+    def _load(self) -> Dict[str, Dict[str, str]]:
+        try:
+            with open(self.path) as f:
+                return parse_keys(f.read())
+        except OSError:
+            return {}
+
+    @contextmanager
+    def _locked(self):
+        """Exclusive lock shared with other processes writing this file
+
+        The lock lives in a sidecar file, since every write replaces the
+        keys file itself.
+        """
+        if fcntl is None:
+            yield
+            return
+        with open(self.path + '.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def upsert(self, entries: Iterable[Tuple[str, str, str]],
+               overwrite: bool = True) -> List[CredentialChange]:
+        """Set (service, key, value) entries and return what changed
+
+        An existing key has its line rewritten in place (unless overwrite
+        is False, which reports it as a conflict); a new key is added
+        after the last entry of its service, and a new service is appended
+        at the end. Comments, ordering and all other lines are kept. The
+        file is reread under the lock and replaced via temp file and rename,
+        so concurrent writers cannot lose each other's changes, and it is
+        not written at all if nothing changed.
+        """
+        # The last value given for a key wins, reported as a single change
+        latest: Dict[Tuple[str, str], str] = {}
+        for service, key, value in entries:
+            check_entry(service, key, value)
+            latest[service, key] = value
+
+        with self._locked():
+            try:
+                with open(self.path) as f:
+                    lines = f.read().splitlines()
+            except FileNotFoundError:
+                lines = []
+            spans = index_sections(lines)
+            # service -> key -> value of keys not yet in the file
+            new: Dict[str, Dict[str, str]] = {}
+            changes = []
+            for (service, key), value in latest.items():
+                span = spans.get(service)
+                if span is None or key not in span.keys:
+                    new.setdefault(service, {})[key] = value
+                    changes.append(CredentialChange(service, key, 'added'))
+                elif lines[span.keys[key]].split('=', 1)[1].strip() == value:
+                    changes.append(CredentialChange(service, key, 'unchanged'))
+                elif not overwrite:
+                    changes.append(CredentialChange(service, key, 'conflict'))
+                else:
+                    lines[span.keys[key]] = f"{key}={value}"
+                    changes.append(CredentialChange(service, key, 'updated'))
+
+            if all(change.action in ('unchanged', 'conflict') for change in changes):
+                return changes
+
+            inserts = {spans[service].end: keys for service, keys in new.items() if service in spans}
+            output = []
+            for number in range(len(lines) + 1):
+                for key, value in inserts.get(number, {}).items():
+                    output.append(f"{key}={value}")
+                if number < len(lines):
+                    output.append(lines[number])
+            for service, keys in new.items():
+                if service in spans:
+                    continue
+                if output and output[-1].strip():
+                    output.append('')
+                output.append(f"[{service}]")
+                output.extend(f"{key}={value}" for key, value in keys.items())
+
+            atomic_write(self.path, '\n'.join(output) + '\n')
+            self.invalidate()
+        return changes
+
+    def invalidate(self):
+        """Force a reparse, e.g. after writing the file"""
+        with self._lock:
+            self._stamp = None
+
+    def services(self) -> List[str]:
+        return list(self.sections)
+
+    def get(self, service: str) -> Dict[str, str]:
+        """Keys of one service, empty if the section does not exist"""
+        return self.sections.get(service, {})
+
+    def value(self, service: str, key: str) -> Optional[str]:
+        return self.get(service).get(key)
@@ -0,0 +1,115 @@
+import os
+import time
+import codecs
+import selectors
+from typing import Callable, List, NamedTuple, Optional
+
+READ_SIZE = 64 * 1024
+EXIT_POLL = 0.1
+
+class OutputChunk(NamedTuple):
+    """Decoded output from one stream; timestamp is when it was first read"""
+    stream: str
+    timestamp: float
+    text: str
+
+class ChunkBatcher:
+    """Coalesce consecutive text from one stream into OutputChunks
+
+    A chunk is emitted when the stream changes, max_batch characters are
+    buffered, or flush_interval seconds have passed since it started.
+    """
+
+    def __init__(self, emit: Callable[[OutputChunk], None],
+                 flush_interval: float = 0.05, max_batch: int = 64 * 1024):
+        self.emit = emit
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.stream: Optional[str] = None
+        self.batch: List[str] = []
+        self.size = 0
+        self.started = 0.0
+        self.deadline = 0.0
+
+    def add(self, stream: str, text: str):
+        if not text:
+            return
+        if stream != self.stream:
+            self.flush()
+        if not self.batch:
+            self.stream = stream
+            self.started = time.time()
+            self.deadline = time.monotonic() + self.flush_interval
+        self.batch.append(text)
+        self.size += len(text)
+        if self.size >= self.max_batch:
+            self.flush()
+
+    def timeout(self, default: Optional[float] = None) -> Optional[float]:
+        """Seconds a select() may wait before the batch is due"""
+        if not self.batch:
+            return default
+        remaining = max(0.0, self.deadline - time.monotonic())
+        return remaining if default is None else min(default, remaining)
+
+    def flush_due(self):
+        if self.batch and time.monotonic() >= self.deadline:
+            self.flush()
+
+    def flush(self):
+        if self.batch:
+            self.emit(OutputChunk(self.stream, self.started, ''.join(self.batch)))
+        self.stream, self.batch, self.size = None, [], 0
+
+def capture(process, emit: Callable[[OutputChunk], None],
+            flush_interval: float = 0.05, max_batch: int = 64 * 1024,
+            exit_grace: float = 0.5, exited: Optional[Callable[[], bool]] = None):
+    """Drain a process's stdout and stderr together until both close
+
+    Both pipes are multiplexed with selectors, so a command that fills
+    one pipe while the other is idle cannot deadlock. Reads are batched
+    into chunks by ChunkBatcher.
+
+    Background children of a shell can keep the pipes open after the
+    process itself has exited; capture stops exit_grace seconds after
+    the exit instead of waiting for them. exited() replaces
+    process.poll() for callers that reap the process themselves.
+    """
+    if exited is None:
+        exited = lambda: process.poll() is not None
+    selector = selectors.DefaultSelector()
+    for name in ('stdout', 'stderr'):
+        pipe = getattr(process, name)
+        if pipe is None:
+            continue
+        os.set_blocking(pipe.fileno(), False)
+        decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        selector.register(pipe, selectors.EVENT_READ, (name, decoder))
+
+    batcher = ChunkBatcher(emit, flush_interval, max_batch)
+    exited_at: Optional[float] = None
+
+    try:
+        while selector.get_map():
+            now = time.monotonic()
+            if exited_at is None and exited():
+                exited_at = now
+            if exited_at is not None and now - exited_at >= exit_grace:
+                break
+            # Wake up now and then to notice the process exiting
+            for key, _ in selector.select(batcher.timeout(EXIT_POLL)):
+                name, decoder = key.data
+                try:
+                    data = os.read(key.fd, READ_SIZE)
+                except BlockingIOError:
+                    continue
+                if not data:
+                    selector.unregister(key.fileobj)
+                    key.fileobj.close()
+                batcher.add(name, decoder.decode(data, final=not data))
+            batcher.flush_due()
+        batcher.flush()
+    finally:
+        for key in list(selector.get_map().values()):
+            key.fileobj.close()
+        selector.close()
@@ -0,0 +1,160 @@
+import os
+import tempfile
+import logging
+import subprocess
+import sys
+import tkinter as tk
+from tkinter import ttk, messagebox
+from typing import List, Optional, Tuple
+
+class OutputConsole(ttk.Frame):
+    """Text console for command output that stays fast under heavy output
+
+    write() only buffers; buffered text is inserted once per frame. The
+    widget keeps the last max_lines lines like a ring buffer, and all
+    output is also appended to a spill file on disk so trimmed lines can
+    still be opened. Auto-scroll pauses while the user is scrolled up and
+    resumes once they scroll back to the end.
+    """
+
+    FRAME_MS = 33
+
+    def __init__(self, parent, max_lines: int = 5000, **text_options):
+        super().__init__(parent)
+        self.max_lines = max_lines
+        self.pending: List[Tuple[str, Optional[str]]] = []
+        self.trimmed = 0
+        self.spill = None
+        self.spill_path = None
+        self._flush_job = None
+
+        text_frame = ttk.Frame(self)
+        text_frame.pack(fill='both', expand=True)
+        self.text = tk.Text(text_frame, **text_options)
+        self.scrollbar = ttk.Scrollbar(text_frame, orient='vertical', command=self.text.yview)
+        self.text.configure(yscrollcommand=self.on_scroll)
+        self.scrollbar.pack(side='right', fill='y')
+        self.text.pack(side='left', fill='both', expand=True)
+        self.text.tag_configure('stderr', foreground='red')
+        self.text.tag_configure('command', foreground='blue')
+
+        status_bar = ttk.Frame(self)
+        status_bar.pack(fill='x')
+        self.status_label = ttk.Label(status_bar, text="")
+        self.status_label.pack(side='left', padx=5)
+        ttk.Button(status_bar, text="Full Output", command=self.open_spill).pack(side='right', padx=5)
+        self.end_button = ttk.Button(status_bar, text="Jump to End", command=self.scroll_to_end)
+
+    @property
+    def following(self) -> bool:
+        """Whether the view is at the end, so new output scrolls into view"""
+        return self.text.yview()[1] >= 0.999
+
+    def on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if float(last) >= 0.999:
+            self.end_button.pack_forget()
+        elif not self.end_button.winfo_ismapped():
+            self.end_button.pack(side='right', padx=5)
+
+    def write(self, text: str, tag: Optional[str] = None):
+        """Queue text for the next frame and spill it to disk"""
+        if not text:
+            return
+        self._spill(text)
+        self.pending.append((text, tag))
+        if not self._flush_job:
+            self._flush_job = self.after(self.FRAME_MS, self.flush)
+
+    def flush(self):
+        """Insert all buffered text in one pass"""
+        self._flush_job = None
+        if not self.pending:
+            return
+        pending, self.pending = self._tail(self.pending), []
+        follow = self.following
+
+        # Consecutive writes with the same tag become a single insert
+        runs: List[Tuple[str, Optional[str]]] = []
+        for text, tag in pending:
+            if runs and runs[-1][1] == tag:
+                runs[-1] = (runs[-1][0] + text, tag)
+            else:
+                runs.append((text, tag))
+        for text, tag in runs:
+            self.text.insert(tk.END, text, tag or ())
+
+        self._trim()
+        if follow:
+            self.text.see(tk.END)
+
+    def _tail(self, pending: List[Tuple[str, Optional[str]]]) -> List[Tuple[str, Optional[str]]]:
+        """Drop buffered text that would be trimmed right after inserting it"""
+        lines = 0
+        for i in range(len(pending) - 1, -1, -1):
+            lines += pending[i][0].count('\n')
+            if lines > self.max_lines:
+                self.trimmed += sum(text.count('\n') for text, _ in pending[:i])
+                return pending[i:]
+        return pending
+
+    def _trim(self):
+        """Keep at most max_lines lines, deleting from the top in blocks"""
+        lines = int(self.text.index('end-1c').split('.')[0])
+        # Slack so the delete happens once per block, not on every frame
+        if lines <= self.max_lines + self.max_lines // 10:
+            return
+        excess = lines - self.max_lines
+        self.text.delete('1.0', f'{excess + 1}.0')
+        self.trimmed += excess
+        self.status_label.config(text=f"{self.trimmed} earlier line(s) in full output")
+
+    def _spill(self, text: str):
+        try:
+            if self.spill is None:
+                fd, self.spill_path = tempfile.mkstemp(prefix='cline-output-', suffix='.log')
+                self.spill = os.fdopen(fd, 'w', encoding='utf-8')
+            self.spill.write(text)
+        except OSError as e:
+            logging.error(f"Error writing output spill file: {e}")
+
+    def open_spill(self):
+        """Open the complete output in the system viewer"""
+        if not self.spill_path:
+            messagebox.showinfo("Output", "No output yet")
+            return
+        self.spill.flush()
+        opener = 'open' if sys.platform == 'darwin' else 'xdg-open'
+        try:
+            subprocess.Popen([opener, self.spill_path])
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to open {self.spill_path}: {e}")
+
+    def scroll_to_end(self):
+        self.text.see(tk.END)
+
+    def clear(self):
+        """Empty the console and start a new spill file"""
+        if self._flush_job:
+            self.after_cancel(self._flush_job)
+            self._flush_job = None
+        self.pending = []
+        self.text.delete('1.0', tk.END)
+        self.trimmed = 0
+        self.status_label.config(text="")
+        self._close_spill()
+
+    def _close_spill(self):
+        if self.spill is not None:
+            self.spill.close()
+            self.spill = None
+        if self.spill_path:
+            try:
+                os.unlink(self.spill_path)
+            except OSError:
+                pass
+            self.spill_path = None
+
+    def destroy(self):
+        self._close_spill()
+        super().destroy()
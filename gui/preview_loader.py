@@ -0,0 +1,141 @@
+import os
+import queue
+import threading
+import tkinter as tk
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+class PreviewCache:
+    """Thread-safe LRU cache of preview text keyed by (path, mtime)"""
+
+    def __init__(self, max_entries: int = 64, max_bytes: int = 8 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: 'OrderedDict[Tuple[str, int], str]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[str, int]) -> Optional[str]:
+        with self._lock:
+            content = self._entries.get(key)
+            if content is not None:
+                self._entries.move_to_end(key)
+            return content
+
+    def put(self, key: Tuple[str, int], content: str):
+        if len(content) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._entries[key] = content
+            self.size += len(content)
+            while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+class PreviewLoader:
+    """Load file previews into a Text widget without blocking the Tk thread
+
+    Files are stat'ed and read on worker threads. Only the most recent
+    request is shown; older requests are skipped before they are read, or
+    dropped when they finish. Large previews are inserted in chunks from
+    the event loop.
+    """
+
+    CHUNK_SIZE = 16 * 1024
+    POLL_MS = 30
+
+    def __init__(self, text_widget, cache: Optional[PreviewCache] = None, workers: int = 2):
+        self.text = text_widget
+        self.cache = cache or PreviewCache()
+        self.results = queue.Queue()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='preview')
+        self.generation = 0
+        self.pending = 0
+        self._insert_job = None
+        self._poll_job = None
+
+    def load(self, path: str, reader=None, key: Optional[str] = None):
+        """Show path in the widget
+
+        reader(path) overrides open().read(), and key replaces path in the
+        cache key when several previews are read from the same file.
+        """
+        self.generation += 1
+        self._cancel_insert()
+        self.pending += 1
+        self.executor.submit(self._read, self.generation, path, reader, key)
+        if not self._poll_job:
+            self._poll_job = self.text.after(self.POLL_MS, self._poll)
+
+    def clear(self):
+        """Cancel pending loads and empty the widget"""
+        self.generation += 1
+        self._cancel_insert()
+        self.text.delete('1.0', tk.END)
+
+    def show(self, content: str):
+        """Replace widget content, cancelling any pending load"""
+        self.generation += 1
+        self._start_insert(content)
+
+    def _read(self, generation: int, path: str, reader, key: Optional[str]):
+        if generation != self.generation:
+            # Selection already moved on
+            self.results.put((generation, None))
+            return
+        try:
+            key = (key or path, os.stat(path).st_mtime_ns)
+            content = self.cache.get(key)
+            if content is None:
+                if reader:
+                    content = reader(path)
+                else:
+                    with open(path) as f:
+                        content = f.read()
+                self.cache.put(key, content)
+        except Exception as e:
+            content = f"Error loading task: {e}"
+        self.results.put((generation, content))
+
+    def _poll(self):
+        self._poll_job = None
+        latest = None
+        try:
+            while True:
+                generation, content = self.results.get_nowait()
+                self.pending -= 1
+                if generation == self.generation and content is not None:
+                    latest = content
+        except queue.Empty:
+            pass
+
+        if latest is not None:
+            self._start_insert(latest)
+        if self.pending:
+            self._poll_job = self.text.after(self.POLL_MS, self._poll)
+
+    def _start_insert(self, content: str):
+        self._cancel_insert()
+        self.text.delete('1.0', tk.END)
+        self._insert_chunk(content, 0, self.generation)
+
+    def _insert_chunk(self, content: str, offset: int, generation: int):
+        self._insert_job = None
+        if generation != self.generation:
+            return
+        self.text.insert(tk.END, content[offset:offset + self.CHUNK_SIZE])
+        offset += self.CHUNK_SIZE
+        if offset < len(content):
+            self._insert_job = self.text.after(1, self._insert_chunk, content, offset, generation)
+
+    def _cancel_insert(self):
+        if self._insert_job:
+            self.text.after_cancel(self._insert_job)
+            self._insert_job = None
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,177 @@
+import re
+import threading
+from typing import Dict, FrozenSet, Iterable, List, Optional, Pattern, Tuple
+from .keys_file import KeysFile
+
+MASK = '••••••'
+
+# Shorter values (regions, flags, ports) would mask ordinary output
+MIN_SECRET_LENGTH = 6
+
+# Secrets at least this long are screened by sampling GRAM-character
+# grams; shorter ones are looked for one by one
+SAMPLED_LENGTH = 16
+GRAM = 8
+
+# Text fed to a stream at once is screened and redacted in blocks of this
+# size, so one secret only costs the full pattern on its own block
+FEED_BLOCK = 64 * 1024
+
+def trie_pattern(words: Iterable[str]) -> Optional[Pattern]:
+    """Regex matching any of words, built as a trie of literals
+
+    Branches of the trie start with distinct characters, so the regex
+    engine follows a single path per position instead of trying every
+    word in turn, and the longest word at a position wins.
+    """
+    trie: Dict[str, dict] = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+    if not trie:
+        return None
+
+    def build(node: Dict[str, dict]) -> str:
+        parts = []
+        for char, child in sorted(node.items()):
+            if not char:
+                continue
+            # Follow single-child chains without recursing
+            literal = [char]
+            while len(child) == 1 and '' not in child:
+                (char, child), = child.items()
+                literal.append(char)
+            parts.append(re.escape(''.join(literal)) + build(child))
+        if not parts:
+            return ''
+        alternation = parts[0] if len(parts) == 1 else '(?:' + '|'.join(parts) + ')'
+        if '' in node:
+            return f'(?:{alternation})?'
+        return alternation
+
+    return re.compile(build(trie))
+
+class SecretScreen:
+    """Cheap test for whether text may contain any of a set of secrets
+
+    A secret of length L >= m occurring in text wholly contains the GRAM
+    characters starting at some multiple of step = m - GRAM + 1, at one
+    of its first step offsets. So the grams of the text at that stride
+    are taken with one findall() and compared with every secret's first
+    step grams as a set, all in C. Secrets shorter than SAMPLED_LENGTH
+    are found with str's substring search. A False answer is exact; a
+    True one still has to be confirmed by the full pattern.
+    """
+
+    def __init__(self, secrets: Iterable[str]):
+        secrets = set(secrets)
+        sampled = [s for s in secrets if len(s) >= SAMPLED_LENGTH]
+        self.short = sorted(secrets.difference(sampled), key=len, reverse=True)
+        self.grams: FrozenSet[str] = frozenset()
+        self.sampler: Optional[Pattern] = None
+        if sampled:
+            step = min(map(len, sampled)) - GRAM + 1
+            self.grams = frozenset(s[i:i + GRAM] for s in sampled for i in range(step))
+            self.sampler = re.compile(rf'(?s)(?=(.{{{GRAM}}})).{{1,{step}}}')
+
+    def __call__(self, text: str) -> bool:
+        if self.sampler is not None and not self.grams.isdisjoint(self.sampler.findall(text)):
+            return True
+        return any(secret in text for secret in self.short)
+
+class SecretRedactor:
+    """Masks the values of a keys file in text and output streams
+
+    The pattern is rebuilt when the keys file changes. Values shorter
+    than MIN_SECRET_LENGTH are not treated as secrets.
+    """
+
+    def __init__(self, keys: KeysFile):
+        self.keys = keys
+        self._sections = None
+        self._compiled: Tuple[Optional[Pattern], FrozenSet[str], int, Optional[SecretScreen]] = (
+            None, frozenset(), 0, None
+        )
+        self._lock = threading.Lock()
+
+    def compiled(self) -> Tuple[Optional[Pattern], FrozenSet[str], int, Optional[SecretScreen]]:
+        """(pattern, every proper prefix of a secret, longest secret length, screen)"""
+        sections = self.keys.sections
+        with self._lock:
+            if sections is not self._sections:
+                secrets = {
+                    value for keys in sections.values() for value in keys.values()
+                    if len(value) >= MIN_SECRET_LENGTH
+                }
+                prefixes = frozenset(s[:i] for s in secrets for i in range(1, len(s)))
+                self._compiled = (
+                    trie_pattern(secrets), prefixes, max(map(len, secrets), default=0), SecretScreen(secrets)
+                )
+                self._sections = sections
+            return self._compiled
+
+    def redact(self, text: str) -> str:
+        stream = self.stream()
+        return stream.feed(text) + stream.flush()
+
+    def stream(self) -> 'StreamRedactor':
+        return StreamRedactor(*self.compiled())
+
+class StreamRedactor:
+    """Redacts one output stream fed in arbitrary chunks
+
+    A secret split across chunks is still masked: text at the end of a
+    chunk that could be the start of a secret is held back until the
+    next chunk (or flush()) shows whether it is one. Other text passes
+    through at once.
+    """
+
+    def __init__(self, pattern: Optional[Pattern], prefixes: FrozenSet[str], longest: int,
+                 screen: Optional[SecretScreen] = None):
+        self.pattern = pattern
+        self.prefixes = prefixes
+        self.longest = longest
+        self.screen = screen
+        self.pending = ''
+
+    def feed(self, text: str) -> str:
+        if self.pattern is None:
+            return text
+        if len(text) > FEED_BLOCK:
+            return ''.join(self.feed(text[i:i + FEED_BLOCK]) for i in range(0, len(text), FEED_BLOCK))
+        buffer = self.pending + text
+        # Secrets starting before safe_end fit in buffer whatever follows
+        safe_end = max(0, len(buffer) - self.longest + 1)
+        hold = self._hold(buffer, safe_end)
+        if self.screen is not None and not self.screen(buffer):
+            # No secret lies wholly in buffer
+            self.pending = buffer[hold:]
+            return buffer[:hold]
+        out: List[str] = []
+        pos = 0
+        while True:
+            match = self.pattern.search(buffer, pos)
+            if match is None or match.start() >= hold:
+                break
+            out.append(buffer[pos:match.start()])
+            out.append(MASK)
+            pos = match.end()
+            if pos > hold:
+                hold = self._hold(buffer, pos)
+        out.append(buffer[pos:hold])
+        self.pending = buffer[hold:]
+        return ''.join(out)
+
+    def _hold(self, buffer: str, start: int) -> int:
+        """Earliest position from start whose rest could begin a secret"""
+        for i in range(start, len(buffer)):
+            if buffer[i:] in self.prefixes:
+                return i
+        return len(buffer)
+
+    def flush(self) -> str:
+        """Everything held back, redacted"""
+        text, self.pending = self.pending, ''
+        return self.pattern.sub(MASK, text) if self.pattern and text else text
@@ -0,0 +1,133 @@
+import os
+import glob
+import json
+import fnmatch
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+class CacheRule(NamedTuple):
+    """Commands matching pattern (fnmatch) are cached
+
+    inputs are paths or glob patterns relative to the command's cwd whose
+    contents the result depends on; directories count with every file
+    below them. env names the environment variables that affect it.
+    """
+    pattern: str
+    inputs: Tuple[str, ...] = ()
+    env: Tuple[str, ...] = ()
+
+    def matches(self, command: str) -> bool:
+        return fnmatch.fnmatchcase(command.strip(), self.pattern)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'CacheRule':
+        return cls(data['command'], tuple(data.get('inputs', ())), tuple(data.get('env', ())))
+
+class CachedResult(NamedTuple):
+    returncode: int
+    # (stream, text) in the order they were written
+    chunks: Tuple[Tuple[str, str], ...]
+    size: int
+
+def fingerprint(cwd: str, inputs: Iterable[str]) -> str:
+    """Hash of the path, size and mtime of every file matched by inputs"""
+    digest = hashlib.sha256()
+    for pattern in inputs:
+        digest.update(pattern.encode('utf-8') + b'\0')
+        paths = sorted(glob.glob(os.path.join(cwd, pattern), recursive=True))
+        for path in paths:
+            if os.path.isdir(path):
+                for root, dirs, files in os.walk(path):
+                    dirs.sort()
+                    for name in sorted(files):
+                        _stat_into(digest, os.path.join(root, name))
+            else:
+                _stat_into(digest, path)
+    return digest.hexdigest()
+
+def _stat_into(digest, path: str):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return
+    digest.update(f'{path}\0{st.st_size}\0{st.st_mtime_ns}\0{st.st_ino}\n'.encode('utf-8', 'surrogateescape'))
+
+class ResultCache:
+    """LRU cache of command results, bounded by entry count and size
+
+    Only commands matching one of rules are cached. Results are kept in
+    memory for the life of the engine; a result larger than a quarter of
+    max_bytes is never stored.
+    """
+
+    def __init__(self, rules: Iterable[CacheRule] = (), max_entries: int = DEFAULT_MAX_ENTRIES,
+                 max_bytes: int = DEFAULT_MAX_BYTES):
+        self.rules: List[CacheRule] = list(rules)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[str, CachedResult]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, settings: Dict[str, Any]) -> 'ResultCache':
+        """Build from a project's command_cache setting"""
+        return cls(
+            [CacheRule.from_dict(rule) for rule in settings.get('rules', [])],
+            settings.get('max_entries', DEFAULT_MAX_ENTRIES),
+            int(settings.get('max_mb', DEFAULT_MAX_BYTES / 1024 / 1024) * 1024 * 1024)
+        )
+
+    def rule_for(self, command: str) -> Optional[CacheRule]:
+        for rule in self.rules:
+            if rule.matches(command):
+                return rule
+        return None
+
+    def key(self, rule: CacheRule, command: str, cwd: str, env: Dict[str, str]) -> str:
+        data = [command, os.path.abspath(cwd),
+                {name: env.get(name) for name in rule.env},
+                fingerprint(cwd, rule.inputs)]
+        return hashlib.sha256(json.dumps(data, sort_keys=True).encode('utf-8')).hexdigest()
+
+    @property
+    def max_entry_bytes(self) -> int:
+        return self.max_bytes // 4
+
+    def get(self, key: str) -> Optional[CachedResult]:
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key: str, result: CachedResult):
+        if result.size > self.max_entry_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= old.size
+            self._entries[key] = result
+            self.size += result.size
+            while self._entries and (len(self._entries) > self.max_entries or self.size > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= evicted.size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
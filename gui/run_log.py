@@ -0,0 +1,190 @@
+import os
+import re
+import mmap
+import json
+import zlib
+import struct
+import logging
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional
+
+BLOCK_MAGIC = b'CRL1'
+# magic, compressed size, raw size, lines in block
+BLOCK_HEADER = struct.Struct('>4sIII')
+BLOCK_SIZE = 256 * 1024
+LOG_SUFFIX = '.log.z'
+INDEX_SUFFIX = '.idx.json'
+
+def run_log_path(runs_dir: str, run_id: str) -> str:
+    return os.path.join(runs_dir, run_id + LOG_SUFFIX)
+
+class RunLogWriter:
+    """Write a command's output as independently compressed blocks
+
+    Blocks hold about BLOCK_SIZE bytes of output and end on a line break,
+    so no line spans two blocks (a single line longer than BLOCK_SIZE is
+    split). Each block header records its sizes and line count,
+    and a JSON sidecar lists every block with its first line, so readers
+    can jump to any line by decompressing a single block.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.index_path = path[:-len(LOG_SUFFIX)] + INDEX_SUFFIX
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.file = open(path, 'wb')
+        self.buffer = bytearray()
+        self.blocks: List[List[int]] = []
+        self.lines = 0
+        self.size = 0
+
+    def write(self, text: str):
+        self.buffer += text.encode('utf-8')
+        while len(self.buffer) >= BLOCK_SIZE:
+            cut = self.buffer.rfind(b'\n', 0, BLOCK_SIZE) + 1 or BLOCK_SIZE
+            self._write_block(bytes(self.buffer[:cut]))
+            del self.buffer[:cut]
+
+    def _write_block(self, raw: bytes):
+        data = zlib.compress(raw, 1)
+        lines = raw.count(b'\n') + (0 if raw.endswith(b'\n') else 1)
+        offset = self.file.tell()
+        self.file.write(BLOCK_HEADER.pack(BLOCK_MAGIC, len(data), len(raw), lines))
+        self.file.write(data)
+        self.blocks.append([offset, len(data), len(raw), self.lines])
+        self.lines += lines
+        self.size += len(raw)
+
+    def close(self):
+        if self.file.closed:
+            return
+        if self.buffer:
+            self._write_block(bytes(self.buffer))
+            self.buffer.clear()
+        self.file.close()
+        with open(self.index_path, 'w') as f:
+            json.dump({'blocks': self.blocks, 'lines': self.lines, 'size': self.size}, f)
+
+class RunLog:
+    """Random access to a run log through mmap and the block index
+
+    Lines are numbered from 0. Only the blocks holding the requested lines
+    are decompressed, and recently used blocks are cached, so opening and
+    scrolling a log of hundreds of MB is immediate.
+    """
+
+    CACHE_BLOCKS = 16
+
+    def __init__(self, path: str):
+        self.path = path
+        self.index_path = path[:-len(LOG_SUFFIX)] + INDEX_SUFFIX
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        self._cache: 'OrderedDict[int, List[bytes]]' = OrderedDict()
+        self._load_index(size)
+
+    def _load_index(self, size: int):
+        try:
+            with open(self.index_path) as f:
+                data = json.load(f)
+            blocks = data['blocks']
+            if not blocks or blocks[-1][0] + BLOCK_HEADER.size + blocks[-1][1] == size:
+                self.blocks = blocks
+                self.size = data['size']
+                self.line_count = data['lines']
+                self._first_lines = [b[3] for b in blocks]
+                return
+        except (OSError, ValueError, KeyError):
+            pass
+        # Still being written, or the writer died before closing
+        self._scan()
+
+    def _scan(self):
+        """Rebuild the block index from the block headers"""
+        self.blocks = []
+        self.size = 0
+        offset, lines = 0, 0
+        while offset + BLOCK_HEADER.size <= len(self._map):
+            magic, comp, raw, count = BLOCK_HEADER.unpack_from(self._map, offset)
+            if magic != BLOCK_MAGIC or offset + BLOCK_HEADER.size + comp > len(self._map):
+                logging.warning(f"Run log {self.path} truncated at offset {offset}")
+                break
+            self.blocks.append([offset, comp, raw, lines])
+            offset += BLOCK_HEADER.size + comp
+            lines += count
+            self.size += raw
+        self.line_count = lines
+        self._first_lines = [b[3] for b in self.blocks]
+
+    def _block(self, n: int) -> List[bytes]:
+        """Lines of block n without line breaks"""
+        lines = self._cache.get(n)
+        if lines is not None:
+            self._cache.move_to_end(n)
+            return lines
+        offset, comp = self.blocks[n][0], self.blocks[n][1]
+        start = offset + BLOCK_HEADER.size
+        lines = zlib.decompress(self._map[start:start + comp]).split(b'\n')
+        if not lines[-1]:
+            lines.pop()
+        self._cache[n] = lines
+        if len(self._cache) > self.CACHE_BLOCKS:
+            self._cache.popitem(last=False)
+        return lines
+
+    def _block_for(self, line_no: int) -> int:
+        return max(0, bisect_right(self._first_lines, line_no) - 1)
+
+    def lines(self, start: int, count: int) -> List[str]:
+        """Lines start..start+count-1, without line breaks"""
+        result: List[str] = []
+        end = min(start + count, self.line_count)
+        n = self._block_for(start)
+        while start < end and n < len(self.blocks):
+            first = self.blocks[n][3]
+            block = self._block(n)
+            for line in block[start - first:end - first]:
+                result.append(line.decode('utf-8', 'replace'))
+            start = first + len(block)
+            n += 1
+        return result
+
+    def search(self, pattern: str, start: int = 0, regex: bool = False,
+               ignore_case: bool = True) -> Iterator[int]:
+        """Yield numbers of lines from start on that match pattern"""
+        flags = re.IGNORECASE if ignore_case else 0
+        matcher = re.compile((pattern if regex else re.escape(pattern)).encode('utf-8'), flags)
+        n = self._block_for(start)
+        while n < len(self.blocks):
+            first = self.blocks[n][3]
+            block = self._block(n)
+            # Skip blocks without a match before testing line by line
+            if matcher.search(b'\n'.join(block)):
+                for i in range(max(0, start - first), len(block)):
+                    if matcher.search(block[i]):
+                        yield first + i
+            n += 1
+
+    def close(self):
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+def read_run_meta(index_path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(index_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def remove_run_log(path: str):
+    """Delete a run log and its block index, if they exist"""
+    for name in (path, path[:-len(LOG_SUFFIX)] + INDEX_SUFFIX):
+        try:
+            os.unlink(name)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logging.error(f"Error removing run log {name}: {e}")
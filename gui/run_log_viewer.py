@@ -0,0 +1,196 @@
+import queue
+import threading
+import tkinter as tk
+import tkinter.font as tkfont
+from tkinter import ttk, messagebox
+from .run_log import RunLog
+
+class RunLogViewer(tk.Toplevel):
+    """Window showing a run log, rendering only the lines in view
+
+    Lines come from RunLog, so even very large logs open at once. Search
+    runs on a background thread with its own RunLog and jumps to the next
+    match after the current one.
+    """
+
+    def __init__(self, parent, path, title="Command Output"):
+        super().__init__(parent)
+        self.title(title)
+        self.geometry("900x600")
+
+        try:
+            self.log = RunLog(path)
+        except OSError as e:
+            self.destroy()
+            messagebox.showerror("Error", f"Failed to open output log: {e}")
+            return
+        self.path = path
+        self.top = 0
+        self.match_line = None
+        self.search_results = queue.Queue()
+        self.search_generation = 0
+        self.search_polling = False
+
+        # Search and go-to-line bar
+        toolbar = ttk.Frame(self)
+        toolbar.pack(fill='x', padx=5, pady=5)
+        ttk.Label(toolbar, text="Find:").pack(side='left')
+        self.search_entry = ttk.Entry(toolbar)
+        self.search_entry.pack(side='left', fill='x', expand=True, padx=5)
+        self.search_entry.bind('<Return>', lambda e: self.find_next())
+        self.regex_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(toolbar, text="Regex", variable=self.regex_var).pack(side='left')
+        ttk.Button(toolbar, text="Next", command=self.find_next).pack(side='left', padx=5)
+        ttk.Label(toolbar, text="Line:").pack(side='left', padx=(10, 0))
+        self.line_entry = ttk.Entry(toolbar, width=10)
+        self.line_entry.pack(side='left', padx=5)
+        self.line_entry.bind('<Return>', lambda e: self.goto_line())
+        ttk.Button(toolbar, text="Go", command=self.goto_line).pack(side='left')
+        ttk.Button(toolbar, text="Reload", command=self.reload).pack(side='left', padx=5)
+
+        # Text shows only the current window of lines
+        body = ttk.Frame(self)
+        body.pack(fill='both', expand=True, padx=5)
+        self.font = tkfont.nametofont('TkFixedFont')
+        self.text = tk.Text(body, wrap='none', font=self.font)
+        self.scrollbar = ttk.Scrollbar(body, orient='vertical', command=self.on_scrollbar)
+        xscroll = ttk.Scrollbar(body, orient='horizontal', command=self.text.xview)
+        self.text.configure(xscrollcommand=xscroll.set)
+        self.scrollbar.pack(side='right', fill='y')
+        xscroll.pack(side='bottom', fill='x')
+        self.text.pack(side='left', fill='both', expand=True)
+        self.text.tag_configure('match', background='yellow')
+
+        self.status_label = ttk.Label(self, text="")
+        self.status_label.pack(fill='x', padx=5, pady=(0, 5))
+
+        self.text.bind('<Configure>', lambda e: self.render())
+        self.text.bind('<MouseWheel>', self.on_wheel)
+        self.text.bind('<Button-4>', lambda e: self.scroll(-3))
+        self.text.bind('<Button-5>', lambda e: self.scroll(3))
+        self.bind('<Prior>', lambda e: self.scroll(-self.rows))
+        self.bind('<Next>', lambda e: self.scroll(self.rows))
+        self.bind('<Control-Home>', lambda e: self.scroll_to(0))
+        self.bind('<Control-End>', lambda e: self.scroll_to(self.log.line_count))
+        self.bind('<Control-f>', lambda e: self.search_entry.focus_set())
+        self.protocol("WM_DELETE_WINDOW", self.close)
+
+        self.render()
+
+    @property
+    def rows(self) -> int:
+        return max(1, self.text.winfo_height() // self.font.metrics('linespace'))
+
+    def render(self):
+        """Redraw the lines in view"""
+        rows = self.rows
+        total = self.log.line_count
+        self.top = max(0, min(self.top, total - rows))
+        lines = self.log.lines(self.top, rows)
+
+        self.text.configure(state='normal')
+        self.text.delete('1.0', tk.END)
+        self.text.insert('1.0', '\n'.join(lines))
+        if self.match_line is not None and self.top <= self.match_line < self.top + rows:
+            row = self.match_line - self.top + 1
+            self.text.tag_add('match', f'{row}.0', f'{row}.end')
+        self.text.configure(state='disabled')
+
+        if total:
+            self.scrollbar.set(self.top / total, min(1.0, (self.top + rows) / total))
+        else:
+            self.scrollbar.set(0, 1)
+        self.status_label.config(
+            text=f"Lines {self.top + 1}-{self.top + len(lines)} of {total} "
+                 f"({self.log.size / 1024 / 1024:.1f} MB)"
+        )
+
+    def scroll(self, lines: int):
+        self.scroll_to(self.top + lines)
+
+    def scroll_to(self, line: int):
+        self.top = line
+        self.render()
+
+    def on_scrollbar(self, action, value, unit=None):
+        if action == 'moveto':
+            self.scroll_to(int(float(value) * self.log.line_count))
+        elif action == 'scroll':
+            step = self.rows if unit == 'pages' else 1
+            self.scroll(int(value) * step)
+
+    def on_wheel(self, event):
+        # Windows reports multiples of 120, macOS small deltas
+        delta = event.delta // 120 if abs(event.delta) >= 120 else event.delta
+        self.scroll(-3 * delta)
+
+    def goto_line(self):
+        try:
+            line = int(self.line_entry.get()) - 1
+        except ValueError:
+            return
+        self.match_line = max(0, min(line, self.log.line_count - 1))
+        self.scroll_to(self.match_line - self.rows // 2)
+
+    def find_next(self):
+        """Search for the next match after the highlighted line"""
+        pattern = self.search_entry.get()
+        if not pattern:
+            return
+        start = self.match_line + 1 if self.match_line is not None else self.top
+        regex = self.regex_var.get()
+        self.search_generation += 1
+        generation = self.search_generation
+        self.status_label.config(text="Searching...")
+
+        def search():
+            # Own RunLog: the block cache is not thread-safe
+            log = RunLog(self.path)
+            try:
+                found = next(log.search(pattern, start, regex), None)
+                if found is None and start:
+                    # Wrap around to the top
+                    found = next(log.search(pattern, 0, regex), None)
+                    if found is not None and found >= start:
+                        found = None
+                self.search_results.put((generation, found, None))
+            except Exception as e:
+                self.search_results.put((generation, None, str(e)))
+            finally:
+                log.close()
+
+        threading.Thread(target=search, daemon=True).start()
+        if not self.search_polling:
+            self.search_polling = True
+            self.after(50, self.poll_search)
+
+    def poll_search(self):
+        if not self.winfo_exists():
+            return
+        try:
+            generation, found, error = self.search_results.get_nowait()
+        except queue.Empty:
+            generation = None
+        if generation != self.search_generation:
+            # Nothing yet, or a superseded search finished
+            self.after(50, self.poll_search)
+            return
+        self.search_polling = False
+        if error:
+            self.status_label.config(text=f"Search failed: {error}")
+        elif found is None:
+            self.status_label.config(text="No matches")
+        else:
+            self.match_line = found
+            self.scroll_to(found - self.rows // 2)
+
+    def reload(self):
+        """Reopen the log, e.g. while its command is still running"""
+        self.log.close()
+        self.log = RunLog(self.path)
+        self.render()
+
+    def close(self):
+        self.search_generation += 1
+        self.log.close()
+        self.destroy()
@@ -0,0 +1,311 @@
+import os
+import re
+import time
+import uuid
+import codecs
+import shlex
+import shutil
+import signal
+import logging
+import selectors
+import threading
+import subprocess
+import tempfile
+from typing import Callable, Dict, List, Optional
+from .output_capture import ChunkBatcher, OutputChunk, READ_SIZE, EXIT_POLL
+
+DEFAULT_SHELL = '/bin/sh'
+
+# A session is replaced after this many commands to bound any state leaks
+MAX_USES = 200
+
+ENV_NAME_RE = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+# Most a pipe can hold (Linux's default pipe-max-size), and so the most
+# output a finished command can have left unread
+DRAIN_LIMIT = 1024 * 1024
+
+# Frame marker: RS, a per-command token and the exit code
+MARK = b'\x1e'
+
+class ShellSession:
+    """A long-lived shell that runs one command at a time
+
+    Each command is written to the shell's stdin as a small script that
+    runs it in a subshell with stdin from /dev/null and stdout and stderr
+    sent to a pair of named pipes made for that command alone, then
+    prints an end marker with a fresh random token and the exit status on
+    the shell's own stdout. Commands can therefore be run back to back on
+    the same shell without spawning a process for each.
+
+    The subshell keeps cd, exit and variable changes from leaking into
+    later commands. Background jobs a command leaves behind keep running
+    in the session until it is closed, but their output cannot reach the
+    next command: once the end marker arrives the command's pipes are
+    drained and closed, so any later write fails.
+    """
+
+    def __init__(self, cwd: str, shell: str = DEFAULT_SHELL):
+        self.cwd = cwd
+        self.uses = 0
+        self.fifo_dir = tempfile.mkdtemp(prefix='cline-shell-')
+        self.process = subprocess.Popen(
+            [shell],
+            cwd=cwd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            start_new_session=True
+        )
+        for pipe in (self.process.stdout, self.process.stderr):
+            os.set_blocking(pipe.fileno(), False)
+        self.broken = False
+
+    @property
+    def alive(self) -> bool:
+        return not self.broken and self.process.poll() is None
+
+    def script(self, command: str, token: str, env: Optional[Dict[str, str]] = None,
+               stdout: str = '/dev/null', stderr: str = '/dev/null') -> str:
+        exports = ''
+        for name, value in (env or {}).items():
+            if not ENV_NAME_RE.match(name):
+                raise ValueError(f"Invalid environment variable name: {name!r}")
+            exports += f'export {name}={shlex.quote(value)}; '
+        return (
+            f'( {exports}eval {shlex.quote(command)}\n'
+            f') </dev/null >{shlex.quote(stdout)} 2>{shlex.quote(stderr)}\n'
+            f"printf '\\036%s:%d\\036\\n' {token} \"$?\"\n"
+        )
+
+    def run(self, command: str, emit: Callable[[OutputChunk], None],
+            env: Optional[Dict[str, str]] = None, flush_interval: float = 0.05,
+            max_batch: int = 64 * 1024, exit_grace: float = 0.5) -> Optional[int]:
+        """Run command and stream its output; None if the session died"""
+        token = uuid.uuid4().hex
+        fifos: List[_Output] = []
+        try:
+            for name in ('stdout', 'stderr'):
+                fifos.append(_Output(os.path.join(self.fifo_dir, f'{token}.{name}'), name))
+            script = self.script(command, token, env, fifos[0].path, fifos[1].path)
+            self.process.stdin.write(script.encode('utf-8'))
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            logging.error(f"Shell session lost: {e}")
+            self.broken = True
+            for fifo in fifos:
+                fifo.close()
+            return None
+        self.uses += 1
+
+        end = MARK + token.encode('ascii')
+        batcher = ChunkBatcher(emit, flush_interval, max_batch)
+        selector = selectors.DefaultSelector()
+        # The shell's own stderr carries errors such as a failed redirect
+        sources = fifos + [_Output.wrap(self.process.stderr.fileno(), 'stderr')]
+        for source in sources:
+            selector.register(source.read_fd, selectors.EVENT_READ, source)
+        control = self.process.stdout
+        selector.register(control, selectors.EVENT_READ)
+        frame = bytearray()
+
+        returncode = None
+        exited_at: Optional[float] = None
+        try:
+            while returncode is None and not self.broken:
+                now = time.monotonic()
+                if exited_at is None and self.process.poll() is not None:
+                    exited_at = now
+                if exited_at is not None and now - exited_at >= exit_grace:
+                    break
+                for key, _ in selector.select(batcher.timeout(EXIT_POLL)):
+                    try:
+                        data = os.read(key.fd, READ_SIZE)
+                    except BlockingIOError:
+                        continue
+                    if key.fileobj is control:
+                        if not data:
+                            # Shell gone before the command's frame ended
+                            self.broken = True
+                            continue
+                        frame += data
+                        returncode = _frame_code(frame, end)
+                    elif data:
+                        batcher.add(key.data.name, key.data.decode(data))
+                    else:
+                        selector.unregister(key.fileobj)
+                batcher.flush_due()
+
+            # The command has ended: take what it wrote, then stop listening
+            for source in sources:
+                source.release_writer()
+                for data in source.drain():
+                    batcher.add(source.name, source.decode(data))
+                batcher.add(source.name, source.decode(b'', final=True))
+            batcher.flush()
+        finally:
+            selector.close()
+            for fifo in fifos:
+                fifo.close()
+
+        if self.broken or returncode is None:
+            self.broken = True
+            return None
+        return returncode
+
+    def close(self):
+        """End the shell and any background jobs it still has"""
+        self.broken = True
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        try:
+            os.killpg(self.process.pid, signal.SIGTERM)
+        except OSError:
+            pass
+        try:
+            self.process.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            try:
+                os.killpg(self.process.pid, signal.SIGKILL)
+            except OSError:
+                pass
+            self.process.wait()
+        for pipe in (self.process.stdout, self.process.stderr):
+            pipe.close()
+        shutil.rmtree(self.fifo_dir, ignore_errors=True)
+
+def _frame_code(frame: bytearray, end: bytes) -> Optional[int]:
+    """Exit code from the end marker once all of it has arrived"""
+    pos = frame.find(end)
+    if pos < 0:
+        return None
+    close = frame.find(MARK, pos + len(end))
+    if close < 0:
+        return None
+    code = bytes(frame[pos + len(end):close]).lstrip(b':')
+    return int(code) if code.lstrip(b'-').isdigit() else None
+
+class _Output:
+    """Read side of one output stream of a command
+
+    A named pipe made for the command, opened for reading, non-blocking.
+    A write end is held here until the command ends, so reads do not see
+    end-of-file before the shell has opened the pipe or between writers.
+    """
+
+    def __init__(self, path: Optional[str], name: str, read_fd: Optional[int] = None):
+        self.path = path
+        self.name = name
+        self.decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        self.write_fd = None
+        if read_fd is not None:
+            self.read_fd = read_fd
+            return
+        os.mkfifo(path, 0o600)
+        self.read_fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+        self.write_fd = os.open(path, os.O_WRONLY | os.O_NONBLOCK)
+
+    @classmethod
+    def wrap(cls, fd: int, name: str) -> '_Output':
+        """An existing non-blocking pipe, left open by close()"""
+        return cls(None, name, fd)
+
+    def decode(self, data: bytes, final: bool = False) -> str:
+        return self.decoder.decode(data, final=final)
+
+    def release_writer(self):
+        if self.write_fd is not None:
+            os.close(self.write_fd)
+            self.write_fd = None
+
+    def drain(self):
+        """Yield what is buffered now, without waiting for more
+
+        Stops after DRAIN_LIMIT bytes, so a background job that keeps
+        writing cannot hold the command open.
+        """
+        total = 0
+        while total < DRAIN_LIMIT:
+            try:
+                data = os.read(self.read_fd, READ_SIZE)
+            except BlockingIOError:
+                return
+            if not data:
+                return
+            total += len(data)
+            yield data
+
+    def close(self):
+        if self.path is None:
+            return
+        self.release_writer()
+        os.close(self.read_fd)
+        os.unlink(self.path)
+        self.path = None
+
+class ShellPool:
+    """Warm shell sessions for one working directory
+
+    acquire() hands out an idle session, starting one if none is free;
+    release() returns it unless it died, was stopped or has run MAX_USES
+    commands, in which case it is closed and replaced on a later acquire.
+    Up to size idle sessions are kept, and warm() starts them ahead of
+    time so the first commands do not pay for the shell startup.
+    """
+
+    def __init__(self, cwd: str, size: int = 2, shell: str = DEFAULT_SHELL):
+        self.cwd = cwd
+        self.size = size
+        self.shell = shell
+        self._idle: List[ShellSession] = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def warm(self):
+        """Start idle sessions up to size in the background"""
+        def fill():
+            while True:
+                with self._lock:
+                    if self._closed or len(self._idle) >= self.size:
+                        return
+                try:
+                    session = ShellSession(self.cwd, self.shell)
+                except OSError as e:
+                    logging.error(f"Error starting shell session: {e}")
+                    return
+                self.release(session)
+
+        threading.Thread(target=fill, name='shell-pool-warm', daemon=True).start()
+
+    def acquire(self) -> ShellSession:
+        with self._lock:
+            while self._idle:
+                session = self._idle.pop()
+                if session.alive:
+                    return session
+                session.close()
+        return ShellSession(self.cwd, self.shell)
+
+    def release(self, session: ShellSession):
+        with self._lock:
+            if (session.alive and session.uses < MAX_USES
+                    and not self._closed and len(self._idle) < self.size):
+                self._idle.append(session)
+                return
+        session.close()
+
+    def resize(self, size: int):
+        with self._lock:
+            self.size = max(1, size)
+            extra, self._idle = self._idle[self.size:], self._idle[:self.size]
+        for session in extra:
+            session.close()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for session in idle:
+            session.close()
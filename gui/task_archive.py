@@ -0,0 +1,297 @@
+import os
+import json
+import zlib
+import base64
+import shutil
+import struct
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Tuple
+from .file_writer import get_writer
+
+PACK_MAGIC = b'CTA1'
+RECORD_HEADER = struct.Struct('>4sI')
+
+class TaskArchive:
+    """Append-only pack file holding archived tasks
+
+    Archiving a task appends one compressed record with all of its files to
+    .cline/archive/tasks.pack and removes the task directory, so the hot
+    .cline/tasks directory only holds active tasks. An offset index
+    (.cline/archive/index.json) maps task ids to records and carries the
+    metadata needed to list archived tasks without reading the pack.
+    Restoring or deleting appends a tombstone, so the index can always be
+    rebuilt by replaying the pack; once dead records make up more than
+    COMPACT_RATIO of the pack, it is rewritten without them.
+
+    Reads may come from background threads (e.g. the search index sync)
+    while the UI thread archives, restores or compacts, so every method
+    that reads or moves records holds lock.
+    """
+
+    COMPACT_RATIO = 0.5
+
+    def __init__(self, project_path: str):
+        self.archive_dir = os.path.join(project_path, '.cline', 'archive')
+        self.pack_path = os.path.join(self.archive_dir, 'tasks.pack')
+        self.index_path = os.path.join(self.archive_dir, 'index.json')
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.dead_bytes = 0
+        self.dirty = False
+        self.lock = threading.RLock()
+        self.load()
+
+    def load(self):
+        """Load the offset index, rebuilding it from the pack if needed"""
+        self.entries = {}
+        if not os.path.exists(self.pack_path):
+            return
+        try:
+            with open(self.index_path) as f:
+                data = json.load(f)
+            if data.get('pack_size') == os.path.getsize(self.pack_path):
+                self.entries = data['tasks']
+                self.dead_bytes = data.get('dead_bytes', 0)
+                return
+        except Exception as e:
+            logging.warning(f"Archive index unusable, rebuilding: {e}")
+        self.rebuild_index()
+
+    def save(self):
+        """Write the offset index if it changed"""
+        if not self.dirty:
+            return
+        os.makedirs(self.archive_dir, exist_ok=True)
+        pack_size = os.path.getsize(self.pack_path) if os.path.exists(self.pack_path) else 0
+        get_writer().write_json(
+            self.index_path,
+            {'pack_size': pack_size, 'dead_bytes': self.dead_bytes, 'tasks': self.entries}
+        )
+        self.dirty = False
+
+    def rebuild_index(self):
+        """Replay the pack to recover the offset index"""
+        self.entries = {}
+        self.dead_bytes = 0
+        for offset, length, record in self._scan():
+            task_id = record['id']
+            previous = self.entries.pop(task_id, None)
+            if previous:
+                self.dead_bytes += previous['length']
+            if record.get('removed'):
+                self.dead_bytes += length
+            else:
+                self.entries[task_id] = self._entry(record, offset, length)
+        self.dirty = True
+        self.save()
+
+    def _scan(self):
+        """Yield (offset, length, record) for every intact record in the pack"""
+        with open(self.pack_path, 'rb') as f:
+            offset = 0
+            while True:
+                header = f.read(RECORD_HEADER.size)
+                if len(header) < RECORD_HEADER.size:
+                    return
+                magic, size = RECORD_HEADER.unpack(header)
+                payload = f.read(size)
+                if magic != PACK_MAGIC or len(payload) < size:
+                    logging.error(f"Archive pack truncated at offset {offset}")
+                    return
+                length = RECORD_HEADER.size + size
+                yield offset, length, json.loads(zlib.decompress(payload))
+                offset += length
+
+    @staticmethod
+    def _entry(record: Dict[str, Any], offset: int, length: int) -> Dict[str, Any]:
+        task = record.get('task', {})
+        return {
+            'id': record['id'],
+            'title': task.get('title', record['id']),
+            'status': 'archived',
+            'created': task.get('created', ''),
+            'archived': record.get('archived', ''),
+            'offset': offset,
+            'length': length
+        }
+
+    def _append(self, records: List[Dict[str, Any]]) -> List[Tuple[int, int]]:
+        """Append records with a single fsync and return their (offset, length)"""
+        spans = []
+        os.makedirs(self.archive_dir, exist_ok=True)
+        with open(self.pack_path, 'ab') as f:
+            for record in records:
+                payload = zlib.compress(json.dumps(record).encode())
+                offset = f.tell()
+                f.write(RECORD_HEADER.pack(PACK_MAGIC, len(payload)))
+                f.write(payload)
+                spans.append((offset, RECORD_HEADER.size + len(payload)))
+            f.flush()
+            os.fsync(f.fileno())
+        return spans
+
+    def _record(self, task_id: str, task_dir: str) -> Dict[str, Any]:
+        """Build the pack record for a task directory"""
+        files, binary = {}, {}
+        for root, _, names in os.walk(task_dir):
+            for name in names:
+                path = os.path.join(root, name)
+                rel = os.path.relpath(path, task_dir)
+                with open(path, 'rb') as f:
+                    data = f.read()
+                try:
+                    files[rel] = data.decode('utf-8')
+                except UnicodeDecodeError:
+                    binary[rel] = base64.b64encode(data).decode('ascii')
+
+        task = json.loads(files.get('task.json', '{}'))
+        task['status'] = 'archived'
+        files['task.json'] = json.dumps(task, indent=2)
+
+        return {
+            'id': task_id,
+            'task': task,
+            'archived': datetime.now().isoformat(),
+            'files': files,
+            'binary': binary
+        }
+
+    def archive(self, task_id: str, task_dir: str) -> Dict[str, Any]:
+        """Move a task directory into the pack and return its index entry"""
+        done, errors = self.archive_many([(task_id, task_dir)])
+        if errors:
+            raise OSError(errors[task_id])
+        return self.entries[task_id]
+
+    def archive_many(self, tasks: Iterable[Tuple[str, str]]) -> Tuple[List[str], Dict[str, str]]:
+        """Move (task_id, task_dir) pairs into the pack in one append
+
+        Returns the archived task ids and a map of task id to error for
+        tasks that could not be read.
+        """
+        records, errors = [], {}
+        for task_id, task_dir in tasks:
+            try:
+                records.append((self._record(task_id, task_dir), task_dir))
+            except Exception as e:
+                errors[task_id] = str(e)
+        if not records:
+            return [], errors
+
+        done = []
+        with self.lock:
+            spans = self._append([record for record, _ in records])
+            for (record, task_dir), (offset, length) in zip(records, spans):
+                task_id = record['id']
+                previous = self.entries.get(task_id)
+                if previous:
+                    self.dead_bytes += previous['length']
+                self.entries[task_id] = self._entry(record, offset, length)
+                shutil.rmtree(task_dir, ignore_errors=True)
+                done.append(task_id)
+            self.dirty = True
+        return done, errors
+
+    def delete_many(self, task_ids: Iterable[str]) -> List[str]:
+        """Permanently remove archived tasks with one tombstone append"""
+        with self.lock:
+            task_ids = [t for t in task_ids if t in self.entries]
+            if not task_ids:
+                return []
+            spans = self._append([{'id': t, 'removed': 'deleted'} for t in task_ids])
+            for task_id, (_, length) in zip(task_ids, spans):
+                self.dead_bytes += self.entries.pop(task_id)['length'] + length
+            self.dirty = True
+            self.compact()
+        return task_ids
+
+    def read(self, task_id: str) -> Dict[str, Any]:
+        """Read the archived record for a task"""
+        with self.lock:
+            entry = self.entries[task_id]
+            with open(self.pack_path, 'rb') as f:
+                f.seek(entry['offset'])
+                magic, size = RECORD_HEADER.unpack(f.read(RECORD_HEADER.size))
+                if magic != PACK_MAGIC:
+                    raise ValueError(f"Corrupt archive record for {task_id}")
+                record = json.loads(zlib.decompress(f.read(size)))
+        # A stale offset can land on another intact record
+        if record.get('id') != task_id or record.get('removed'):
+            raise ValueError(f"Archive index points {task_id} at the wrong record")
+        return record
+
+    def read_file(self, task_id: str, name: str = 'task.md') -> str:
+        """Read one archived text file of a task"""
+        return self.read(task_id)['files'][name]
+
+    def restore(self, task_id: str, tasks_dir: str, status: str = 'active') -> Dict[str, Any]:
+        """Write an archived task back to tasks_dir and return its task.json"""
+        with self.lock:
+            return self._restore(task_id, tasks_dir, status)
+
+    def _restore(self, task_id: str, tasks_dir: str, status: str) -> Dict[str, Any]:
+        record = self.read(task_id)
+        task_dir = os.path.join(tasks_dir, task_id)
+        os.makedirs(task_dir, exist_ok=True)
+
+        task = record['task']
+        task['status'] = status
+        files = dict(record['files'])
+        files['task.json'] = json.dumps(task, indent=2)
+
+        writer = get_writer()
+        for rel, text in files.items():
+            path = os.path.join(task_dir, rel)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            writer.write_text(path, text)
+        for rel, data in record.get('binary', {}).items():
+            path = os.path.join(task_dir, rel)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            writer.write_bytes(path, base64.b64decode(data))
+        # Files must be on disk before the tombstone drops the pack copy
+        writer.flush()
+
+        [(_, length)] = self._append([{'id': task_id, 'removed': 'restored'}])
+        self.dead_bytes += self.entries.pop(task_id)['length'] + length
+        self.dirty = True
+        self.compact()
+        return task
+
+    def contains(self, task_id: str) -> bool:
+        return task_id in self.entries
+
+    def tasks(self) -> List[Dict[str, Any]]:
+        return list(self.entries.values())
+
+    def compact(self, force: bool = False):
+        """Rewrite the pack without dead records
+
+        Unless force is set, only once they exceed COMPACT_RATIO of it.
+        """
+        with self.lock:
+            self._compact(force)
+
+    def _compact(self, force: bool):
+        if not os.path.exists(self.pack_path):
+            return
+        pack_size = os.path.getsize(self.pack_path)
+        if not force and self.dead_bytes <= pack_size * self.COMPACT_RATIO:
+            return
+
+        tmp_path = self.pack_path + '.tmp'
+        entries = {}
+        with open(self.pack_path, 'rb') as src, open(tmp_path, 'wb') as dst:
+            for task_id, entry in sorted(self.entries.items(), key=lambda e: e[1]['offset']):
+                src.seek(entry['offset'])
+                data = src.read(entry['length'])
+                entries[task_id] = dict(entry, offset=dst.tell())
+                dst.write(data)
+            dst.flush()
+            os.fsync(dst.fileno())
+        os.replace(tmp_path, self.pack_path)
+
+        self.entries = entries
+        self.dead_bytes = 0
+        self.dirty = True
+        self.save()
@@ -0,0 +1,150 @@
+"""Headless task commands: cline-tasks list|new|archive|search|import
+
+Only imports the task store modules, so it starts without loading
+tkinter, pyautogui or the AI clients.
+"""
+import os
+import sys
+import json
+import logging
+import argparse
+from typing import List, Optional
+from .file_writer import get_writer
+from .task_store import TaskStore
+
+def find_project(start: Optional[str] = None) -> Optional[str]:
+    """Nearest directory at or above start that has a .cline directory"""
+    path = os.path.abspath(start or os.getcwd())
+    while True:
+        if os.path.isdir(os.path.join(path, '.cline')):
+            return path
+        parent = os.path.dirname(path)
+        if parent == path:
+            return None
+        path = parent
+
+def _print_tasks(tasks, as_json: bool):
+    if as_json:
+        print(json.dumps(tasks, indent=2))
+        return
+    for task in tasks:
+        print(f"{task['id']}\t{task.get('status', '')}\t{task.get('created', '')}\t{task.get('title', '')}")
+
+def cmd_list(store: TaskStore, args) -> int:
+    tasks = store.list_tasks(
+        args.sort,
+        args.reverse,
+        status=args.status,
+        created_from=args.created_from,
+        created_to=args.created_to
+    )
+    _print_tasks(tasks, args.json)
+    return 0
+
+def cmd_new(store: TaskStore, args) -> int:
+    keys = args.keys.split(',') if args.keys else []
+    task = store.create_task(args.title, args.prompt, args.service, keys)
+    if args.json:
+        print(json.dumps(task, indent=2))
+    else:
+        print(task['id'])
+    return 0
+
+def cmd_archive(store: TaskStore, args) -> int:
+    store.index.refresh()
+    missing = [t for t in args.task_ids if store.index.get(t) is None]
+    done, errors = store.archive_tasks([t for t in args.task_ids if t not in missing])
+    for task_id in missing:
+        errors[task_id] = 'no such task'
+    if args.json:
+        print(json.dumps({'archived': done, 'errors': errors}, indent=2))
+    else:
+        for task_id in done:
+            print(task_id)
+        for task_id, error in errors.items():
+            print(f"{task_id}: {error}", file=sys.stderr)
+    return 1 if errors else 0
+
+def cmd_search(store: TaskStore, args) -> int:
+    store.index.refresh()
+    store.index.save()
+    tasks = store.index.query(args.sort, args.reverse, task_ids=store.search(args.query))
+    _print_tasks(tasks, args.json)
+    return 0
+
+def cmd_import(store: TaskStore, args) -> int:
+    # Only this command needs the import machinery (csv, dataclasses, ...)
+    from .task_import import import_tasks
+    result = import_tasks(store, args.file, args.workers)
+    if args.json:
+        print(json.dumps({
+            'created': result.created,
+            'errors': [{'line': n, 'error': e} for n, e in result.errors]
+        }, indent=2))
+    else:
+        print(f"Imported {len(result.created)} task(s)")
+        for line_no, error in result.errors:
+            print(f"line {line_no}: {error}", file=sys.stderr)
+    return 1 if result.errors else 0
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='cline-tasks', description='Manage Cline tasks without the GUI')
+    parser.add_argument('--project', help='Project directory (default: $CLINE_PROJECT or nearest parent with .cline)')
+    parser.add_argument('--json', action='store_true', help='Print JSON instead of tab-separated lines')
+    # Also accepted after the command (cline-tasks list --json); SUPPRESS keeps
+    # the subcommand from resetting a --json given before it
+    output = argparse.ArgumentParser(add_help=False)
+    output.add_argument('--json', action='store_true', default=argparse.SUPPRESS,
+                        help='Print JSON instead of tab-separated lines')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    list_parser = commands.add_parser('list', help='List tasks', parents=[output])
+    list_parser.add_argument('--status', help='Only tasks with this status')
+    list_parser.add_argument('--from', dest='created_from', help='Created on or after (YYYY-MM-DD)')
+    list_parser.add_argument('--to', dest='created_to', help='Created on or before (YYYY-MM-DD)')
+    list_parser.set_defaults(func=cmd_list)
+
+    new_parser = commands.add_parser('new', help='Create a task', parents=[output])
+    new_parser.add_argument('title')
+    new_parser.add_argument('--prompt', default='', help='System prompt')
+    new_parser.add_argument('--service', default='', help='Credential service')
+    new_parser.add_argument('--keys', default='', help='Comma-separated credential keys')
+    new_parser.set_defaults(func=cmd_new)
+
+    archive_parser = commands.add_parser('archive', help='Archive tasks', parents=[output])
+    archive_parser.add_argument('task_ids', nargs='+')
+    archive_parser.set_defaults(func=cmd_archive)
+
+    search_parser = commands.add_parser('search', help='Full-text search over task.md', parents=[output])
+    search_parser.add_argument('query', help='Terms, prefix* terms and "quoted phrases"')
+    search_parser.set_defaults(func=cmd_search)
+
+    import_parser = commands.add_parser('import', help='Bulk-create tasks from a .jsonl or .csv file', parents=[output])
+    import_parser.add_argument('file')
+    import_parser.add_argument('--workers', type=int, default=8, help='Parallel writers')
+    import_parser.set_defaults(func=cmd_import)
+
+    for sub in (list_parser, search_parser):
+        sub.add_argument('--sort', default='created', choices=('created', 'title', 'status'))
+        sub.add_argument('--reverse', action='store_true')
+    return parser
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(format='cline-tasks: %(message)s')
+    project = args.project or os.environ.get('CLINE_PROJECT') or find_project()
+    if not project or not os.path.isdir(project):
+        print("cline-tasks: no project found, use --project or set CLINE_PROJECT", file=sys.stderr)
+        return 2
+    try:
+        status = args.func(TaskStore(project), args)
+        # Index writes still queued must not be left to the at-exit flush,
+        # which could only log a failure
+        get_writer().flush()
+    except OSError as e:
+        print(f"cline-tasks: {e}", file=sys.stderr)
+        return 1
+    return status
+
+if __name__ == '__main__':
+    sys.exit(main())
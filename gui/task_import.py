@@ -0,0 +1,139 @@
+import os
+import csv
+import json
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from .task_store import TaskStore
+from .file_writer import atomic_write
+
+# Accepted column names for each task.json field
+FIELD_ALIASES = {
+    'title': ('title', 'description', 'desc', 'summary'),
+    'systemPrompt': ('systemPrompt', 'system_prompt', 'prompt'),
+    'service': ('service',),
+    'keys': ('keys',),
+    'status': ('status',),
+    'created': ('created',)
+}
+
+@dataclass
+class ImportResult:
+    created: List[str] = field(default_factory=list)
+    errors: List[Tuple[int, str]] = field(default_factory=list)
+
+def read_records(path: str) -> Iterator[Tuple[int, Optional[Dict[str, Any]], Optional[str]]]:
+    """Stream (line, record, error) from a .jsonl or .csv file
+
+    Exactly one of record and error is set. CSV files need a header row.
+    """
+    if path.lower().endswith('.csv'):
+        with open(path, newline='') as f:
+            reader = csv.DictReader(f)
+            for record in reader:
+                yield reader.line_num, record, None
+        return
+
+    with open(path) as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_no, None, f"Invalid JSON: {e}"
+                continue
+            if isinstance(record, dict):
+                yield line_no, record, None
+            else:
+                yield line_no, None, "Expected a JSON object"
+
+def normalize_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Map an import record onto task.json fields"""
+    fields = {}
+    for name, aliases in FIELD_ALIASES.items():
+        for alias in aliases:
+            value = record.get(alias)
+            if value not in (None, ''):
+                fields[name] = value
+                break
+
+    title = str(fields.get('title', '')).strip()
+    if not title:
+        raise ValueError("Missing title")
+
+    keys = fields.get('keys', [])
+    if isinstance(keys, str):
+        keys = keys.replace(';', ',').split(',')
+    created = fields.get('created')
+    return {
+        'title': title,
+        'prompt': str(fields.get('systemPrompt', '')),
+        'service': str(fields.get('service', '')),
+        'keys': [str(k).strip() for k in keys if str(k).strip()],
+        'status': str(fields.get('status', 'active')),
+        'created': datetime.fromisoformat(created) if created else None
+    }
+
+def _write_task(store: TaskStore, record: Dict[str, Any]) -> str:
+    task = store.new_task(**normalize_record(record))
+    task_dir = store.task_dir(task['id'])
+    try:
+        # task.json last: the index and watcher key off it
+        files = store.task_files(task)
+        atomic_write(os.path.join(task_dir, 'task.md'), files['task.md'])
+        atomic_write(os.path.join(task_dir, 'task.json'), files['task.json'])
+    except BaseException:
+        for name in os.listdir(task_dir):
+            os.unlink(os.path.join(task_dir, name))
+        os.rmdir(task_dir)
+        raise
+    return task['id']
+
+def write_tasks(store: TaskStore, path: str, workers: int = 8, progress=None) -> ImportResult:
+    """Create a task for every record in path without touching the index
+
+    Records are read lazily and written by a pool of workers; at most a
+    few batches are in flight, so memory use does not grow with the file.
+    progress(done_count) is called from this thread as tasks finish.
+    """
+    result = ImportResult()
+    max_pending = workers * 4
+
+    def collect(done):
+        for future in done:
+            line_no = pending.pop(future)
+            try:
+                result.created.append(future.result())
+            except Exception as e:
+                result.errors.append((line_no, str(e)))
+        if progress:
+            progress(len(result.created))
+
+    pending = {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='task-import') as executor:
+        for line_no, record, error in read_records(path):
+            if error:
+                result.errors.append((line_no, error))
+                continue
+            pending[executor.submit(_write_task, store, record)] = line_no
+            if len(pending) >= max_pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            collect(done)
+
+    result.errors.sort()
+    if result.errors:
+        logging.error(f"Task import from {path}: {len(result.errors)} record(s) failed")
+    return result
+
+def import_tasks(store: TaskStore, path: str, workers: int = 8, progress=None) -> ImportResult:
+    """Bulk-create tasks from a .jsonl or .csv file and index them once"""
+    result = write_tasks(store, path, workers, progress)
+    store.index_tasks(result.created)
+    return result
@@ -0,0 +1,315 @@
+import os
+import json
+import shutil
+import logging
+from contextlib import contextmanager
+from itertools import chain
+from typing import Callable, Dict, Iterable, List, Optional, Any, Set, Tuple
+
+from .task_archive import TaskArchive
+from .file_writer import get_writer
+
+INDEX_VERSION = 1
+INDEX_FILENAME = 'task_index.json'
+
+class TaskIndex:
+    """Persistent index of task metadata stored under .cline/
+
+    Each entry records a task's id, title, status, created time and the
+    mtime of its task.json, so a refresh only re-reads tasks whose file
+    changed since the last scan. Archived tasks live in a TaskArchive pack
+    instead of .cline/tasks; they are listed and queried alongside active
+    tasks but never scanned.
+    """
+
+    def __init__(self, project_path: str):
+        self.project_path = project_path
+        self.cline_dir = os.path.join(project_path, '.cline')
+        self.tasks_dir = os.path.join(self.cline_dir, 'tasks')
+        self.index_path = os.path.join(self.cline_dir, INDEX_FILENAME)
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.dirty = False
+        self._transaction_depth = 0
+        self.archive = TaskArchive(project_path)
+        self.load()
+
+    def load(self):
+        """Load index from disk, starting empty if missing or unreadable"""
+        self.entries = {}
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path) as f:
+                data = json.load(f)
+            if data.get('version') == INDEX_VERSION:
+                self.entries = data.get('tasks', {})
+        except Exception as e:
+            logging.error(f"Error loading task index: {e}")
+
+    def save(self):
+        """Write index (and archive index) to disk if they changed
+
+        Inside a transaction the write is deferred until it ends.
+        """
+        if self._transaction_depth:
+            return
+        self.archive.save()
+        if not self.dirty:
+            return
+        os.makedirs(self.cline_dir, exist_ok=True)
+        get_writer().write_json(self.index_path, {'version': INDEX_VERSION, 'tasks': self.entries})
+        self.dirty = False
+
+    def _task_json(self, task_id: str) -> str:
+        return os.path.join(self.tasks_dir, task_id, 'task.json')
+
+    def _read_entry(self, task_id: str, mtime: int) -> Optional[Dict[str, Any]]:
+        """Build an index entry from a task's task.json"""
+        try:
+            with open(self._task_json(task_id)) as f:
+                task = json.load(f)
+        except Exception as e:
+            logging.error(f"Error reading task {task_id}: {e}")
+            return None
+        return self._entry(task_id, task, mtime)
+
+    @staticmethod
+    def _entry(task_id: str, task: Dict[str, Any], mtime: Optional[int]) -> Dict[str, Any]:
+        return {
+            'id': task_id,
+            'title': task.get('title', task_id),
+            'status': task.get('status', 'active'),
+            'created': task.get('created', ''),
+            'mtime': mtime
+        }
+
+    def refresh(self) -> Tuple[Set[str], Set[str], Set[str]]:
+        """Sync index with the tasks directory
+
+        Only tasks whose task.json mtime differs from the indexed value are
+        re-read. Returns (added, modified, removed) task ids.
+        """
+        added, modified = set(), set()
+        seen = set()
+
+        if os.path.isdir(self.tasks_dir):
+            with os.scandir(self.tasks_dir) as it:
+                for entry in it:
+                    if not entry.is_dir():
+                        continue
+                    try:
+                        mtime = os.stat(self._task_json(entry.name)).st_mtime_ns
+                    except OSError:
+                        continue
+                    seen.add(entry.name)
+
+                    current = self.entries.get(entry.name)
+                    if current and current.get('mtime') == mtime:
+                        continue
+
+                    task = self._read_entry(entry.name, mtime)
+                    if task is None:
+                        continue
+                    self.entries[entry.name] = task
+                    self.dirty = True
+                    (modified if current else added).add(entry.name)
+
+        removed = set(self.entries) - seen
+        for task_id in removed:
+            del self.entries[task_id]
+            self.dirty = True
+
+        return added, modified, removed
+
+    def refresh_tasks(self, task_ids: Iterable[str]) -> Tuple[Set[str], Set[str], Set[str]]:
+        """Sync only the given task directories, e.g. from watcher events
+
+        Returns (added, modified, removed) task ids.
+        """
+        added, modified, removed = set(), set(), set()
+        for task_id in task_ids:
+            current = self.entries.get(task_id)
+            try:
+                mtime = os.stat(self._task_json(task_id)).st_mtime_ns
+            except OSError:
+                if current:
+                    self.remove_task(task_id)
+                    removed.add(task_id)
+                continue
+
+            if current and current.get('mtime') == mtime:
+                continue
+            task = self._read_entry(task_id, mtime)
+            if task is None:
+                continue
+            self.entries[task_id] = task
+            self.dirty = True
+            (modified if current else added).add(task_id)
+
+        return added, modified, removed
+
+    def update_task(self, task_id: str, task: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Re-read a single task after it was written
+
+        When the written task dict is passed, the entry is built from it
+        instead of disk (the write may still be queued); the unknown mtime
+        makes the next refresh re-read the file once.
+        """
+        if task is not None:
+            entry = self._entry(task_id, task, None)
+            self.entries[task_id] = entry
+            self.dirty = True
+            return entry
+
+        try:
+            mtime = os.stat(self._task_json(task_id)).st_mtime_ns
+        except OSError:
+            self.remove_task(task_id)
+            return None
+
+        task = self._read_entry(task_id, mtime)
+        if task is not None:
+            self.entries[task_id] = task
+            self.dirty = True
+        return task
+
+    def remove_task(self, task_id: str):
+        """Drop a task from the index"""
+        if self.entries.pop(task_id, None) is not None:
+            self.dirty = True
+
+    @contextmanager
+    def transaction(self):
+        """Group changes so the index is written once at the end
+
+        Task files queued on the shared writer during the transaction are
+        flushed together with the index when the outermost block exits.
+        """
+        self._transaction_depth += 1
+        try:
+            yield self
+        finally:
+            self._transaction_depth -= 1
+            if not self._transaction_depth:
+                self.save()
+                get_writer().flush()
+
+    def archive_tasks(self, task_ids: Iterable[str]) -> Tuple[List[str], Dict[str, str]]:
+        """Move active tasks into the archive pack in one append
+
+        Returns the archived ids and a map of task id to error.
+        """
+        active = [t for t in task_ids if t in self.entries]
+        done, errors = self.archive.archive_many(
+            (t, os.path.join(self.tasks_dir, t)) for t in active
+        )
+        for task_id in done:
+            self.remove_task(task_id)
+        return done, errors
+
+    def set_status(self, task_ids: Iterable[str], status: str) -> Tuple[List[str], Dict[str, str]]:
+        """Change the status of tasks, archiving or restoring as needed"""
+        task_ids = list(task_ids)
+        if status == 'archived':
+            return self.archive_tasks(task_ids)
+
+        done, errors = [], {}
+        for task_id in task_ids:
+            try:
+                if self.is_archived(task_id):
+                    self.restore_task(task_id, status)
+                else:
+                    path = self._task_json(task_id)
+                    with open(path) as f:
+                        task = json.load(f)
+                    if task.get('status') == status:
+                        continue
+                    task['status'] = status
+                    get_writer().write_json(path, task, indent=2)
+                    self.update_task(task_id, task)
+                done.append(task_id)
+            except Exception as e:
+                errors[task_id] = str(e)
+        return done, errors
+
+    def delete_tasks(self, task_ids: Iterable[str]) -> Tuple[List[str], Dict[str, str]]:
+        """Permanently delete active and archived tasks"""
+        done, errors, archived = [], {}, []
+        for task_id in task_ids:
+            if self.is_archived(task_id):
+                archived.append(task_id)
+                continue
+            try:
+                shutil.rmtree(os.path.join(self.tasks_dir, task_id))
+                self.remove_task(task_id)
+                done.append(task_id)
+            except Exception as e:
+                errors[task_id] = str(e)
+        done.extend(self.archive.delete_many(archived))
+        return done, errors
+
+    def archive_task(self, task_id: str) -> Dict[str, Any]:
+        """Move a task into the archive pack"""
+        entry = self.archive.archive(task_id, os.path.join(self.tasks_dir, task_id))
+        self.remove_task(task_id)
+        return entry
+
+    def restore_task(self, task_id: str, status: str = 'active') -> Optional[Dict[str, Any]]:
+        """Move a task from the archive pack back into .cline/tasks"""
+        task = self.archive.restore(task_id, self.tasks_dir, status)
+        return self.update_task(task_id, task)
+
+    def is_archived(self, task_id: str) -> bool:
+        return task_id not in self.entries and self.archive.contains(task_id)
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        return self.entries.get(task_id) or self.archive.entries.get(task_id)
+
+    def _all(self):
+        """Active entries followed by archived ones not shadowed by an active copy"""
+        archived = (t for t in self.archive.entries.values() if t['id'] not in self.entries)
+        return chain(self.entries.values(), archived)
+
+    def tasks(self) -> List[Dict[str, Any]]:
+        """Indexed tasks ordered by creation time"""
+        return sorted(self.entries.values(), key=lambda t: (t['created'], t['id']))
+
+    def query(self, sort_by: str = 'created', reverse: bool = False,
+              **filters) -> List[Dict[str, Any]]:
+        """Filter and sort indexed tasks (see matches for the filters)"""
+        tasks = [t for t in self._all() if self.matches(t, **filters)]
+        return sorted(tasks, key=self.sort_key(sort_by), reverse=reverse)
+
+    @staticmethod
+    def sort_key(sort_by: str = 'created') -> Callable[[Dict[str, Any]], Tuple]:
+        """Sort key function for a task field"""
+        if sort_by == 'title':
+            return lambda t: (t['title'].lower(), t['id'])
+        return lambda t: (t.get(sort_by) or '', t['id'])
+
+    @staticmethod
+    def matches(task: Dict[str, Any], status: Optional[str] = None,
+                created_from: Optional[str] = None,
+                created_to: Optional[str] = None,
+                task_ids: Optional[Set[str]] = None) -> bool:
+        """Check a task against status, created-date and id filters
+
+        created_from/created_to are ISO date prefixes (e.g. 2024-11-25) and
+        are inclusive. task_ids restricts to a set such as search results.
+        """
+        if task_ids is not None and task['id'] not in task_ids:
+            return False
+        if status and task['status'] != status:
+            return False
+        if created_from and task['created'][:len(created_from)] < created_from:
+            return False
+        if created_to and task['created'][:len(created_to)] > created_to:
+            return False
+        return True
+
+    def statuses(self) -> List[str]:
+        """Distinct statuses present in the index"""
+        statuses = {t['status'] for t in self.entries.values()}
+        if self.archive.entries:
+            statuses.add('archived')
+        return sorted(statuses)
@@ -1,12 +1,20 @@
 import tkinter as tk
-from tkinter import ttk, scrolledtext, messagebox
-import json
+from tkinter import ttk, scrolledtext, messagebox, simpledialog, filedialog
 import os
+import logging
 import subprocess
 import pyautogui
 import pyperclip
 import time
-from datetime import datetime
+import queue
+import threading
+from .task_store import TaskStore
+from .task_import import write_tasks
+from .virtual_task_list import VirtualTaskList
+from .task_watcher import TaskWatcher
+from .task_search import TaskSearchIndex
+from .preview_loader import PreviewLoader
+from .file_writer import get_writer
 
 class TaskManagement(ttk.LabelFrame):
     def __init__(self, parent, security_checks):
@@ -14,6 +22,15 @@ class TaskManagement(ttk.LabelFrame):
         
         # State
         self.current_project = None
+        self.task_store = None
+        self.task_index = None
+        self.task_watcher = None
+        self.search_index = None
+        self.search_ready = False
+        self.search_error = None
+        self.search_pending = set()
+        self.search_save_pending = False
+        self.task_changes = queue.Queue()
         self.security_checks = security_checks
         
         # Create main layout
@@ -29,15 +46,48 @@ class TaskManagement(ttk.LabelFrame):
         toolbar.pack(fill='x', pady=5)
         
         ttk.Button(toolbar, text="New Task", command=self.new_task_dialog).pack(side='left', padx=5)
+        ttk.Button(toolbar, text="Import", command=self.import_tasks_dialog).pack(side='left', padx=5)
         ttk.Button(toolbar, text="Edit", command=self.edit_task).pack(side='left', padx=5)
         ttk.Button(toolbar, text="Open", command=self.open_task).pack(side='left', padx=5)
         ttk.Button(toolbar, text="Archive", command=self.archive_task).pack(side='left', padx=5)
+        ttk.Button(toolbar, text="Restore", command=self.restore_task).pack(side='left', padx=5)
+        ttk.Button(toolbar, text="Set Status", command=self.set_status_dialog).pack(side='left', padx=5)
+        ttk.Button(toolbar, text="Delete", command=self.delete_tasks).pack(side='left', padx=5)
         ttk.Button(toolbar, text="Set Current", command=self.set_current_task).pack(side='left', padx=5)
         ttk.Button(toolbar, text="Tell Cline", command=self.tell_cline).pack(side='left', padx=5)
         
-        # Tasks list
-        self.tasks_tree = ttk.Treeview(left_frame, columns=('Status',), show='tree headings')
-        self.tasks_tree.heading('Status', text='Status')
+        # Search
+        search_bar = ttk.Frame(left_frame)
+        search_bar.pack(fill='x', pady=(0, 5))
+        
+        ttk.Label(search_bar, text="Search:").pack(side='left', padx=(5, 0))
+        self.search_entry = ttk.Entry(search_bar)
+        self.search_entry.pack(side='left', fill='x', expand=True, padx=5)
+        self.search_entry.bind('<Return>', lambda e: self.apply_filters())
+        ttk.Button(search_bar, text="Clear", command=self.clear_search).pack(side='left', padx=5)
+        self.search_status = ttk.Label(search_bar, text="")
+        self.search_status.pack(side='left', padx=5)
+        
+        # Filters
+        filter_bar = ttk.Frame(left_frame)
+        filter_bar.pack(fill='x')
+        
+        ttk.Label(filter_bar, text="Status:").pack(side='left', padx=(5, 0))
+        self.status_filter = ttk.Combobox(filter_bar, values=('All',), width=10, state='readonly')
+        self.status_filter.set('All')
+        self.status_filter.pack(side='left', padx=5)
+        self.status_filter.bind('<<ComboboxSelected>>', lambda e: self.apply_filters())
+        
+        ttk.Label(filter_bar, text="Created from:").pack(side='left')
+        self.created_from_entry = ttk.Entry(filter_bar, width=11)
+        self.created_from_entry.pack(side='left', padx=5)
+        ttk.Label(filter_bar, text="to:").pack(side='left')
+        self.created_to_entry = ttk.Entry(filter_bar, width=11)
+        self.created_to_entry.pack(side='left', padx=5)
+        ttk.Button(filter_bar, text="Filter", command=self.apply_filters).pack(side='left', padx=5)
+        
+        # Tasks list - only rows in view are created, so large projects stay responsive
+        self.tasks_tree = VirtualTaskList(left_frame)
         self.tasks_tree.pack(expand=True, fill='both', pady=5)
         
         # Right side - Task preview
@@ -50,9 +100,13 @@ class TaskManagement(ttk.LabelFrame):
         
         self.preview_text = scrolledtext.ScrolledText(preview_frame, wrap=tk.WORD)
         self.preview_text.pack(expand=True, fill='both', padx=5, pady=5)
+        self.preview = PreviewLoader(self.preview_text)
         
         # Bind selection
-        self.tasks_tree.bind('<<TreeviewSelect>>', self.on_task_select)
+        self.tasks_tree.bind('<<TaskSelect>>', self.on_task_select)
+        
+        # Apply changes reported by the task watcher
+        self.process_task_changes()
     
     def tell_cline(self):
         """Tell Cline about the current task using keyboard shortcuts"""
@@ -66,6 +120,9 @@ class TaskManagement(ttk.LabelFrame):
             return
         
         task_id = selected[0]
+        if self.task_index.is_archived(task_id):
+            messagebox.showwarning("Warning", "Task is archived, please restore it first")
+            return
         task_path = os.path.join(
             self.current_project['path'],
             '.cline',
@@ -97,7 +154,16 @@ class TaskManagement(ttk.LabelFrame):
     def set_project(self, project):
         """Set current project"""
         self.current_project = project
-        self.refresh_tasks()
+        self.task_store = TaskStore(project['path'])
+        self.task_index = self.task_store.index
+        # One scan of the tasks directory; migration updates the index itself
+        self.task_index.refresh()
+        self.migrate_archived_tasks()
+        self.task_index.save()
+        self.reset_filters()
+        self.populate_tasks()
+        self.watch_tasks()
+        self.load_search_index()
         
         # Open VS Code for project
         try:
@@ -117,6 +183,9 @@ class TaskManagement(ttk.LabelFrame):
             return
         
         task_id = selected[0]
+        if self.task_index.is_archived(task_id):
+            messagebox.showwarning("Warning", "Task is archived, please restore it first")
+            return
         
         # Create current_task.md symlink
         current_task_path = os.path.join(
@@ -141,8 +210,9 @@ class TaskManagement(ttk.LabelFrame):
         os.symlink(task_path, current_task_path)
         
         # Also write task ID to current_task.txt for Cline CLI
-        with open(os.path.join(self.current_project['path'], '.cline', 'current_task.txt'), 'w') as f:
-            f.write(task_id)
+        writer = get_writer()
+        writer.write_text(os.path.join(self.current_project['path'], '.cline', 'current_task.txt'), task_id)
+        writer.flush()
         
         # Copy task path to clipboard
         pyperclip.copy(task_path)
@@ -153,7 +223,7 @@ class TaskManagement(ttk.LabelFrame):
         """Handle task selection"""
         selected = self.tasks_tree.selection()
         if not selected:
-            self.preview_text.delete('1.0', tk.END)
+            self.preview.clear()
             return
         
         task_id = selected[0]
@@ -165,14 +235,16 @@ class TaskManagement(ttk.LabelFrame):
             'task.md'
         )
         
-        try:
-            with open(task_path) as f:
-                content = f.read()
-            self.preview_text.delete('1.0', tk.END)
-            self.preview_text.insert('1.0', content)
-        except Exception as e:
-            self.preview_text.delete('1.0', tk.END)
-            self.preview_text.insert('1.0', f"Error loading task: {e}")
+        # Read off the Tk thread; stale loads are dropped as selection moves
+        if self.task_index.is_archived(task_id):
+            archive = self.task_index.archive
+            self.preview.load(
+                archive.pack_path,
+                reader=lambda path: archive.read_file(task_id, 'task.md'),
+                key=task_path
+            )
+        else:
+            self.preview.load(task_path)
     
     def get_system_prompt(self, user_prompt):
         """Get system prompt with environment details"""
@@ -225,16 +297,10 @@ class TaskManagement(ttk.LabelFrame):
             return
         
         task_id = selected[0]
-        task_path = os.path.join(
-            self.current_project['path'],
-            '.cline',
-            'tasks',
-            task_id,
-            'task.json'
-        )
-        
-        with open(task_path) as f:
-            task = json.load(f)
+        if self.task_index.is_archived(task_id):
+            messagebox.showwarning("Warning", "Task is archived, please restore it first")
+            return
+        task = self.task_store.load_task(task_id)
         
         dialog = tk.Toplevel(self)
         dialog.title(f"Edit Task: {task['title']}")
@@ -290,36 +356,11 @@ class TaskManagement(ttk.LabelFrame):
             task['service'] = service
             task['keys'] = keys.split(',') if keys else []
             
-            with open(task_path, 'w') as f:
-                json.dump(task, f, indent=2)
-            
-            # Update task.md
-            md_path = os.path.join(
-                self.current_project['path'],
-                '.cline',
-                'tasks',
-                task_id,
-                'task.md'
-            )
-            
-            with open(md_path, 'w') as f:
-                f.write(f"# Task: {desc}\n")
-                f.write(f"Date: {task['created']}\n\n")
-                
-                f.write("## Required Credentials\n")
-                if service and keys:
-                    f.write(f"- Service: {service}\n")
-                    f.write(f"- Keys: {keys}\n\n")
-                else:
-                    f.write("- No credentials required\n\n")
-                
-                f.write("## System Prompt\n")
-                f.write(f"{self.get_system_prompt(prompt)}\n\n")
-                f.write("## Steps\n1. [Step details]\n\n")
-                f.write("## Results\n- [ ] Task completed\n")
+            self.task_store.save_task(task, self.get_system_prompt(prompt))
+            self.update_search_index(task_id)
             
             dialog.destroy()
-            self.refresh_tasks()
+            self.populate_tasks()
             self.on_task_select(None)  # Refresh preview
         
         # Buttons
@@ -377,44 +418,18 @@ class TaskManagement(ttk.LabelFrame):
                 messagebox.showwarning("Warning", "Please enter a description")
                 return
             
-            timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-            task_id = f"task_{timestamp}_{desc.lower().replace(' ', '_')}"
-            task_dir = os.path.join(self.current_project['path'], '.cline', 'tasks', task_id)
-            os.makedirs(task_dir)
-            
-            # Create task.json
-            task_data = {
-                'id': task_id,
-                'title': desc,
-                'systemPrompt': prompt,
-                'service': service,
-                'keys': keys.split(',') if keys else [],
-                'status': 'active',
-                'created': datetime.now().isoformat()
-            }
-            
-            with open(os.path.join(task_dir, 'task.json'), 'w') as f:
-                json.dump(task_data, f, indent=2)
-            
-            # Create task.md
-            with open(os.path.join(task_dir, 'task.md'), 'w') as f:
-                f.write(f"# Task: {desc}\n")
-                f.write(f"Date: {timestamp}\n\n")
-                
-                f.write("## Required Credentials\n")
-                if service and keys:
-                    f.write(f"- Service: {service}\n")
-                    f.write(f"- Keys: {keys}\n\n")
-                else:
-                    f.write("- No credentials required\n\n")
-                
-                f.write("## System Prompt\n")
-                f.write(f"{self.get_system_prompt(prompt)}\n\n")
-                f.write("## Steps\n1. [Step details]\n\n")
-                f.write("## Results\n- [ ] Task completed\n")
+            task = self.task_store.create_task(
+                desc,
+                prompt,
+                service,
+                keys.split(',') if keys else [],
+                self.get_system_prompt(prompt)
+            )
+            task_id = task['id']
+            self.update_search_index(task_id)
             
             dialog.destroy()
-            self.refresh_tasks()
+            self.populate_tasks()
         
         # Buttons
         btn_frame = ttk.Frame(dialog)
@@ -422,6 +437,54 @@ class TaskManagement(ttk.LabelFrame):
         ttk.Button(btn_frame, text="Create", command=create_task).pack(side='right', padx=5)
         ttk.Button(btn_frame, text="Cancel", command=dialog.destroy).pack(side='right')
     
+    def import_tasks_dialog(self):
+        """Bulk-create tasks from a JSONL or CSV file"""
+        if not self.current_project:
+            messagebox.showwarning("Warning", "Please select a project first")
+            return
+        
+        path = filedialog.askopenfilename(
+            title="Import Tasks",
+            filetypes=[("Task files", "*.jsonl *.csv"), ("All files", "*.*")]
+        )
+        if not path:
+            return
+        
+        # Files are written off the Tk thread; the index is updated once
+        # from the created ids when the import finishes
+        store = self.task_store
+        state = {'done': 0, 'result': None, 'error': None}
+        
+        def run():
+            try:
+                state['result'] = write_tasks(store, path, progress=lambda n: state.update(done=n))
+            except Exception as e:
+                state['error'] = e
+        
+        def check():
+            if thread.is_alive():
+                self.search_status.config(text=f"Importing... {state['done']}")
+                self.after(200, check)
+                return
+            self.search_status.config(text="")
+            if state['error']:
+                messagebox.showerror("Error", f"Import failed: {state['error']}")
+                return
+            
+            result = state['result']
+            if store is self.task_store:
+                self.task_changes.put(set(result.created))
+            message = f"Imported {len(result.created)} task(s)"
+            if result.errors:
+                details = "\n".join(f"line {n}: {e}" for n, e in result.errors[:10])
+                messagebox.showwarning("Import", f"{message}, {len(result.errors)} failed:\n{details}")
+            else:
+                messagebox.showinfo("Import", message)
+        
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        check()
+    
     def open_task(self):
         if not self.current_project:
             messagebox.showwarning("Warning", "Please select a project first")
@@ -433,6 +496,9 @@ class TaskManagement(ttk.LabelFrame):
             return
         
         task_id = selected[0]
+        if self.task_index.is_archived(task_id):
+            messagebox.showwarning("Warning", "Task is archived, please restore it first")
+            return
         task_path = os.path.join(
             self.current_project['path'],
             '.cline',
@@ -451,6 +517,44 @@ class TaskManagement(ttk.LabelFrame):
                 os.startfile(task_path)
     
     def archive_task(self):
+        """Move the selected tasks into the archive pack"""
+        self.apply_to_selected(lambda task_ids: self.task_index.archive_tasks(task_ids))
+    
+    def restore_task(self):
+        """Move the selected archived tasks back into the active tasks"""
+        self.apply_to_selected(
+            lambda task_ids: self.task_index.set_status(task_ids, 'active'),
+            lambda task_id: self.task_index.is_archived(task_id)
+        )
+    
+    def set_status_dialog(self):
+        """Change the status of the selected tasks"""
+        status = simpledialog.askstring(
+            "Set Status",
+            "New status for the selected tasks:",
+            parent=self
+        )
+        if status and status.strip():
+            self.apply_to_selected(
+                lambda task_ids: self.task_index.set_status(task_ids, status.strip())
+            )
+    
+    def delete_tasks(self):
+        """Permanently delete the selected tasks"""
+        selected = self.tasks_tree.selection()
+        if selected and messagebox.askyesno(
+            "Delete Tasks",
+            f"Permanently delete {len(selected)} task(s)? This cannot be undone."
+        ):
+            self.apply_to_selected(lambda task_ids: self.task_index.delete_tasks(task_ids))
+    
+    def apply_to_selected(self, operation, applies=None):
+        """Run a batch task operation over the selection in one pass
+        
+        The operation takes a list of task ids and returns (done, errors).
+        All index changes are written in a single transaction and the view
+        is refreshed once at the end.
+        """
         if not self.current_project:
             messagebox.showwarning("Warning", "Please select a project first")
             return
@@ -460,42 +564,203 @@ class TaskManagement(ttk.LabelFrame):
             messagebox.showwarning("Warning", "Please select a task")
             return
         
-        task_id = selected[0]
-        task_path = os.path.join(
-            self.current_project['path'],
-            '.cline',
-            'tasks',
-            task_id,
-            'task.json'
-        )
-        
-        with open(task_path) as f:
-            task = json.load(f)
+        task_ids = [t for t in selected if applies is None or applies(t)]
+        if not task_ids:
+            return
         
-        task['status'] = 'archived'
+        try:
+            with self.task_index.transaction():
+                done, errors = operation(task_ids)
+        except Exception as e:
+            messagebox.showerror("Error", f"Task operation failed: {e}")
+            return
         
-        with open(task_path, 'w') as f:
-            json.dump(task, f, indent=2)
+        for task_id in done:
+            self.update_search_index(task_id)
         
-        self.refresh_tasks()
+        self.populate_tasks()
         self.on_task_select(None)  # Refresh preview
+        
+        if errors:
+            details = "\n".join(f"{t}: {e}" for t, e in list(errors.items())[:10])
+            messagebox.showerror("Error", f"{len(errors)} task(s) failed:\n{details}")
+    
+    def migrate_archived_tasks(self):
+        """Move tasks archived in place by older versions into the pack"""
+        legacy = [t['id'] for t in self.task_index.entries.values() if t['status'] == 'archived']
+        if not legacy:
+            return
+        with self.task_index.transaction():
+            _, errors = self.task_index.archive_tasks(legacy)
+        for task_id, error in errors.items():
+            logging.error(f"Error archiving task {task_id}: {error}")
     
     def refresh_tasks(self):
-        # Clear current items
-        for item in self.tasks_tree.get_children():
-            self.tasks_tree.delete(item)
+        """Sync the task index with disk and redraw the task list"""
+        if self.task_index:
+            self.task_index.refresh()
+            self.task_index.save()
+        self.populate_tasks()
+    
+    def watch_tasks(self):
+        """Start watching the current project's tasks directory"""
+        if self.task_watcher:
+            self.task_watcher.stop()
+            self.task_watcher = None
+        self.search_index = None
+        self.search_ready = False
+        
+        # Drop changes queued for the previous project
+        while not self.task_changes.empty():
+            self.task_changes.get_nowait()
         
         if not self.current_project:
             return
-            
-        # Load tasks
-        tasks_dir = os.path.join(self.current_project['path'], '.cline', 'tasks')
-        if not os.path.exists(tasks_dir):
+        
+        self.task_watcher = TaskWatcher(self.task_index.tasks_dir, self.task_changes.put)
+        self.task_watcher.start()
+    
+    def process_task_changes(self):
+        """Apply watcher deltas to the index and task list"""
+        try:
+            changed = set()
+            rescan = False
+            while True:
+                task_ids = self.task_changes.get_nowait()
+                if task_ids is None:
+                    rescan = True
+                else:
+                    changed |= task_ids
+        except queue.Empty:
+            pass
+        
+        try:
+            if rescan:
+                self.refresh_tasks()
+            elif changed and self.task_index:
+                added, modified, removed = self.task_index.refresh_tasks(changed)
+                if added or modified or removed:
+                    self.task_index.save()
+                    for task_id in added | modified | removed:
+                        self.update_search_index(task_id)
+                    records = [self.task_index.get(t) for t in added | modified]
+                    self.tasks_tree.apply_delta(records, removed)
+        finally:
+            self.after(200, self.process_task_changes)
+    
+    def populate_tasks(self):
+        """Redraw the task list from the task index"""
+        if not self.current_project or not self.task_index:
+            self.tasks_tree.set_records([])
             return
-            
-        for task_id in os.listdir(tasks_dir):
-            task_path = os.path.join(tasks_dir, task_id, 'task.json')
-            if os.path.exists(task_path):
-                with open(task_path) as f:
-                    task = json.load(f)
-                    self.tasks_tree.insert('', 'end', task['id'], text=task['title'], values=(task['status'],))
+        
+        self.status_filter['values'] = ('All',) + tuple(self.task_index.statuses())
+        self.tasks_tree.set_source(self.task_index)
+    
+    def apply_filters(self):
+        """Apply search, status and created-date filters to the task list"""
+        status = self.status_filter.get()
+        self.tasks_tree.set_filters(
+            status=None if status == 'All' else status,
+            created_from=self.created_from_entry.get().strip(),
+            created_to=self.created_to_entry.get().strip(),
+            task_ids=self.search_tasks(self.search_entry.get().strip())
+        )
+    
+    def reset_filters(self):
+        """Clear the search box and filters without redrawing the list"""
+        self.search_entry.delete(0, tk.END)
+        self.search_status.config(text="")
+        self.status_filter.set('All')
+        self.created_from_entry.delete(0, tk.END)
+        self.created_to_entry.delete(0, tk.END)
+        # The previous project's search results would hide every task
+        self.tasks_tree.filters = {}
+    
+    def clear_search(self):
+        """Clear the search box and show all tasks again"""
+        self.search_entry.delete(0, tk.END)
+        self.apply_filters()
+    
+    def search_tasks(self, query):
+        """Task ids matching a search query, or None when not searching"""
+        if not query:
+            self.search_status.config(text="")
+            return None
+        if not self.search_ready:
+            if self.search_error:
+                self.search_status.config(text=f"Search unavailable: {self.search_error}")
+            else:
+                self.search_status.config(text="Indexing...")
+            return None
+        
+        if self.search_pending:
+            self.update_search_index(self.search_pending.pop())
+        
+        start = time.perf_counter()
+        results = self.search_index.search(query)
+        elapsed = (time.perf_counter() - start) * 1000
+        status = f"{len(results)} matches ({elapsed:.0f} ms)"
+        if self.search_error:
+            status += f"; index incomplete: {self.search_error}"
+        self.search_status.config(text=status)
+        return results
+    
+    def load_search_index(self):
+        """Load the search index and sync it with tasks in the background"""
+        self.search_index = None
+        self.search_ready = False
+        self.search_pending = set()
+        self.search_error = None
+        project_path = self.current_project['path']
+        task_ids = list(self.task_index.entries)
+        archive = self.task_index.archive
+        # The Tk thread keeps changing the archive while this builds
+        archived_ids = list(archive.entries)
+        
+        def build():
+            index = None
+            error = None
+            try:
+                index = TaskSearchIndex(project_path)
+                index.sync(task_ids, archive, archived_ids)
+                index.save()
+            except Exception as e:
+                logging.error(f"Error building search index: {e}")
+                error = str(e)
+            if self.current_project and self.current_project['path'] == project_path:
+                # A partly synced index still answers searches; the error is shown with them
+                self.search_error = error
+                self.search_index = index
+                self.search_ready = index is not None
+        
+        threading.Thread(target=build, daemon=True).start()
+    
+    def update_search_index(self, task_id):
+        """Reindex a task after its files were written"""
+        if not self.search_ready:
+            # Picked up once the background build finishes
+            self.search_pending.add(task_id)
+            return
+        
+        pending, self.search_pending = self.search_pending, set()
+        for pending_id in pending | {task_id}:
+            if self.task_index.get(pending_id) is None:
+                self.search_index.remove_task(pending_id)
+            elif self.task_index.is_archived(pending_id):
+                # Archived tasks stay searchable from the pack
+                if pending_id not in self.search_index.doc_nums:
+                    self.search_index.index_archived(pending_id, self.task_index.archive)
+            else:
+                self.search_index.update_task(pending_id)
+        
+        if not self.search_save_pending:
+            # Coalesce saves; the index can be large
+            self.search_save_pending = True
+            self.after(2000, self.save_search_index)
+    
+    def save_search_index(self):
+        """Persist the search index off the Tk thread"""
+        self.search_save_pending = False
+        if self.search_index:
+            threading.Thread(target=self.search_index.save, daemon=True).start()
@@ -0,0 +1,359 @@
+import os
+import re
+import json
+import logging
+import threading
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Set
+from .file_writer import get_writer
+
+INDEX_VERSION = 1
+INDEX_FILENAME = 'search_index.json'
+
+TOKEN_RE = re.compile(r'\w+')
+QUERY_RE = re.compile(r'"([^"]*)"|(\S+)')
+SECTION_RE = re.compile(r'^## (.+)$', re.MULTILINE)
+
+# Sections of task.md that are indexed besides the title
+INDEXED_SECTIONS = ('System Prompt', 'Steps', 'Results')
+
+# Position gap between fields so phrases never match across them
+FIELD_GAP = 1000
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(text.lower())
+
+def extract_fields(content: str) -> List[str]:
+    """Pull title, system prompt, steps and results out of a task.md"""
+    fields = []
+    first_line = content.split('\n', 1)[0]
+    if first_line.startswith('# Task:'):
+        fields.append(first_line[len('# Task:'):])
+
+    headings = list(SECTION_RE.finditer(content))
+    for i, match in enumerate(headings):
+        if match.group(1).strip() not in INDEXED_SECTIONS:
+            continue
+        end = headings[i + 1].start() if i + 1 < len(headings) else len(content)
+        fields.append(content[match.end():end])
+    return fields
+
+def _consecutive(positions: List[List[int]]) -> bool:
+    """Whether some p has p in positions[0], p + 1 in positions[1], ...
+
+    Each list is sorted, so this is a merge: every list advances (by
+    bisection) to the current target shifted by its place in the phrase,
+    and a larger value becomes the new target until all lists agree.
+    """
+    count = len(positions)
+    cursors = [0] * count
+    target = positions[0][0]
+    k = 0
+    agreed = 0
+    while agreed < count:
+        values = positions[k]
+        i = bisect_left(values, target + k, cursors[k])
+        if i == len(values):
+            return False
+        cursors[k] = i
+        found = values[i] - k
+        if found > target:
+            target = found
+            agreed = 1
+        else:
+            agreed += 1
+        k = k + 1 if k + 1 < count else 0
+    return True
+
+class TaskSearchIndex:
+    """Positional inverted index over task.md content
+
+    Supports plain terms, prefix terms (deploy*) and quoted phrases
+    ("rotate keys"); all query parts must match. The index is persisted
+    under .cline/ and kept current per task via update_task/remove_task.
+
+    Each indexed version of a task gets a document number. Postings are
+    flat, append-only lists of [doc, count, positions...] per term, and a
+    reindexed or removed task just retires its old document number, so
+    updates never have to touch other postings. Retired documents are
+    dropped from the postings when the index is compacted on save.
+    """
+
+    COMPACT_RATIO = 0.25
+
+    def __init__(self, project_path: str):
+        self.cline_dir = os.path.join(project_path, '.cline')
+        self.tasks_dir = os.path.join(self.cline_dir, 'tasks')
+        self.index_path = os.path.join(self.cline_dir, INDEX_FILENAME)
+
+        self.postings: Dict[str, List[int]] = {}
+        self.doc_ids: List[Optional[str]] = []
+        self.doc_nums: Dict[str, int] = {}
+        self.mtimes: Dict[str, int] = {}
+        self.dirty = False
+        # term -> {doc: offset of its entry in the flat postings list}
+        self._starts: Dict[str, Dict[int, int]] = {}
+        self._vocab: Optional[List[str]] = None
+        self._lock = threading.RLock()
+        self.load()
+
+    def load(self):
+        """Load index from disk, starting empty if missing or unreadable"""
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path) as f:
+                data = json.load(f)
+            if data.get('version') != INDEX_VERSION:
+                return
+            self.doc_ids = data['doc_ids']
+            self.mtimes = data['mtimes']
+            self.postings = data['postings']
+        except Exception as e:
+            logging.error(f"Error loading search index: {e}")
+            self.doc_ids, self.mtimes, self.postings = [], {}, {}
+            return
+        self.doc_nums = {task_id: n for n, task_id in enumerate(self.doc_ids) if task_id is not None}
+
+    def save(self):
+        """Write index to disk if it changed
+
+        Only a snapshot is taken under the lock: postings are append-only
+        lists (compaction replaces them), so their current lengths pin
+        down what to write, and serializing happens outside the lock.
+        """
+        with self._lock:
+            if not self.dirty:
+                return
+            dead = len(self.doc_ids) - len(self.doc_nums)
+            if dead > len(self.doc_ids) * self.COMPACT_RATIO:
+                self.compact()
+            doc_ids = list(self.doc_ids)
+            mtimes = dict(self.mtimes)
+            postings = [(term, flat, len(flat)) for term, flat in self.postings.items()]
+            self.dirty = False
+        data = json.dumps({
+            'version': INDEX_VERSION,
+            'doc_ids': doc_ids,
+            'mtimes': mtimes,
+            'postings': {term: flat[:length] for term, flat, length in postings}
+        }, separators=(',', ':'))
+        os.makedirs(self.cline_dir, exist_ok=True)
+        get_writer().write_text(self.index_path, data)
+
+    def compact(self):
+        """Drop retired documents and renumber the live ones"""
+        with self._lock:
+            remap = {}
+            doc_ids = []
+            for n, task_id in enumerate(self.doc_ids):
+                if task_id is not None:
+                    remap[n] = len(doc_ids)
+                    doc_ids.append(task_id)
+
+            postings = {}
+            for term, flat in self.postings.items():
+                out = []
+                i = 0
+                while i < len(flat):
+                    doc, count = flat[i], flat[i + 1]
+                    if doc in remap:
+                        out.append(remap[doc])
+                        out.extend(flat[i + 1:i + 2 + count])
+                    i += 2 + count
+                if out:
+                    postings[term] = out
+
+            self.doc_ids = doc_ids
+            self.doc_nums = {task_id: n for n, task_id in enumerate(doc_ids)}
+            self.postings = postings
+            self._starts = {}
+            self._vocab = None
+
+    def _task_md(self, task_id: str) -> str:
+        return os.path.join(self.tasks_dir, task_id, 'task.md')
+
+    def sync(self, task_ids: Iterable[str], archive=None, archived_ids: Optional[Iterable[str]] = None):
+        """Index new or changed tasks and drop tasks not in task_ids
+
+        Tasks in archive (a TaskArchive) stay searchable; they are indexed
+        from the pack once, since archived content does not change.
+        archived_ids lists them when archive may change meanwhile (e.g.
+        syncing off the Tk thread); by default its entries are read.
+        """
+        task_ids = set(task_ids)
+        for task_id in task_ids:
+            self.update_task(task_id)
+
+        archived = set()
+        if archive:
+            if archived_ids is None:
+                with archive.lock:
+                    archived_ids = list(archive.entries)
+            for task_id in archived_ids:
+                if task_id in task_ids:
+                    continue
+                archived.add(task_id)
+                if task_id not in self.doc_nums:
+                    self.index_archived(task_id, archive)
+
+        with self._lock:
+            for task_id in set(self.doc_nums) - task_ids - archived:
+                self.remove_task(task_id)
+
+    def index_archived(self, task_id: str, archive):
+        """Index a task's task.md from the archive pack"""
+        try:
+            content = archive.read_file(task_id, 'task.md')
+        except Exception as e:
+            logging.error(f"Error reading archived task {task_id}: {e}")
+            return
+        self.index_document(task_id, content)
+
+    def update_task(self, task_id: str):
+        """(Re)index a task if its task.md changed"""
+        path = self._task_md(task_id)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            if task_id in self.doc_nums and self.mtimes.get(task_id) == mtime:
+                return
+            with open(path) as f:
+                content = f.read()
+        except OSError:
+            self.remove_task(task_id)
+            return
+        self.index_document(task_id, content, mtime)
+
+    def index_document(self, task_id: str, content: str, mtime: int = 0):
+        """Replace the indexed content of a task"""
+        positions: Dict[str, List[int]] = {}
+        base = 0
+        for field in extract_fields(content):
+            tokens = tokenize(field)
+            for i, token in enumerate(tokens):
+                positions.setdefault(token, []).append(base + i)
+            base += len(tokens) + FIELD_GAP
+
+        with self._lock:
+            self.remove_task(task_id)
+            doc = len(self.doc_ids)
+            self.doc_ids.append(task_id)
+            self.doc_nums[task_id] = doc
+            self.mtimes[task_id] = mtime
+
+            for term, term_positions in positions.items():
+                flat = self.postings.get(term)
+                if flat is None:
+                    flat = self.postings[term] = []
+                    self._vocab = None
+                flat.append(doc)
+                flat.append(len(term_positions))
+                flat.extend(term_positions)
+                self._starts.pop(term, None)
+            self.dirty = True
+
+    def remove_task(self, task_id: str):
+        """Drop a task from the index"""
+        with self._lock:
+            doc = self.doc_nums.pop(task_id, None)
+            if doc is None:
+                return
+            self.doc_ids[doc] = None
+            self.mtimes.pop(task_id, None)
+            self.dirty = True
+
+    def _doc_starts(self, term: str) -> Dict[int, int]:
+        """Offset of each document's entry in a term's flat postings
+
+        Built with one walk over the entry headers and cached until the
+        term is next indexed, so positions are only sliced out for the
+        documents a phrase actually needs.
+        """
+        starts = self._starts.get(term)
+        if starts is not None:
+            return starts
+
+        starts = {}
+        flat = self.postings.get(term, ())
+        i = 0
+        while i < len(flat):
+            starts[flat[i]] = i
+            i += 2 + flat[i + 1]
+        self._starts[term] = starts
+        return starts
+
+    def _term_docs(self, term: str) -> Set[int]:
+        """Documents containing a term, without decoding positions"""
+        return set(self._doc_starts(term))
+
+    def _prefix_terms(self, prefix: str) -> List[str]:
+        if self._vocab is None:
+            self._vocab = sorted(self.postings)
+        start = bisect_left(self._vocab, prefix)
+        terms = []
+        for term in self._vocab[start:]:
+            if not term.startswith(prefix):
+                break
+            terms.append(term)
+        return terms
+
+    def _match_term(self, term: str) -> Set[int]:
+        if term.endswith('*'):
+            docs = set()
+            for match in self._prefix_terms(term[:-1]):
+                docs |= self._term_docs(match)
+            return docs
+        return self._term_docs(term)
+
+    def _match_phrase(self, tokens: List[str]) -> Set[int]:
+        if len(tokens) == 1:
+            return self._match_term(tokens[0])
+
+        starts = [self._doc_starts(t) for t in tokens]
+        if not all(starts):
+            return set()
+        # Narrow down documents from the rarest term before touching positions
+        by_size = sorted(starts, key=len)
+        candidates = set(by_size[0])
+        for other in by_size[1:]:
+            candidates.intersection_update(other)
+            if not candidates:
+                return set()
+
+        flats = [self.postings[t] for t in tokens]
+        matches = set()
+        for doc in candidates:
+            positions = []
+            for flat, term_starts in zip(flats, starts):
+                i = term_starts[doc]
+                positions.append(flat[i + 2:i + 2 + flat[i + 1]])
+            if _consecutive(positions):
+                matches.add(doc)
+        return matches
+
+    def search(self, query: str) -> Set[str]:
+        """Task ids matching every term, prefix and phrase in query"""
+        parts = []
+        for phrase, word in QUERY_RE.findall(query.lower()):
+            if phrase:
+                tokens = tokenize(phrase)
+                if tokens:
+                    parts.append(('phrase', tokens))
+            else:
+                tokens = tokenize(word)
+                if tokens and word.endswith('*'):
+                    tokens[-1] += '*'
+                parts.extend(('term', token) for token in tokens)
+
+        if not parts:
+            return set()
+
+        with self._lock:
+            result = None
+            for kind, value in parts:
+                docs = self._match_phrase(value) if kind == 'phrase' else self._match_term(value)
+                result = docs if result is None else result & docs
+                if not result:
+                    return set()
+            # Retired documents can still appear in postings until compaction
+            return {self.doc_ids[doc] for doc in result} - {None}
@@ -0,0 +1,183 @@
+import os
+import re
+import json
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from .task_index import TaskIndex
+from .file_writer import get_writer
+
+SLUG_RE = re.compile(r'[^\w-]+')
+
+def slugify(title: str) -> str:
+    """Task id suffix for a title (lowercase, path-safe)"""
+    return SLUG_RE.sub('_', title.strip().lower())[:60].strip('_') or 'task'
+
+def render_task_md(title: str, date: str, service: str, keys: str, system_prompt: str) -> str:
+    """Render task.md content"""
+    lines = [
+        f"# Task: {title}",
+        f"Date: {date}",
+        "",
+        "## Required Credentials"
+    ]
+    if service and keys:
+        lines += [f"- Service: {service}", f"- Keys: {keys}", ""]
+    else:
+        lines += ["- No credentials required", ""]
+
+    lines += [
+        "## System Prompt",
+        system_prompt,
+        "",
+        "## Steps\n1. [Step details]",
+        "",
+        "## Results\n- [ ] Task completed",
+        ""
+    ]
+    return "\n".join(lines)
+
+class TaskStore:
+    """Task storage shared by TaskManagement and the cline-tasks CLI
+
+    Owns the TaskIndex (and through it the archive) for a project and
+    knows how tasks are laid out on disk. Imports nothing from Tk, so it
+    can be used headless.
+    """
+
+    def __init__(self, project_path: str):
+        self.project_path = project_path
+        self.index = TaskIndex(project_path)
+        self.tasks_dir = self.index.tasks_dir
+        self._search_index = None
+        self._claim_lock = threading.Lock()
+        self._next_suffix: Dict[str, int] = {}
+
+    def task_dir(self, task_id: str) -> str:
+        return os.path.join(self.tasks_dir, task_id)
+
+    def claim_task_id(self, title: str, created: Optional[datetime] = None) -> str:
+        """Create a new, empty task directory and return its id
+
+        Ids are task_<timestamp>_<title>; when that directory already exists
+        (two tasks in the same second) a _2, _3, ... suffix is added. The
+        directory is created with mkdir, so the claim also holds against
+        other processes.
+        """
+        created = created or datetime.now()
+        base = f"task_{created.strftime('%Y-%m-%d_%H-%M-%S')}_{slugify(title)}"
+        os.makedirs(self.tasks_dir, exist_ok=True)
+        with self._claim_lock:
+            n = self._next_suffix.get(base, 1)
+            while True:
+                task_id = base if n == 1 else f"{base}_{n}"
+                try:
+                    os.mkdir(self.task_dir(task_id))
+                except FileExistsError:
+                    n += 1
+                    continue
+                self._next_suffix[base] = n + 1
+                return task_id
+
+    def new_task(self, title: str, prompt: str = '', service: str = '',
+                 keys: Iterable[str] = (), status: str = 'active',
+                 created: Optional[datetime] = None) -> Dict[str, Any]:
+        """Claim an id and build the task.json dict for a new task"""
+        created = created or datetime.now()
+        return {
+            'id': self.claim_task_id(title, created),
+            'title': title,
+            'systemPrompt': prompt,
+            'service': service,
+            'keys': list(keys),
+            'status': status,
+            'created': created.isoformat()
+        }
+
+    @staticmethod
+    def task_files(task: Dict[str, Any], system_prompt: Optional[str] = None) -> Dict[str, str]:
+        """task.json and task.md content for a task"""
+        try:
+            date = datetime.fromisoformat(task['created']).strftime("%Y-%m-%d_%H-%M-%S")
+        except (TypeError, ValueError):
+            date = task.get('created', '')
+        return {
+            'task.json': json.dumps(task, indent=2),
+            'task.md': render_task_md(
+                task['title'],
+                date,
+                task.get('service', ''),
+                ','.join(task.get('keys', [])),
+                task.get('systemPrompt', '') if system_prompt is None else system_prompt
+            )
+        }
+
+    def create_task(self, title: str, prompt: str = '', service: str = '',
+                    keys: Iterable[str] = (), system_prompt: Optional[str] = None) -> Dict[str, Any]:
+        """Write task.json and task.md for a new task and index it
+
+        system_prompt is the rendered System Prompt section of task.md and
+        defaults to prompt.
+        """
+        task = self.new_task(title, prompt, service, keys)
+        task_dir = self.task_dir(task['id'])
+
+        writer = get_writer()
+        for name, content in self.task_files(task, system_prompt).items():
+            writer.write_text(os.path.join(task_dir, name), content)
+        writer.flush()
+
+        self.index.update_task(task['id'], task)
+        self.index.save()
+        return task
+
+    def load_task(self, task_id: str) -> Dict[str, Any]:
+        """Read a task's task.json"""
+        with open(os.path.join(self.task_dir(task_id), 'task.json')) as f:
+            return json.load(f)
+
+    def save_task(self, task: Dict[str, Any], system_prompt: Optional[str] = None):
+        """Rewrite task.json and task.md for an edited task"""
+        task_dir = self.task_dir(task['id'])
+        writer = get_writer()
+        for name, content in self.task_files(task, system_prompt).items():
+            writer.write_text(os.path.join(task_dir, name), content)
+        writer.flush()
+
+        self.index.update_task(task['id'], task)
+        self.index.save()
+
+    def list_tasks(self, sort_by: str = 'created', reverse: bool = False, **filters) -> List[Dict[str, Any]]:
+        """Active and archived tasks, filtered and sorted by the index"""
+        self.index.refresh()
+        self.index.save()
+        return self.index.query(sort_by, reverse, **filters)
+
+    def archive_tasks(self, task_ids: Iterable[str]) -> Tuple[List[str], Dict[str, str]]:
+        """Move tasks into the archive pack in one transaction"""
+        with self.index.transaction():
+            return self.index.archive_tasks(task_ids)
+
+    def search_index(self):
+        """Search index synced with the current tasks"""
+        if self._search_index is None:
+            from .task_search import TaskSearchIndex
+            self._search_index = TaskSearchIndex(self.project_path)
+            self._search_index.sync(self.index.entries, self.index.archive)
+            self._search_index.save()
+        return self._search_index
+
+    def search(self, query: str) -> Set[str]:
+        """Task ids whose task.md matches query"""
+        return self.search_index().search(query)
+
+    def index_tasks(self, task_ids: Iterable[str]) -> Set[str]:
+        """Pick up tasks written outside the store with a single index save"""
+        task_ids = list(task_ids)
+        with self.index.transaction():
+            added, modified, _ = self.index.refresh_tasks(task_ids)
+        if self._search_index is not None:
+            for task_id in task_ids:
+                self._search_index.update_task(task_id)
+            self._search_index.save()
+        return added | modified
@@ -0,0 +1,245 @@
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import logging
+import threading
+from typing import Callable, Dict, Optional, Set
+
+# inotify(7) constants
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+TASKS_DIR_MASK = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF | IN_ONLYDIR
+TASK_MASK = IN_CLOSE_WRITE | IN_MODIFY | IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_ONLYDIR
+
+EVENT_HEADER = struct.Struct('iIII')
+
+class Inotify:
+    """Minimal ctypes binding for Linux inotify"""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._rm_watch = libc.inotify_rm_watch
+        self._rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+    def add_watch(self, path: str, mask: int) -> int:
+        wd = self._add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        return wd
+
+    def rm_watch(self, wd: int):
+        self._rm_watch(self.fd, wd)
+
+    def read_events(self):
+        """Yield (wd, mask, name) for all queued events"""
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except OSError as e:
+            if e.errno == errno.EAGAIN:
+                return
+            raise
+
+        offset = 0
+        while offset < len(data):
+            wd, mask, _cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            yield wd, mask, os.fsdecode(name)
+
+    def close(self):
+        os.close(self.fd)
+
+class TaskWatcher:
+    """Watch .cline/tasks and report changed task ids in debounced batches
+
+    Uses inotify on Linux and falls back to polling task.json mtimes
+    elsewhere or when watches cannot be added. The callback runs on the
+    watcher thread with the set of task ids that were added, modified or
+    deleted, or None when events were lost and a full rescan is needed.
+    """
+
+    def __init__(self, tasks_dir: str, callback: Callable[[Optional[Set[str]]], None],
+                 debounce: float = 0.25, max_delay: float = 1.0, poll_interval: float = 2.0):
+        self.tasks_dir = tasks_dir
+        self.callback = callback
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self.backend = None
+
+        self._stop = threading.Event()
+        self._thread = None
+        self._pending: Set[str] = set()
+        self._overflow = False
+        self._first_event = 0.0
+        self._last_event = 0.0
+
+    def start(self):
+        """Start watching in a background thread"""
+        inotify = None
+        if sys.platform.startswith('linux'):
+            try:
+                inotify = Inotify()
+            except (OSError, AttributeError) as e:
+                logging.warning(f"inotify unavailable, polling tasks instead: {e}")
+
+        if inotify:
+            self.backend = 'inotify'
+            target = lambda: self._run_inotify(inotify)
+        else:
+            self.backend = 'poll'
+            target = self._run_poll
+
+        self._thread = threading.Thread(target=target, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop watching and wait for the thread to exit"""
+        self._stop.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2)
+
+    def _mark(self, task_id: Optional[str]):
+        """Record a change; None marks an overflow needing a full rescan"""
+        now = time.monotonic()
+        if not self._pending and not self._overflow:
+            self._first_event = now
+        self._last_event = now
+        if task_id is None:
+            self._overflow = True
+        elif task_id:
+            self._pending.add(task_id)
+
+    def _due(self) -> bool:
+        if not self._pending and not self._overflow:
+            return False
+        now = time.monotonic()
+        return (now - self._last_event >= self.debounce or
+                now - self._first_event >= self.max_delay)
+
+    def _flush(self):
+        changes = None if self._overflow else self._pending
+        self._pending = set()
+        self._overflow = False
+        try:
+            self.callback(changes)
+        except Exception as e:
+            logging.error(f"Error handling task changes: {e}")
+
+    def _run_inotify(self, inotify: Inotify):
+        watches: Dict[int, Optional[str]] = {}
+        task_watches: Dict[str, int] = {}
+
+        def watch_task(task_id):
+            try:
+                wd = inotify.add_watch(os.path.join(self.tasks_dir, task_id), TASK_MASK)
+                watches[wd] = task_id
+                task_watches[task_id] = wd
+            except OSError as e:
+                if e.errno == errno.ENOSPC:
+                    logging.warning("inotify watch limit reached, some tasks will not live-update")
+                elif e.errno != errno.ENOENT:
+                    logging.error(f"Error watching task {task_id}: {e}")
+
+        try:
+            try:
+                watches[inotify.add_watch(self.tasks_dir, TASKS_DIR_MASK)] = None
+            except OSError as e:
+                logging.warning(f"Cannot watch {self.tasks_dir}, polling instead: {e}")
+                self.backend = 'poll'
+                self._run_poll()
+                return
+
+            with os.scandir(self.tasks_dir) as it:
+                for entry in it:
+                    if entry.is_dir():
+                        watch_task(entry.name)
+
+            while not self._stop.is_set():
+                timeout = self.debounce if (self._pending or self._overflow) else 0.5
+                ready, _, _ = select.select([inotify.fd], [], [], timeout)
+                if ready:
+                    for wd, mask, name in inotify.read_events():
+                        if mask & IN_Q_OVERFLOW:
+                            self._mark(None)
+                            continue
+                        if mask & IN_IGNORED:
+                            task_id = watches.pop(wd, None)
+                            if task_id and task_watches.get(task_id) == wd:
+                                del task_watches[task_id]
+                            continue
+                        if wd not in watches:
+                            continue
+
+                        task_id = watches[wd]
+                        if task_id is not None:
+                            self._mark(task_id)
+                        elif mask & IN_DELETE_SELF:
+                            self._mark(None)
+                        elif mask & IN_ISDIR and name:
+                            if mask & (IN_CREATE | IN_MOVED_TO):
+                                watch_task(name)
+                            elif mask & IN_MOVED_FROM and name in task_watches:
+                                # A renamed directory keeps its watch; drop it
+                                old_wd = task_watches.pop(name)
+                                watches.pop(old_wd, None)
+                                inotify.rm_watch(old_wd)
+                            self._mark(name)
+
+                if self._due():
+                    self._flush()
+        finally:
+            inotify.close()
+
+    def _snapshot(self) -> Dict[str, int]:
+        """Map task id to task.json mtime"""
+        mtimes = {}
+        try:
+            with os.scandir(self.tasks_dir) as it:
+                for entry in it:
+                    if not entry.is_dir():
+                        continue
+                    try:
+                        mtimes[entry.name] = os.stat(os.path.join(entry.path, 'task.json')).st_mtime_ns
+                    except OSError:
+                        pass
+        except OSError:
+            pass
+        return mtimes
+
+    def _run_poll(self):
+        previous = self._snapshot()
+        while not self._stop.wait(self.poll_interval):
+            current = self._snapshot()
+            changed = {task_id for task_id in current.keys() | previous.keys()
+                       if current.get(task_id) != previous.get(task_id)}
+            previous = current
+            if changed:
+                self._pending |= changed
+                self._flush()
@@ -0,0 +1,270 @@
+from tkinter import ttk
+from bisect import bisect_left
+
+class VirtualTaskList(ttk.Frame):
+    """Task list that only creates Treeview rows for the visible window
+
+    Rows come from a source object that does the sorting and filtering
+    (query, sort_key and matches, see TaskIndex), so the widget only ever
+    holds the ordered result list and materializes the rows on screen plus
+    a small overscan. Emits <<TaskSelect>> when the selected set of task
+    ids changes.
+    """
+
+    OVERSCAN = 20
+    MARGIN = 5
+    DEFAULT_ROW_HEIGHT = 20
+
+    COLUMNS = ('Status', 'Created')
+    SORT_KEYS = {'#0': 'title', 'Status': 'status', 'Created': 'created'}
+
+    def __init__(self, parent, source=None):
+        super().__init__(parent)
+
+        # State
+        self.source = source
+        self.records = []
+        self.positions = {}
+        self.selected = set()
+        self.focus_id = None
+        self.offset = 0
+        self.visible = 1
+        self.start = 0
+        self.end = 0
+        self.sort_by = 'created'
+        self.sort_reverse = True
+        self.filters = {}
+        self._rendering = False
+
+        self.tree = ttk.Treeview(
+            self,
+            columns=self.COLUMNS,
+            show='tree headings',
+            selectmode='extended',
+            yscrollcommand=self._on_tree_scroll
+        )
+        self.tree.heading('#0', text='Task', command=lambda: self.sort('#0'))
+        for column in self.COLUMNS:
+            self.tree.heading(column, text=column, command=lambda c=column: self.sort(c))
+        self.tree.column('Status', width=80, stretch=False)
+        self.tree.column('Created', width=130, stretch=False)
+
+        self.scrollbar = ttk.Scrollbar(self, orient='vertical', command=self._on_scrollbar)
+        self.scrollbar.pack(side='right', fill='y')
+        self.tree.pack(side='left', expand=True, fill='both')
+
+        self.tree.bind('<<TreeviewSelect>>', self._on_tree_select)
+        self.tree.bind('<Control-a>', lambda e: self.select_all())
+        self.tree.bind('<Command-a>', lambda e: self.select_all())
+        self.tree.bind('<Configure>', lambda e: self._render())
+
+    def set_source(self, source):
+        """Set the object providing query(), sort_key() and matches()"""
+        self.source = source
+        self.reload()
+
+    def set_filters(self, **filters):
+        """Replace active filters and reload"""
+        self.filters = {k: v for k, v in filters.items() if v is not None and v != ''}
+        self.reload()
+
+    def sort(self, column):
+        """Sort by column, toggling direction when already sorted by it"""
+        key = self.SORT_KEYS[column]
+        if key == self.sort_by:
+            self.sort_reverse = not self.sort_reverse
+        else:
+            self.sort_by = key
+            self.sort_reverse = False
+        self.reload()
+
+    def reload(self):
+        """Re-query the source and redraw the visible window"""
+        if self.source:
+            records = self.source.query(self.sort_by, self.sort_reverse, **self.filters)
+        else:
+            records = []
+        self.set_records(records)
+
+    def set_records(self, records):
+        """Show an already ordered list of task records"""
+        self.records = list(records)
+        self.positions = {r['id']: i for i, r in enumerate(self.records)}
+
+        selected = self.selected & self.positions.keys()
+        changed = selected != self.selected
+        self.selected = selected
+        if self.focus_id not in self.positions:
+            self.focus_id = None
+
+        self._render()
+        if changed:
+            self.event_generate('<<TaskSelect>>')
+
+    def apply_delta(self, records, removed=()):
+        """Insert, move or drop individual records without re-querying
+
+        records are added or modified task records; removed are task ids.
+        Each change is placed at its sorted position, and the view stays
+        anchored on the rows the user is looking at.
+        """
+        if not self.source:
+            return
+        key = self.source.sort_key(self.sort_by)
+        changed = set(removed) | {r['id'] for r in records}
+
+        for pos in sorted((self.positions[i] for i in changed if i in self.positions), reverse=True):
+            del self.records[pos]
+            if pos < self.offset:
+                self.offset -= 1
+
+        keys = [key(r) for r in self.records]
+        for record in records:
+            if not self.source.matches(record, **self.filters):
+                continue
+            record_key = key(record)
+            if self.sort_reverse:
+                pos = self._reverse_position(keys, record_key)
+            else:
+                pos = bisect_left(keys, record_key)
+            keys.insert(pos, record_key)
+            self.records.insert(pos, record)
+            if pos < self.offset:
+                self.offset += 1
+
+        self.positions = {r['id']: i for i, r in enumerate(self.records)}
+        selected = self.selected & self.positions.keys()
+        if self.focus_id not in self.positions:
+            self.focus_id = None
+
+        self._render()
+        if selected != self.selected:
+            self.selected = selected
+            self.event_generate('<<TaskSelect>>')
+
+    def _reverse_position(self, keys, record_key):
+        """Insertion point in a descending list of keys"""
+        lo, hi = 0, len(keys)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if keys[mid] > record_key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def selection(self):
+        """Selected task ids in display order"""
+        return tuple(sorted(self.selected, key=self.positions.get))
+
+    def selection_set(self, task_ids):
+        """Select task ids and scroll the first one into view"""
+        self.selected = {i for i in task_ids if i in self.positions}
+        if self.selected:
+            self.see(self.selection()[0])
+        else:
+            self._render()
+        self.event_generate('<<TaskSelect>>')
+
+    def select_all(self):
+        """Select every task in the current (filtered) view"""
+        self.selected = set(self.positions)
+        self._render()
+        self.event_generate('<<TaskSelect>>')
+        return 'break'
+
+    def see(self, task_id):
+        """Scroll so task_id is visible"""
+        pos = self.positions.get(task_id)
+        if pos is None:
+            return
+        if not self.offset <= pos < self.offset + self.visible:
+            self.offset = max(0, pos - self.visible // 2)
+        self.focus_id = task_id
+        self._render()
+
+    def _row_height(self):
+        height = ttk.Style().lookup('Treeview', 'rowheight')
+        try:
+            return int(height) or self.DEFAULT_ROW_HEIGHT
+        except (TypeError, ValueError):
+            return self.DEFAULT_ROW_HEIGHT
+
+    def _format(self, record):
+        created = (record.get('created') or '')[:16].replace('T', ' ')
+        return record.get('title', record['id']), (record.get('status', ''), created)
+
+    def _render(self):
+        """Materialize rows for the visible window plus overscan"""
+        total = len(self.records)
+        height = self.tree.winfo_height()
+        if height > 1:
+            self.visible = max(1, height // self._row_height() - 1)
+        self.offset = max(0, min(self.offset, total - self.visible))
+
+        start = max(0, self.offset - self.OVERSCAN)
+        end = min(total, self.offset + self.visible + self.OVERSCAN)
+
+        self._rendering = True
+        try:
+            self.tree.delete(*self.tree.get_children())
+            for record in self.records[start:end]:
+                text, values = self._format(record)
+                self.tree.insert('', 'end', record['id'], text=text, values=values)
+            self.start, self.end = start, end
+
+            window = [r['id'] for r in self.records[start:end] if r['id'] in self.selected]
+            self.tree.selection_set(window)
+            if self.focus_id and start <= self.positions[self.focus_id] < end:
+                self.tree.focus(self.focus_id)
+            if end > start:
+                self.tree.yview_moveto((self.offset - start) / (end - start))
+        finally:
+            self._rendering = False
+
+        self._update_scrollbar(self.offset, self.offset + self.visible)
+
+    def _update_scrollbar(self, top, bottom):
+        total = len(self.records)
+        if not total:
+            self.scrollbar.set(0, 1)
+            return
+        self.scrollbar.set(top / total, min(1.0, bottom / total))
+
+    def _on_tree_scroll(self, first, last):
+        """Track native scrolling and re-window near the materialized edges"""
+        rendered = self.end - self.start
+        if self._rendering or not rendered:
+            return
+
+        top = self.start + float(first) * rendered
+        bottom = self.start + float(last) * rendered
+        self.offset = int(round(top))
+        self.visible = max(1, int(round(bottom - top)))
+
+        near_top = self.start > 0 and top - self.start < self.MARGIN
+        near_bottom = self.end < len(self.records) and self.end - bottom < self.MARGIN
+        if near_top or near_bottom:
+            self.after_idle(self._render)
+        else:
+            self._update_scrollbar(top, bottom)
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        """Map scrollbar commands onto the full record list"""
+        if action == 'moveto':
+            self.offset = int(float(amount) * len(self.records))
+        elif unit == 'pages':
+            self.offset += int(amount) * self.visible
+        else:
+            self.offset += int(amount)
+        self._render()
+
+    def _on_tree_select(self, event):
+        if self._rendering:
+            return
+        window = {r['id'] for r in self.records[self.start:self.end]}
+        selected = (self.selected - window) | set(self.tree.selection())
+        self.focus_id = self.tree.focus() or self.focus_id
+        if selected != self.selected:
+            self.selected = selected
+            self.event_generate('<<TaskSelect>>')
@@ -0,0 +1,64 @@
+import os
+import time
+import queue
+import shutil
+import tempfile
+import unittest
+from gui.command_engine import CommandEngine
+from gui.history_store import HistoryStore
+from gui.keys_file import KeysFile
+from gui.redaction import MASK, SecretRedactor
+
+SECRET = 'sk-live-0123456789'
+
+class CommandEngineRedactionTest(unittest.TestCase):
+    def setUp(self):
+        self.project = tempfile.mkdtemp()
+        cline_dir = os.path.join(self.project, '.cline')
+        keys_path = os.path.join(self.project, 'keys')
+        with open(keys_path, 'w') as f:
+            f.write(f"[api]\nAPI_KEY={SECRET}\n")
+        self.history = HistoryStore(cline_dir)
+        self.engine = CommandEngine(self.project, self.history, 1, os.path.join(cline_dir, 'runs'))
+        self.engine.redactor = SecretRedactor(KeysFile(keys_path))
+
+    def tearDown(self):
+        shutil.rmtree(self.project, ignore_errors=True)
+
+    def run_command(self, command, **kwargs):
+        events = queue.Queue()
+        run = self.engine.submit(command, events, **kwargs)
+        deadline = time.time() + 10
+        while not run.done and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(run.done)
+        output = []
+        while not events.empty():
+            event = events.get()
+            if hasattr(event, 'text'):
+                output.append(event.text)
+        return run, ''.join(output)
+
+    def recorded_commands(self):
+        return [record['command'] for _, record in self.history.iter_from(0) if record]
+
+    def test_secret_typed_into_command_is_masked(self):
+        run, output = self.run_command(f"echo {SECRET}")
+        self.assertEqual(run.label, f"echo {MASK}")
+        self.assertNotIn(SECRET, output)
+        self.assertEqual(self.recorded_commands(), [f"echo {MASK}"])
+
+    def test_secret_in_display_is_masked(self):
+        # As typed, with one placeholder injected and one secret pasted
+        run, _ = self.run_command(f"echo {SECRET} {SECRET}", display=f"echo $API_KEY {SECRET}")
+        self.assertEqual(run.label, f"echo $API_KEY {MASK}")
+        self.assertEqual(self.recorded_commands(), [f"echo $API_KEY {MASK}"])
+
+    def test_command_without_secrets_is_recorded_as_is(self):
+        run, output = self.run_command("echo hello")
+        self.assertIsNone(run.display)
+        self.assertEqual(output, "hello\n")
+        self.assertEqual(self.recorded_commands(), ["echo hello"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from gui import file_writer
+from gui.file_writer import FileWriter, FlushError
+
+class FileWriterTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        # Long delay: only explicit flushes write
+        self.writer = FileWriter(delay=60)
+
+    def tearDown(self):
+        self.writer.flush_logged()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def read(self, name):
+        with open(os.path.join(self.dir, name)) as f:
+            return f.read()
+
+    def test_writes_to_one_path_coalesce(self):
+        path = os.path.join(self.dir, 'a.txt')
+        for n in range(5):
+            self.writer.write_text(path, f"version {n}")
+        self.assertEqual(self.writer.pending(path), b"version 4")
+        self.assertFalse(os.path.exists(path))
+
+        with mock.patch('gui.file_writer._write_temp', wraps=file_writer._write_temp) as write_temp:
+            self.writer.flush()
+        self.assertEqual(write_temp.call_count, 1)
+        self.assertEqual(self.read('a.txt'), "version 4")
+        self.assertIsNone(self.writer.pending(path))
+        self.assertEqual(os.listdir(self.dir), ['a.txt'])
+
+    def test_flush_raises_failures_after_writing_the_rest(self):
+        good = os.path.join(self.dir, 'good.txt')
+        bad = os.path.join(self.dir, 'missing', 'bad.txt')
+        self.writer.write_text(good, "kept")
+        self.writer.write_text(bad, "lost")
+        with self.assertRaises(FlushError) as raised:
+            self.writer.flush()
+        self.assertEqual(list(raised.exception.failures), [bad])
+        self.assertEqual(self.read('good.txt'), "kept")
+
+    def test_failed_rename_leaves_no_temp_file(self):
+        path = os.path.join(self.dir, 'a.txt')
+        self.writer.write_text(path, "data")
+        with mock.patch('gui.file_writer.os.replace', side_effect=OSError("rename failed")):
+            with self.assertRaises(FlushError):
+                self.writer.flush()
+        self.assertEqual(os.listdir(self.dir), [])
+
+    def test_background_flush_logs_instead_of_raising(self):
+        self.writer.write_text(os.path.join(self.dir, 'missing', 'bad.txt'), "lost")
+        with self.assertLogs(level='ERROR') as logs:
+            self.writer.flush_logged()
+        self.assertIn('bad.txt', logs.output[0])
+
+if __name__ == '__main__':
+    unittest.main()
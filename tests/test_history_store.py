@@ -0,0 +1,108 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from gui import history_store
+from gui.history_store import HistoryStore
+from gui.run_log import RunLogWriter, run_log_path
+
+class HistoryStoreUpdateTest(unittest.TestCase):
+    def setUp(self):
+        self.cline_dir = os.path.join(tempfile.mkdtemp(), '.cline')
+        self.store = HistoryStore(self.cline_dir, max_records=None)
+
+    def tearDown(self):
+        shutil.rmtree(os.path.dirname(self.cline_dir), ignore_errors=True)
+
+    def log_lines(self):
+        with open(self.store.log_path, 'rb') as f:
+            return f.read().splitlines()
+
+    def test_update_within_reserve_is_in_place(self):
+        record_id = self.store.append({'command': 'make', 'status': 'Running'}, reserve=64)
+        self.store.append({'command': 'ls', 'status': 'Completed'})
+        size = os.path.getsize(self.store.log_path)
+
+        self.assertTrue(self.store.update(record_id, {'status': 'Completed', 'returncode': 0}))
+        self.assertEqual(os.path.getsize(self.store.log_path), size)
+        self.assertEqual(self.store.record_at(0)['status'], 'Completed')
+        self.assertEqual(self.store.record_at(0)['returncode'], 0)
+        self.assertEqual(len(self.store), 2)
+
+    def test_update_that_does_not_fit_relocates(self):
+        record_id = self.store.append({'command': 'make', 'status': 'Running'})
+        self.store.append({'command': 'ls', 'status': 'Completed'})
+
+        self.assertTrue(self.store.update(record_id, {'status': 'Completed', 'output': 'x' * 100}))
+        self.assertEqual(self.log_lines()[0].strip(), b'{}')
+        self.assertIsNone(self.store.record_at(0))
+        self.assertEqual(self.store.record_at(2)['id'], record_id)
+        self.assertEqual([r['command'] for r in self.store.page()], ['make', 'ls'])
+        # Three lines, two records
+        self.assertEqual(len(self.store.offsets), 3)
+        self.assertEqual(len(self.store), 2)
+
+    def test_update_of_unknown_record(self):
+        self.store.append({'command': 'ls'})
+        self.assertFalse(self.store.update('missing', {'status': 'Completed'}))
+
+    def test_len_counts_blanks_across_scan_blocks(self):
+        ids = [self.store.append({'command': f"cmd {n}"}) for n in range(50)]
+        for record_id in ids[::3]:
+            self.store.update(record_id, {'output': 'x' * 50})
+        with mock.patch.object(history_store, 'SCAN_BLOCK', 7):
+            self.store._live = (None, 0)
+            self.assertEqual(len(self.store), 50)
+        self.assertEqual(len(HistoryStore(self.cline_dir)), 50)
+
+class HistoryStoreCompactTest(unittest.TestCase):
+    def setUp(self):
+        self.cline_dir = os.path.join(tempfile.mkdtemp(), '.cline')
+        self.runs_dir = os.path.join(self.cline_dir, 'runs')
+        self.store = HistoryStore(self.cline_dir, max_records=None)
+
+    def tearDown(self):
+        shutil.rmtree(os.path.dirname(self.cline_dir), ignore_errors=True)
+
+    def append_run(self, n, log=True):
+        record = {'command': f"cmd {n}"}
+        if log:
+            path = run_log_path(self.runs_dir, f"run-{n}")
+            os.makedirs(self.runs_dir, exist_ok=True)
+            writer = RunLogWriter(path)
+            writer.write(f"output {n}\n")
+            writer.close()
+            record['log'] = os.path.relpath(path, self.cline_dir)
+        return self.store.append(record)
+
+    def test_compact_drops_old_records_and_their_run_logs(self):
+        for n in range(6):
+            self.append_run(n)
+        self.store.compact(max_records=2)
+
+        self.assertEqual([r['command'] for r in self.store.page()], ['cmd 5', 'cmd 4'])
+        self.assertEqual(len(self.store), 2)
+        remaining = sorted(name for name in os.listdir(self.runs_dir) if name.endswith('.log.z'))
+        self.assertEqual(remaining, ['run-4.log.z', 'run-5.log.z'])
+
+    def test_compact_drops_blanked_lines(self):
+        record_id = self.append_run(0, log=False)
+        self.append_run(1, log=False)
+        self.store.update(record_id, {'output': 'x' * 100})
+        self.store.compact()
+        self.assertEqual(len(self.store.offsets), 2)
+        self.assertEqual(len(self.store), 2)
+        self.assertEqual([r['command'] for r in self.store.page()], ['cmd 0', 'cmd 1'])
+
+    def test_compact_keeps_logs_outside_cline(self):
+        outside = os.path.join(os.path.dirname(self.cline_dir), 'keep.log.z')
+        with open(outside, 'w') as f:
+            f.write('data')
+        self.store.append({'command': 'old', 'log': os.path.join('..', 'keep.log.z')})
+        self.store.append({'command': 'new'})
+        self.store.compact(max_records=1)
+        self.assertTrue(os.path.exists(outside))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import os
+import shutil
+import tempfile
+import unittest
+from gui.keys_file import CredentialChange, KeysFile, load_credentials
+
+KEYS_TEXT = """# Project credentials
+[aws]
+AWS_KEY=old-key
+# rotated monthly
+AWS_SECRET=old-secret
+
+[github]
+TOKEN=ghp-token
+"""
+
+class LoadCredentialsTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def load(self, name, text):
+        path = os.path.join(self.dir, name)
+        with open(path, 'w') as f:
+            f.write(text)
+        return load_credentials(path)
+
+    def test_ini_default_is_its_own_service(self):
+        sections = self.load('keys.ini', "[DEFAULT]\nREGION=us-east-1\n\n[aws]\nAWS_KEY=abc\n")
+        self.assertEqual(sections, {'DEFAULT': {'REGION': 'us-east-1'}, 'aws': {'AWS_KEY': 'abc'}})
+
+    def test_ini_duplicates_are_rejected(self):
+        with self.assertRaises(ValueError):
+            self.load('keys.ini', "[aws]\nAWS_KEY=abc\n\n[aws]\nAWS_KEY=def\n")
+        with self.assertRaises(ValueError):
+            self.load('keys.ini', "[aws]\nAWS_KEY=abc\nAWS_KEY=def\n")
+
+    def test_ini_keeps_key_case(self):
+        self.assertEqual(self.load('keys.cfg', "[svc]\nApiKey=x\n"), {'svc': {'ApiKey': 'x'}})
+
+    def test_json_duplicates_are_rejected(self):
+        with self.assertRaises(ValueError):
+            self.load('keys.json', '{"aws": {"AWS_KEY": "abc", "AWS_KEY": "def"}}')
+
+    def test_flat_json_and_env_have_no_service(self):
+        self.assertEqual(self.load('keys.json', '{"TOKEN": 12}'), {'': {'TOKEN': '12'}})
+        self.assertEqual(self.load('.env', 'export TOKEN="a b"\n'), {'': {'TOKEN': 'a b'}})
+
+class KeysFileUpsertTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'keys')
+        with open(self.path, 'w') as f:
+            f.write(KEYS_TEXT)
+        self.keys = KeysFile(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def text(self):
+        with open(self.path) as f:
+            return f.read()
+
+    def test_overwrite_updates_in_place_and_adds_new_keys(self):
+        changes = self.keys.upsert([
+            ('aws', 'AWS_KEY', 'new-key'),
+            ('aws', 'AWS_SECRET', 'old-secret'),
+            ('aws', 'AWS_REGION', 'eu-west-1'),
+            ('slack', 'WEBHOOK', 'https://hooks.example/x'),
+        ])
+        self.assertEqual(changes, [
+            CredentialChange('aws', 'AWS_KEY', 'updated'),
+            CredentialChange('aws', 'AWS_SECRET', 'unchanged'),
+            CredentialChange('aws', 'AWS_REGION', 'added'),
+            CredentialChange('slack', 'WEBHOOK', 'added'),
+        ])
+        self.assertEqual(self.text(), KEYS_TEXT.replace('AWS_KEY=old-key', 'AWS_KEY=new-key').replace(
+            'AWS_SECRET=old-secret\n', 'AWS_SECRET=old-secret\nAWS_REGION=eu-west-1\n'
+        ) + "\n[slack]\nWEBHOOK=https://hooks.example/x\n")
+        self.assertEqual(self.keys.value('aws', 'AWS_KEY'), 'new-key')
+
+    def test_without_overwrite_existing_values_are_conflicts(self):
+        changes = self.keys.upsert([
+            ('aws', 'AWS_KEY', 'new-key'),
+            ('github', 'TOKEN', 'ghp-token'),
+            ('github', 'USER', 'octocat'),
+        ], overwrite=False)
+        self.assertEqual(changes, [
+            CredentialChange('aws', 'AWS_KEY', 'conflict'),
+            CredentialChange('github', 'TOKEN', 'unchanged'),
+            CredentialChange('github', 'USER', 'added'),
+        ])
+        self.assertEqual(self.text(), KEYS_TEXT + "USER=octocat\n")
+        self.assertEqual(self.keys.value('aws', 'AWS_KEY'), 'old-key')
+
+    def test_nothing_to_change_leaves_the_file_alone(self):
+        before = os.stat(self.path)
+        changes = self.keys.upsert([('aws', 'AWS_KEY', 'new-key')], overwrite=False)
+        self.assertEqual([change.action for change in changes], ['conflict'])
+        self.assertEqual(os.stat(self.path).st_ino, before.st_ino)
+
+    def test_last_value_for_a_key_wins(self):
+        changes = self.keys.upsert([('aws', 'AWS_KEY', 'first'), ('aws', 'AWS_KEY', 'second')])
+        self.assertEqual(changes, [CredentialChange('aws', 'AWS_KEY', 'updated')])
+        self.assertEqual(self.keys.value('aws', 'AWS_KEY'), 'second')
+
+    def test_invalid_entry_is_rejected_before_writing(self):
+        with self.assertRaises(ValueError):
+            self.keys.upsert([('aws', 'AWS_KEY', 'ok'), ('aws', 'BAD', 'two\nlines')])
+        self.assertEqual(self.text(), KEYS_TEXT)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from gui.keys_file import KeysFile
+from gui.redaction import FEED_BLOCK, MASK, SecretRedactor, SecretScreen
+
+ALPHABET = 'abcxyz0123456789-'
+
+class StreamRedactorTest(unittest.TestCase):
+    def setUp(self):
+        self.project = tempfile.mkdtemp()
+        self.rng = random.Random(1234)
+        # Short and long secrets, some prefixes of others, all from a small
+        # alphabet so near misses straddle chunk boundaries often
+        self.secrets = ['abc012', 'abc0123', 'xyz-9876543210abc', 'xyz-9876543210abcdef', 'c0c0c0c0c0c0c0c0c0']
+        self.secrets += [''.join(self.rng.choice(ALPHABET) for _ in range(self.rng.randint(6, 40))) for _ in range(20)]
+        keys_path = os.path.join(self.project, 'keys')
+        with open(keys_path, 'w') as f:
+            f.write("[api]\n" + "".join(f"KEY_{n}={s}\n" for n, s in enumerate(self.secrets)))
+        self.redactor = SecretRedactor(KeysFile(keys_path))
+
+    def tearDown(self):
+        shutil.rmtree(self.project, ignore_errors=True)
+
+    def random_text(self, length):
+        parts = []
+        while sum(map(len, parts)) < length:
+            if self.rng.random() < 0.1:
+                secret = self.rng.choice(self.secrets)
+                # Whole secrets and truncated ones
+                parts.append(secret if self.rng.random() < 0.7 else secret[:self.rng.randint(1, len(secret))])
+            else:
+                parts.append(''.join(self.rng.choice(ALPHABET) for _ in range(self.rng.randint(1, 20))))
+        return ''.join(parts)
+
+    def chunked(self, text):
+        stream = self.redactor.stream()
+        out, i = [], 0
+        while i < len(text):
+            size = self.rng.choice([1, 2, 3, 7, 16, 50, 500])
+            out.append(stream.feed(text[i:i + size]))
+            i += size
+        out.append(stream.flush())
+        return ''.join(out)
+
+    def test_chunked_matches_whole(self):
+        pattern = self.redactor.compiled()[0]
+        for _ in range(200):
+            text = self.random_text(self.rng.randint(0, 400))
+            expected = pattern.sub(MASK, text)
+            self.assertEqual(self.chunked(text), expected)
+            self.assertEqual(self.redactor.redact(text), expected)
+
+    def test_large_feed_is_split_into_blocks(self):
+        filler = 'log line without anything interesting\n' * (3 * FEED_BLOCK // 38)
+        secret = self.secrets[3]
+        # One secret straddling a block boundary, one inside a block
+        at = FEED_BLOCK - len(secret) // 2
+        text = filler[:at] + secret + filler[at:] + secret
+        self.assertEqual(self.redactor.redact(text), filler[:at] + MASK + filler[at:] + MASK)
+
+    def test_screen_never_misses(self):
+        screen = SecretScreen(self.secrets)
+        for _ in range(500):
+            text = self.random_text(self.rng.randint(0, 200))
+            if any(secret in text for secret in self.secrets):
+                self.assertTrue(screen(text))
+
+if __name__ == '__main__':
+    unittest.main()
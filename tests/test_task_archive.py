@@ -0,0 +1,126 @@
+import os
+import json
+import sys
+import shutil
+import tempfile
+import threading
+import unittest
+from gui.file_writer import get_writer
+from gui.task_archive import TaskArchive
+
+class TaskArchiveCompactionTest(unittest.TestCase):
+    def setUp(self):
+        self.project = tempfile.mkdtemp()
+        self.tasks_dir = os.path.join(self.project, '.cline', 'tasks')
+        self.archive = TaskArchive(self.project)
+
+    def tearDown(self):
+        get_writer().flush()
+        shutil.rmtree(self.project, ignore_errors=True)
+
+    def make_task(self, task_id):
+        task_dir = os.path.join(self.tasks_dir, task_id)
+        os.makedirs(task_dir)
+        with open(os.path.join(task_dir, 'task.json'), 'w') as f:
+            json.dump({'id': task_id, 'title': task_id, 'status': 'active'}, f)
+        with open(os.path.join(task_dir, 'task.md'), 'w') as f:
+            # Incompressible enough that records have real size
+            f.write(f"# {task_id}\n" + os.urandom(2048).hex())
+        return task_id, task_dir
+
+    def pack_size(self):
+        return os.path.getsize(self.archive.pack_path)
+
+    def test_delete_compacts_once_mostly_dead(self):
+        ids = [f"task-{n}" for n in range(4)]
+        self.archive.archive_many([self.make_task(t) for t in ids])
+        full = self.pack_size()
+
+        # One of four records dead: below COMPACT_RATIO, left as is
+        self.archive.delete_many(ids[:1])
+        self.assertGreater(self.pack_size(), full)
+
+        self.archive.delete_many(ids[1:3])
+        self.assertLess(self.pack_size(), full / 2)
+        self.assertEqual(self.archive.dead_bytes, 0)
+        self.assertEqual(list(self.archive.entries), ids[3:])
+        self.assertIn(ids[3], self.archive.read_file(ids[3]))
+
+    def test_restoring_everything_empties_the_pack(self):
+        ids = [f"task-{n}" for n in range(3)]
+        self.archive.archive_many([self.make_task(t) for t in ids])
+        for task_id in ids:
+            self.archive.restore(task_id, self.tasks_dir)
+            self.assertTrue(os.path.exists(os.path.join(self.tasks_dir, task_id, 'task.md')))
+        self.assertEqual(self.pack_size(), 0)
+        self.assertEqual(self.archive.dead_bytes, 0)
+
+    def test_compacted_index_survives_reload(self):
+        ids = [f"task-{n}" for n in range(3)]
+        self.archive.archive_many([self.make_task(t) for t in ids])
+        self.archive.delete_many(ids[:2])
+        get_writer().flush()
+
+        reloaded = TaskArchive(self.project)
+        self.assertEqual(list(reloaded.entries), ids[2:])
+        self.assertIn(ids[2], reloaded.read_file(ids[2]))
+
+class TaskArchiveReadTest(unittest.TestCase):
+    def setUp(self):
+        self.project = tempfile.mkdtemp()
+        self.tasks_dir = os.path.join(self.project, '.cline', 'tasks')
+        self.archive = TaskArchive(self.project)
+        self.ids = [f"task-{n}" for n in range(20)]
+        tasks = []
+        for task_id in self.ids:
+            task_dir = os.path.join(self.tasks_dir, task_id)
+            os.makedirs(task_dir)
+            with open(os.path.join(task_dir, 'task.json'), 'w') as f:
+                json.dump({'id': task_id, 'title': task_id}, f)
+            with open(os.path.join(task_dir, 'task.md'), 'w') as f:
+                f.write(f"# {task_id}\n" + os.urandom(512).hex())
+            tasks.append((task_id, task_dir))
+        self.archive.archive_many(tasks)
+
+    def tearDown(self):
+        get_writer().flush()
+        shutil.rmtree(self.project, ignore_errors=True)
+
+    def test_stale_offset_is_rejected(self):
+        # Offset of another, intact record, as left by a racing compaction
+        self.archive.entries[self.ids[0]]['offset'] = self.archive.entries[self.ids[1]]['offset']
+        with self.assertRaises(ValueError):
+            self.archive.read(self.ids[0])
+
+    def test_reads_during_compaction_see_live_records(self):
+        errors = []
+        stop = threading.Event()
+
+        def reader():
+            while not stop.is_set():
+                for task_id in list(self.archive.entries):
+                    try:
+                        self.assertIn(task_id, self.archive.read_file(task_id))
+                    except KeyError:
+                        pass  # Removed since the listing
+                    except Exception as e:
+                        errors.append(e)
+
+        thread = threading.Thread(target=reader)
+        interval = sys.getswitchinterval()
+        # Switch threads often so reads interleave with compaction steps
+        sys.setswitchinterval(1e-6)
+        thread.start()
+        try:
+            for task_id in self.ids[:-1]:
+                self.archive.delete_many([task_id])
+                self.archive.compact(force=True)
+        finally:
+            stop.set()
+            thread.join()
+            sys.setswitchinterval(interval)
+        self.assertEqual(errors, [])
+        self.assertEqual(list(self.archive.entries), self.ids[-1:])
+
+if __name__ == '__main__':
+    unittest.main()